@@ -7,6 +7,9 @@ def extract_unique_categories(products_data):
 
     for product in products_data:
         for category in product.get("categories", []):
+            # Sản phẩm mới chỉ lưu categoryId (tên/uri nằm trong bảng danh mục)
+            if not isinstance(category, dict):
+                continue
             cat_id = category.get("categoryId")
             cat_name = category.get("name")
             cat_uri = category.get("uri")
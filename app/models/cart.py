@@ -10,7 +10,7 @@ class Cart:
     items: List[CartItem]
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
-    def get_total(self) -> float:
+    def get_total(self) -> int:
         return sum(item.get_subtotal() for item in self.items)
 
     def get_item_count(self) -> int:
@@ -6,13 +6,13 @@ from typing import List
 @dataclass
 class CartItem:
     product_id: str
-    price: float
+    price: int  # VNĐ
     quantity: int
     name: str
     avatar: str = ""
 
     item_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
-    def get_subtotal(self) -> float:
+    def get_subtotal(self) -> int:
         return self.price * self.quantity
 
@@ -0,0 +1,183 @@
+import sys
+from collections.abc import Mapping
+from operator import attrgetter
+from typing import Any, Dict, FrozenSet, Iterator, Optional, Tuple
+
+# Chuỗi ngắn hơn ngưỡng này được intern: các giá trị lặp lại nhiều (hệ điều hành, RAM,
+# công nghệ màn hình...) chỉ còn một bản trong bộ nhớ. Chuỗi dài (mô tả, URL) thường là duy nhất.
+INTERN_MAX_LENGTH = 64
+
+# Các dict/list con dùng chung giữa các bản ghi (xem CompactRecord.SHARED_FIELDS)
+_shared_items: Dict[tuple, Dict[str, Any]] = {}
+_shared_lists: Dict[tuple, tuple] = {}
+_shared_scalar_lists: Dict[tuple, tuple] = {}
+
+
+class _Missing:
+    """Đánh dấu trường không có trong bản ghi (khi pickle)."""
+
+
+def _intern(value: Any) -> Any:
+    if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+        return sys.intern(value)
+    return value
+
+
+def _share(value: Any) -> Any:
+    """
+    List các dict có giá trị hash được (ví dụ ảnh chụp danh mục) hoặc list các số/chuỗi
+    (ví dụ categoryId của sản phẩm) -> tuple dùng chung: dict giống nhau và cả list giống
+    nhau chỉ được giữ một bản cho mọi bản ghi.
+    """
+    if type(value) is not list:
+        return value
+    if all(type(item) is int or type(item) is str for item in value):
+        key = tuple(map(_intern, value))
+        return _shared_scalar_lists.setdefault(key, key)
+    items = []
+    for item in value:
+        if type(item) is not dict:
+            return value
+        try:
+            key = tuple(item.items())
+            shared = _shared_items.get(key)
+        except TypeError:
+            # Giá trị không hash được (list, dict lồng nhau): giữ nguyên
+            return value
+        if shared is None:
+            shared = _shared_items[key] = {_intern(k): _intern(v) for k, v in item.items()}
+        items.append(shared)
+    key = tuple(map(id, items))
+    shared_list = _shared_lists.get(key)
+    if shared_list is None:
+        shared_list = _shared_lists[key] = tuple(items)
+    return shared_list
+
+
+def _restore(cls, values: tuple, extra: Optional[Dict[str, Any]]):
+    obj = cls.__new__(cls)
+    for name, value in zip(cls.FIELDS, values):
+        if value is not _Missing:
+            setattr(obj, name, value)
+    obj._extra = extra
+    return obj
+
+
+class CompactRecord(Mapping):
+    """
+    Bản ghi gọn trong bộ nhớ thay cho dict: mỗi trường khai báo trong FIELDS là một slot
+    (không có bảng băm riêng cho từng bản ghi), chuỗi ngắn được intern, các trường trong
+    SHARED_FIELDS (list lặp lại) dùng chung giữa các bản ghi. Trường lạ nằm trong
+    `_extra`, trường thiếu vẫn là trường thiếu.
+
+    Đọc được như một dict (get, [], in, keys, items, `**record`...) nhưng không có thao tác
+    sửa: bản ghi được thay bằng bản ghi mới thay vì sửa tại chỗ (không gán thuộc tính từ bên
+    ngoài). copy() trả về một dict thường (các trường trong SHARED_FIELDS là list mới), các
+    trường theo thứ tự FIELDS rồi tới trường lạ.
+    Lớp con khai báo FIELDS, SHARED_FIELDS và `__slots__ = FIELDS`.
+    """
+
+    __slots__ = ("_extra",)
+    FIELDS: Tuple[str, ...] = ()
+    SHARED_FIELDS: FrozenSet[str] = frozenset()
+    _field_set: FrozenSet[str] = frozenset()
+    _values = staticmethod(lambda record: ())
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        clashes = [name for name in cls.FIELDS if hasattr(Mapping, name) or name in ("copy", "from_dict")]
+        if clashes:
+            raise ValueError(f"Tên trường trùng với phương thức của {cls.__name__}: {', '.join(clashes)}")
+        cls._field_set = frozenset(cls.FIELDS)
+        cls.SHARED_FIELDS = frozenset(cls.SHARED_FIELDS)
+        if len(cls.FIELDS) > 1:
+            # Lấy mọi trường trong một lời gọi (AttributeError nếu bản ghi thiếu trường)
+            cls._values = staticmethod(attrgetter(*cls.FIELDS))
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "CompactRecord":
+        if type(data) is cls:
+            return data
+        obj = cls.__new__(cls)
+        fields, shared, intern = cls._field_set, cls.SHARED_FIELDS, sys.intern
+        extra = None
+        for key, value in data.items():
+            if type(value) is str:
+                if len(value) <= INTERN_MAX_LENGTH:
+                    value = intern(value)
+            elif key in shared:
+                value = _share(value)
+            if key in fields:
+                setattr(obj, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        obj._extra = extra
+        return obj
+
+    def _field_items(self) -> Iterator[Tuple[str, Any]]:
+        """(tên, giá trị) của các trường khai báo mà bản ghi có, theo thứ tự FIELDS."""
+        try:
+            return zip(self.FIELDS, self._values(self))
+        except AttributeError:
+            # Bản ghi thiếu trường (hiếm): lấy từng trường một
+            return ((name, getattr(self, name)) for name in self.FIELDS if hasattr(self, name))
+
+    def __reduce__(self):
+        # Pickle (warm snapshot) theo thứ tự FIELDS, không phải dựng lại từ dict
+        try:
+            values = tuple(self._values(self))
+        except AttributeError:
+            values = tuple(getattr(self, name, _Missing) for name in self.FIELDS)
+        return _restore, (type(self), values, self._extra)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._field_set:
+            try:
+                value = getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return list(value) if key in self.SHARED_FIELDS and type(value) is tuple else value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._field_set:
+            value = getattr(self, key, _Missing)
+            if value is _Missing:
+                return default
+            return list(value) if key in self.SHARED_FIELDS and type(value) is tuple else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._field_set:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self.FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict[str, Any]:
+        """Bản sao dạng dict thường."""
+        data = dict(self._field_items())
+        for name in self.SHARED_FIELDS:
+            value = data.get(name)
+            if type(value) is tuple:
+                data[name] = list(value)
+        if self._extra is not None:
+            data.update(self._extra)
+        return data
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.copy()!r})"
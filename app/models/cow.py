@@ -0,0 +1,217 @@
+"""
+Cấu trúc copy-on-write cho dữ liệu trong bộ nhớ của JsonStorage (xem _Snapshot).
+
+Người ghi fork() bản đã công bố cho người đọc rồi sửa bản fork: chỉ phần bị chạm tới (một
+chunk bản ghi, một phân vùng của dict) được sao chép, phần còn lại dùng chung với ảnh chụp.
+Nhờ vậy một lần create/update tốn O(kích thước chunk/phân vùng) thay vì O(số bản ghi).
+Bản đã fork ra không bao giờ được sửa lại (nó là ảnh chụp của người đọc).
+"""
+from collections.abc import MutableMapping, Sequence
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+CHUNK_BITS = 9
+CHUNK_SIZE = 1 << CHUNK_BITS
+_CHUNK_MASK = CHUNK_SIZE - 1
+
+PART_BITS = 10
+_PARTS = 1 << PART_BITS
+_PART_MASK = _PARTS - 1
+
+
+class CowList(Sequence):
+    """
+    List các bản ghi chia thành các chunk CHUNK_SIZE phần tử (mọi chunk đều đầy trừ chunk
+    cuối), nên phần tử thứ i nằm ở chunks[i >> CHUNK_BITS][i & _CHUNK_MASK].
+    append/gán một phần tử chỉ sao chép chunk chứa nó; xóa giữa list dựng lại phần đuôi
+    (các phần tử phía sau đằng nào cũng dời vị trí).
+    """
+
+    __slots__ = ("_chunks", "_owned", "_len")
+
+    def __init__(self, items: Iterable[Any] = ()):
+        self._set_items(list(items))
+
+    @classmethod
+    def wrap(cls, items: Iterable[Any]) -> "CowList":
+        return items if isinstance(items, cls) else cls(items)
+
+    def _set_items(self, items: List[Any], start_chunk: int = 0):
+        """Thay các chunk từ `start_chunk` trở đi bằng `items` (đã chia lại chunk, thuộc bản này)."""
+        chunks = self._chunks[:start_chunk] if start_chunk else []
+        chunks.extend(items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE))
+        self._chunks = chunks
+        if not start_chunk:
+            # Mọi chunk vừa được tạo mới: bản này sở hữu tất cả
+            self._owned = None
+        elif self._owned is not None:
+            self._owned.update(range(start_chunk, len(chunks)))
+        self._len = start_chunk * CHUNK_SIZE + len(items)
+
+    def fork(self) -> "CowList":
+        """Bản làm việc mới dùng chung mọi chunk với bản này (chỉ sao chép list các chunk)."""
+        other = CowList.__new__(CowList)
+        other._chunks = list(self._chunks)
+        other._owned = set()
+        other._len = self._len
+        return other
+
+    def _own(self, k: int) -> List[Any]:
+        chunk = self._chunks[k]
+        if self._owned is not None and k not in self._owned:
+            chunk = self._chunks[k] = list(chunk)
+            self._owned.add(k)
+        return chunk
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._chunks)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("CowList index out of range")
+        return self._chunks[i >> CHUNK_BITS][i & _CHUNK_MASK]
+
+    def __setitem__(self, i, value):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._len)
+            if step == 1 and stop == self._len:
+                # Thay phần đuôi (delete_many): chỉ dựng lại các chunk từ vị trí `start`
+                k = start >> CHUNK_BITS
+                head = self._chunks[k][:start & _CHUNK_MASK] if k < len(self._chunks) else []
+                self._set_items(head + list(value), k)
+            else:
+                items = list(self)
+                items[i] = value
+                self._set_items(items)
+            return
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("CowList assignment index out of range")
+        self._own(i >> CHUNK_BITS)[i & _CHUNK_MASK] = value
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            items = list(self)
+            del items[i]
+            self._set_items(items)
+            return
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("CowList assignment index out of range")
+        k = i >> CHUNK_BITS
+        tail = list(chain.from_iterable(self._chunks[k:]))
+        del tail[i - (k << CHUNK_BITS)]
+        self._set_items(tail, k)
+
+    def append(self, value: Any):
+        chunks = self._chunks
+        if not chunks or len(chunks[-1]) == CHUNK_SIZE:
+            chunks.append([value])
+            if self._owned is not None:
+                self._owned.add(len(chunks) - 1)
+        else:
+            self._own(len(chunks) - 1).append(value)
+        self._len += 1
+
+    def __reduce__(self):
+        # Pickle (warm snapshot) như một list thường
+        return CowList, (list(self),)
+
+    def __repr__(self) -> str:
+        return f"CowList({list(self)!r})"
+
+
+class CowDict(MutableMapping):
+    """
+    Dict chia thành _PARTS phân vùng theo hash của khóa. Gán/xóa một khóa chỉ sao chép
+    phân vùng chứa nó. Thứ tự duyệt là theo phân vùng, không phải thứ tự chèn
+    (dùng cho chỉ mục id -> vị trí và giá trị -> bucket của chỉ mục phụ).
+    """
+
+    __slots__ = ("_parts", "_owned", "_len")
+
+    def __init__(self, data: Optional[Dict[Any, Any]] = None):
+        self._parts: List[Optional[Dict[Any, Any]]] = [None] * _PARTS
+        self._owned: Optional[set] = None
+        self._len = 0
+        if data:
+            parts = self._parts
+            for key, value in data.items():
+                part = parts[hash(key) & _PART_MASK]
+                if part is None:
+                    part = parts[hash(key) & _PART_MASK] = {}
+                part[key] = value
+            self._len = sum(len(p) for p in parts if p is not None)
+
+    @classmethod
+    def wrap(cls, data: Dict[Any, Any]) -> "CowDict":
+        return data if isinstance(data, cls) else cls(data)
+
+    def fork(self) -> "CowDict":
+        """Bản làm việc mới dùng chung mọi phân vùng với bản này."""
+        other = CowDict.__new__(CowDict)
+        other._parts = list(self._parts)
+        other._owned = set()
+        other._len = self._len
+        return other
+
+    def _own(self, k: int) -> Dict[Any, Any]:
+        part = self._parts[k]
+        if part is None:
+            part = self._parts[k] = {}
+            if self._owned is not None:
+                self._owned.add(k)
+        elif self._owned is not None and k not in self._owned:
+            part = self._parts[k] = dict(part)
+            self._owned.add(k)
+        return part
+
+    def __getitem__(self, key):
+        part = self._parts[hash(key) & _PART_MASK]
+        if part is None:
+            raise KeyError(key)
+        return part[key]
+
+    def get(self, key, default=None):
+        part = self._parts[hash(key) & _PART_MASK]
+        return default if part is None else part.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        part = self._parts[hash(key) & _PART_MASK]
+        return part is not None and key in part
+
+    def __setitem__(self, key, value):
+        part = self._own(hash(key) & _PART_MASK)
+        if key not in part:
+            self._len += 1
+        part[key] = value
+
+    def __delitem__(self, key):
+        k = hash(key) & _PART_MASK
+        part = self._parts[k]
+        if part is None or key not in part:
+            raise KeyError(key)
+        del self._own(k)[key]
+        self._len -= 1
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(p for p in self._parts if p)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __reduce__(self):
+        # Hash của chuỗi đổi giữa các lần chạy: pickle như dict thường rồi chia lại phân vùng
+        return CowDict, (dict(self.items()),)
+
+    def __repr__(self) -> str:
+        return f"CowDict({dict(self.items())!r})"
@@ -11,7 +11,7 @@ class Order:
 
     customer_info: Dict[str, str]
     items: List[Dict[str, Any]]
-    total_amount: float
+    total_amount: int  # VNĐ
     user_id: str
 
     status: str = "completed"
@@ -1,5 +1,7 @@
-from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from dataclasses import dataclass, field, fields
+from typing import Any, Iterable, List
+
+from app.models.compact_record import CompactRecord
 
 
 @dataclass
@@ -7,8 +9,9 @@ class Product:
     id: str
     name: str
     sku: str
-    price: float
-    bought_price: float
+    # Số tiền là số nguyên VNĐ (xem app.utils.money.to_vnd)
+    price: int
+    bought_price: int
     stock: int
     description: str = ""
     avatar: str = ""  # link hoặc path ảnh sản phẩm
@@ -37,4 +40,35 @@ class Product:
     created_at: str = ""
     updated_at: str = ""
 
-    categories: List[Dict[str, Any]] = field(default_factory=list)
+    # Tham chiếu danh mục: list các categoryId, tên/uri nằm trong store "categories"
+    # (xem ProductService.categories_of) nên đổi tên danh mục không phải sửa sản phẩm nào
+    categories: List[int] = field(default_factory=list)
+
+
+def to_category_ids(categories: Iterable[Any]) -> List[int]:
+    """
+    Chuẩn hóa danh mục của một sản phẩm thành list categoryId (không trùng, giữ thứ tự).
+    Nhận categoryId (int hoặc chuỗi số) và cả dict danh mục đầy đủ của dữ liệu cũ
+    ({"categoryId", "name", "uri"}); phần tử không có categoryId bị bỏ qua.
+    """
+    ids = []
+    for item in categories or ():
+        if isinstance(item, dict):
+            item = item.get("categoryId")
+        if isinstance(item, str) and item.strip().isdigit():
+            item = int(item)
+        if isinstance(item, int) and not isinstance(item, bool) and item not in ids:
+            ids.append(item)
+    return ids
+
+
+class CompactProduct(CompactRecord):
+    """
+    Dạng gọn trong bộ nhớ của một sản phẩm, dùng làm bản ghi trong cache của storage
+    "products" (xem app/storage_engines/registry.py). Các list danh mục giống nhau được
+    dùng chung giữa mọi sản phẩm.
+    """
+
+    FIELDS = tuple(f.name for f in fields(Product))
+    SHARED_FIELDS = ("categories",)
+    __slots__ = FIELDS
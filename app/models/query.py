@@ -0,0 +1,152 @@
+"""
+Ngôn ngữ truy vấn nhỏ dùng chung cho các storage engine (query()/count()).
+
+where: dict các điều kiện, tất cả phải thỏa (AND):
+    {"status": "completed"}                      -> bằng
+    {"price": (">=", 1000000)}                   -> so sánh: "==", "!=", "<", "<=", ">", ">="
+    {"role": ("in", ["admin", "sales_person"])}  -> thuộc tập giá trị
+    {"categories": ("any_in", [3, 1131])}        -> trường là list có ít nhất một phần tử thuộc tập giá trị
+    {"name": ("contains", "iphone")}             -> chứa chuỗi con, không phân biệt hoa thường
+    {"$or": [{...}, {...}]}                      -> ít nhất một nhóm điều kiện thỏa
+    {"$and": [{...}, {...}]}                     -> mọi nhóm đều thỏa (nhiều điều kiện trên cùng trường)
+  Tên trường có thể là đường dẫn "a.b" (ví dụ "customer_info.name"); nếu gặp list
+  trên đường đi (ví dụ "categories.uri"), điều kiện thỏa khi có ít nhất một phần tử thỏa.
+  where cũng có thể là một hàm nhận bản ghi và trả về bool (không engine nào đẩy xuống được).
+
+order_by: tên trường hoặc list tên trường, tiền tố "-" để sắp xếp giảm dần ("-price").
+  Chuỗi được so sánh không phân biệt hoa thường; None đứng trước số, số đứng trước chuỗi.
+"""
+import heapq
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+Where = Union[None, Dict[str, Any], Callable[[Dict[str, Any]], bool]]
+OrderBy = Union[None, str, Sequence[str]]
+
+OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "in", "any_in", "contains")
+
+
+def split_condition(condition: Any) -> Tuple[str, Any]:
+    """Tách một điều kiện thành (toán tử, giá trị); giá trị trơn nghĩa là so sánh bằng."""
+    if isinstance(condition, tuple) and len(condition) == 2 and condition[0] in OPERATORS:
+        return condition
+    return "==", condition
+
+
+def path_values(record: Dict[str, Any], path: str) -> List[Any]:
+    """Các giá trị tại đường dẫn `path` (đi xuyên qua list). Trường thiếu cho [None]."""
+    values = [record]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, list):
+                next_values.extend(v.get(part) if isinstance(v, Mapping) else None for v in value)
+            elif isinstance(value, Mapping):
+                next_values.append(value.get(part))
+            else:
+                next_values.append(None)
+        values = next_values
+    return values or [None]
+
+
+def _test(op: str, value: Any, expected: Any) -> bool:
+    try:
+        if op == "==":
+            return value == expected
+        if op == "!=":
+            return value != expected
+        if op == "in":
+            return value in expected
+        if op == "any_in":
+            return isinstance(value, (list, tuple)) and any(v in expected for v in value)
+        if op == "contains":
+            return isinstance(value, str) and str(expected).lower() in value.lower()
+        if value is None:
+            return False
+        if op == "<":
+            return value < expected
+        if op == "<=":
+            return value <= expected
+        if op == ">":
+            return value > expected
+        if op == ">=":
+            return value >= expected
+    except TypeError:
+        # So sánh khác kiểu (ví dụ chuỗi với số) coi như không thỏa
+        return False
+    raise ValueError(f"Toán tử truy vấn không hợp lệ: '{op}'. Hỗ trợ: {', '.join(OPERATORS)}")
+
+
+def compile_where(where: Where) -> Optional[Callable[[Dict[str, Any]], bool]]:
+    """Biến `where` thành hàm kiểm tra một bản ghi (None nếu không có điều kiện)."""
+    if where is None or callable(where):
+        return where
+    checks = []
+    for field, condition in where.items():
+        if field == "$or":
+            branches = [compile_where(branch) or (lambda r: True) for branch in condition]
+            checks.append(lambda r, bs=branches: any(b(r) for b in bs))
+            continue
+        if field == "$and":
+            branches = [b for b in map(compile_where, condition) if b is not None]
+            checks.append(lambda r, bs=branches: all(b(r) for b in bs))
+            continue
+        op, expected = split_condition(condition)
+        if op not in OPERATORS:
+            raise ValueError(f"Toán tử truy vấn không hợp lệ: '{op}'. Hỗ trợ: {', '.join(OPERATORS)}")
+        if "." in field:
+            checks.append(lambda r, f=field, o=op, e=expected: any(_test(o, v, e) for v in path_values(r, f)))
+        else:
+            checks.append(lambda r, f=field, o=op, e=expected: _test(o, r.get(f), e))
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda r: all(check(r) for check in checks)
+
+
+def parse_order_by(order_by: OrderBy) -> List[Tuple[str, bool]]:
+    """"-price" / ["role", "-name"] -> [(trường, giảm_dần), ...]"""
+    if not order_by:
+        return []
+    if isinstance(order_by, str):
+        order_by = [order_by]
+    return [(f[1:], True) if f.startswith("-") else (f, False) for f in order_by]
+
+
+def _sort_value(value: Any) -> Tuple[int, Any]:
+    # Cùng thứ tự với SQLite: NULL < số < chuỗi < còn lại
+    if value is None:
+        return 0, 0
+    if isinstance(value, (int, float)):
+        return 1, value
+    if isinstance(value, str):
+        return 2, value.lower()
+    return 3, str(value)
+
+
+def _field_value(record: Dict[str, Any], field: str) -> Any:
+    return path_values(record, field)[0] if "." in field else record.get(field)
+
+
+def sort_records(records: Iterable[Dict[str, Any]], order_by: OrderBy,
+                 limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    """Sắp xếp ổn định theo order_by; nếu có limit chỉ giữ offset+limit phần tử đầu (heap)."""
+    keys = parse_order_by(order_by)
+    end = None if limit is None else offset + limit
+    if len(keys) == 1 and end is not None:
+        field, descending = keys[0]
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(end, records, key=lambda r: _sort_value(_field_value(r, field)))[offset:]
+    records = list(records)
+    # Nhiều khóa với chiều khác nhau: sắp xếp ổn định từ khóa phụ tới khóa chính
+    for field, descending in reversed(keys):
+        records.sort(key=lambda r, f=field: _sort_value(_field_value(r, f)), reverse=descending)
+    return records[offset:end]
+
+
+def project(record: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Chỉ giữ các trường được yêu cầu (trường thiếu có giá trị None). Luôn trả về dict mới."""
+    if not fields:
+        return record.copy()
+    return {f: record.get(f) for f in fields}
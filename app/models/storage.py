@@ -1,58 +1,1357 @@
-import json, os, threading
-from typing import List, Dict, Any
+import codecs, contextlib, gc, json, marshal, os, pickle, struct, threading, time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple, Callable, Union, Iterable, Iterator, Sequence
+
+from app.models.cow import CowDict, CowList
+from app.models.query import OrderBy, Where, compile_where, project, sort_records, split_condition
+from app.models.storage_metrics import instrumented, metrics_for, timed_lock
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có khóa liên tiến trình, chỉ còn khóa trong tiến trình
+    fcntl = None
+
+
+@dataclass
+class StorageIndex:
+    """
+    Khai báo một chỉ mục phụ trên storage.
+
+    Args:
+        name: Tên chỉ mục, dùng trong find_by()/find_one().
+        key: Tên trường, hoặc hàm nhận bản ghi và trả về một giá trị
+             (hay một list/tuple/set giá trị nếu bản ghi thuộc nhiều khóa).
+        unique: Nếu True, create/update sẽ từ chối giá trị đã thuộc về bản ghi khác.
+    """
+    name: str
+    key: Union[str, Callable[[Dict[str, Any]], Any]]
+    unique: bool = False
+
+    def values_of(self, record: Dict[str, Any]) -> List[Any]:
+        value = record.get(self.key) if isinstance(self.key, str) else self.key(record)
+        if value is None:
+            return []
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return [v for v in value if v is not None]
+        return [value]
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """
+    Ảnh chụp bất biến của dữ liệu đã commit. Người đọc lấy tham chiếu tới ảnh chụp
+    hiện tại mà không cần khóa; người ghi dựng bản sao mới (copy-on-write) rồi thay
+    tham chiếu, nên list, các bản ghi và chỉ mục bên trong không bao giờ bị sửa tại chỗ.
+    List và chỉ mục là cấu trúc copy-on-write theo từng phần (app.models.cow): bản sao của
+    người ghi dùng chung mọi chunk/phân vùng chưa bị sửa với ảnh chụp.
+    """
+    records: CowList
+    id_index: CowDict
+    index_data: Dict[str, CowDict]
+    sig: Optional[Tuple[int, int, int]]
+
+
+class FileLock:
+    """
+    Khóa tư vấn (advisory) liên tiến trình bằng fcntl.flock trên file `<path>`.
+    Dùng khi nhiều bản ứng dụng cùng chạy trên một thư mục dữ liệu. Có thể lồng
+    nhau trong cùng một đối tượng (đếm số lần acquire); người gọi phải tự đảm bảo
+    chỉ một luồng dùng đối tượng tại một thời điểm (JsonStorage giữ self._lock).
+    Trên hệ điều hành không có fcntl, khóa không làm gì.
+    """
 
-class JsonStorage:
     def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._depth = 0
+
+    def acquire(self):
+        if fcntl is None:
+            return
+        if self._depth == 0:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+
+    def release(self):
+        if fcntl is None or self._depth == 0:
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None:
+            if self._depth:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                self._depth = 0
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def _apply_change(records: Dict[str, Dict[str, Any]], op: str, _id: str, payload: Optional[Dict[str, Any]]):
+    """
+    Áp một thay đổi (op, id, payload) vào `records` (id -> bản ghi, giữ thứ tự chèn).
+    Bản ghi được thay bằng dict mới thay vì sửa tại chỗ. Thao tác là idempotent.
+    """
+    if op == "create":
+        records[_id] = payload
+    elif op in ("update", "replace") and _id in records:
+        record = {**records[_id], **payload} if op == "update" else dict(payload)
+        records[_id] = record
+        if record.get("id") != _id:
+            # Đổi id: dựng lại dict để giữ đúng thứ tự
+            items = [(record.get("id") if k == _id else k, v) for k, v in records.items()]
+            records.clear()
+            records.update(items)
+    elif op == "delete":
+        records.pop(_id, None)
+
+
+# Định dạng lưu trữ trên đĩa:
+#   "json"     - JSON thụt lề 2 (mặc định, dễ đọc bằng mắt)
+#   "json-min" - JSON không khoảng trắng thừa
+#   "binary"   - MAGIC + các bản ghi nối tiếp, mỗi bản ghi = độ dài 4 byte (little-endian)
+#                + marshal.dumps(record). Khi đọc, định dạng được nhận diện qua MAGIC.
+ENCODINGS = ("json", "json-min", "binary")
+BINARY_MAGIC = b"JSB1\n"
+_RECORD_LEN = struct.Struct("<I")
+_MARSHAL_VERSION = 4
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Warm-start snapshot (`<file>.warm`): dữ liệu đã parse cùng các chỉ mục, ghi bằng pickle
+# khi đóng ứng dụng sạch sẽ để lần mở sau không phải parse lại file nguồn.
+# Chỉ được dùng khi chữ ký (mtime, size, inode) của file nguồn vẫn khớp.
+WARM_MAGIC = "JSW1"
+WARM_PICKLE_PROTOCOL = 5
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    """Đọc toàn bộ bản ghi từ một file storage, tự nhận diện JSON hay nhị phân."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    if raw.startswith(BINARY_MAGIC):
+        records = []
+        view = memoryview(raw)
+        pos, end = len(BINARY_MAGIC), len(raw)
+        while pos < end:
+            (length,) = _RECORD_LEN.unpack_from(view, pos)
+            pos += _RECORD_LEN.size
+            records.append(marshal.loads(view[pos:pos + length]))
+            pos += length
+        return records
+    return json.loads(raw.decode("utf-8")) if raw.strip() else []
+
+
+def iter_records(path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Đọc lần lượt từng bản ghi của một file storage mà không nạp cả file vào bộ nhớ.
+    Bộ nhớ dùng thêm chỉ cỡ một khối đọc (`chunk_size` byte) cộng bản ghi lớn nhất.
+    File không tồn tại hoặc rỗng không sinh bản ghi nào.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        head = f.read(len(BINARY_MAGIC))
+        if head == BINARY_MAGIC:
+            yield from _iter_binary(f)
+        else:
+            yield from _iter_json(f, head, chunk_size)
+
+
+def _iter_binary(f) -> Iterator[Dict[str, Any]]:
+    while True:
+        header = f.read(_RECORD_LEN.size)
+        if len(header) < _RECORD_LEN.size:
+            return
+        (length,) = _RECORD_LEN.unpack(header)
+        yield marshal.loads(f.read(length))
+
+
+def _iter_json(f, head: bytes, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Tách các phần tử của mảng JSON cấp ngoài cùng bằng JSONDecoder.raw_decode trên
+    bộ đệm được nạp thêm dần từng khối. Ký tự UTF-8 nhiều byte bị cắt giữa hai khối
+    được ghép lại nhờ bộ giải mã tăng dần.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = utf8.decode(head), 0, False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        # Bỏ phần đã xử lý để bộ đệm không phình theo kích thước file
+        buf = buf[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
+        return True
+
+    def skip(chars: str) -> Optional[str]:
+        """Bỏ qua các ký tự trong `chars`; trả về ký tự kế tiếp (None nếu hết file)."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return None
+
+    if skip(" \t\r\n") is None:
+        return
+    if buf[pos] != "[":
+        raise ValueError(f"File {f.name} không phải mảng JSON.")
+    pos += 1
+    while True:
+        ch = skip(" \t\r\n,")
+        if ch is None:
+            raise ValueError(f"File {f.name} bị cắt cụt: thiếu ']'.")
+        if ch == "]":
+            return
+        while True:
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Bản ghi chưa nằm trọn trong bộ đệm: đọc thêm rồi thử lại
+                if not fill():
+                    raise
+                continue
+            if end == len(buf) and fill():
+                # Giá trị có thể còn tiếp ở khối sau (ví dụ một số bị cắt đôi)
+                continue
+            break
+        pos = end
+        yield record
+
+
+def _plain(value: Any) -> Dict[str, Any]:
+    """Bản ghi gọn (Mapping không phải dict, xem app.models.compact_record) -> dict thường để ghi ra file."""
+    if isinstance(value, Mapping):
+        return value.copy() if hasattr(value, "copy") else dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """Tạm tắt gc khi tạo hàng loạt đối tượng (nạp dữ liệu): gc chạy liên tục mà không thu hồi được gì."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _as_list(data: Sequence[Any]) -> list:
+    # json chỉ ghi được list/tuple thật, không ghi được CowList của cache
+    return data if isinstance(data, (list, tuple)) else list(data)
+
+
+def dump_records(path: str, data: List[Dict[str, Any]], encoding: str = "json"):
+    """
+    Ghi toàn bộ bản ghi ra file theo `encoding` (xem ENCODINGS).
+    Bản ghi có thể là dict hoặc Mapping khác (bản ghi gọn trong cache).
+    """
+    if encoding == "binary":
+        chunks = [BINARY_MAGIC]
+        for record in data:
+            blob = marshal.dumps(record if type(record) is dict else _plain(record), _MARSHAL_VERSION)
+            chunks.append(_RECORD_LEN.pack(len(blob)))
+            chunks.append(blob)
+        with open(path, "wb") as f:
+            f.write(b"".join(chunks))
+    elif encoding == "json-min":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(_as_list(data), f, ensure_ascii=False, separators=(",", ":"), default=_plain)
+    elif encoding == "json":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(_as_list(data), f, ensure_ascii=False, indent=2, default=_plain)
+    else:
+        raise ValueError(f"Encoding '{encoding}' không hợp lệ. Hỗ trợ: {', '.join(ENCODINGS)}")
+
+
+@dataclass(frozen=True)
+class StorageChange:
+    """
+    Sự kiện thay đổi của một storage, gửi tới các listener đã subscribe().
+
+    Args:
+        version: Số phiên bản của storage sau thay đổi, tăng dần đơn điệu.
+        created/updated/deleted: id các bản ghi bị ảnh hưởng.
+        reloaded: True nếu toàn bộ dữ liệu được nạp lại/thay thế (file bị tiến trình
+                  khác sửa, save_all...), người nghe nên dựng lại toàn bộ.
+    """
+    version: int
+    created: Tuple[str, ...] = ()
+    updated: Tuple[str, ...] = ()
+    deleted: Tuple[str, ...] = ()
+    reloaded: bool = False
+
+
+class ChangeNotifier:
+    """
+    Phần dùng chung cho các storage: số phiên bản và danh sách listener.
+    Sự kiện được xếp hàng khi đang giữ khóa ghi (_queue_changes) và chỉ được gửi đi
+    sau khi nhả khóa (_dispatch), nên listener có thể đọc lại storage ngay.
+    Listener được gọi trên luồng đã thực hiện thay đổi (có thể là luồng scraper).
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._listeners: List[Callable[[StorageChange], None]] = []
+        self._event_lock = threading.Lock()
+        self._queued_events: List[StorageChange] = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def subscribe(self, listener: Callable[[StorageChange], None]) -> Callable[[], None]:
+        """Đăng ký nhận StorageChange. Trả về hàm để hủy đăng ký."""
+        with self._event_lock:
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._event_lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+        return unsubscribe
+
+    def _queue_change(self, created=(), updated=(), deleted=(), reloaded: bool = False):
+        with self._event_lock:
+            self._version += 1
+            self._queued_events.append(
+                StorageChange(self._version, tuple(created), tuple(updated), tuple(deleted), reloaded)
+            )
+
+    def _queue_changes(self, changes: List[Tuple[str, str, Optional[Dict[str, Any]]]]):
+        """Xếp hàng một sự kiện cho lô thay đổi (op, id, payload)."""
+        created, updated, deleted = [], [], []
+        for op, _id, payload in changes:
+            if op == "create":
+                created.append(_id)
+            elif op in ("update", "replace"):
+                new_id = payload.get("id", _id) if payload else _id
+                if new_id != _id:
+                    deleted.append(_id)
+                    created.append(new_id)
+                else:
+                    updated.append(_id)
+            else:
+                deleted.append(_id)
+        self._queue_change(created, updated, deleted)
+
+    def _dispatch(self):
+        """Gửi các sự kiện đang chờ tới listener. Không được gọi khi đang ghi dở."""
+        with self._event_lock:
+            if not self._queued_events:
+                return
+            events, self._queued_events = self._queued_events, []
+            listeners = list(self._listeners)
+        for event in events:
+            for listener in listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    print(f"[Storage] Lỗi trong listener {listener}: {e}")
+
+
+class JsonStorage(ChangeNotifier):
+    def __init__(self, path: str, indexes: Optional[Iterable[StorageIndex]] = None, cache: bool = True,
+                 write_behind: bool = False, flush_delay: float = 0.5, max_flush_delay: float = 5.0,
+                 encoding: str = "json", process_lock: bool = True, warm_start: bool = False,
+                 metrics_name: Optional[str] = None, record_type: Optional[type] = None):
+        """
+        Args:
+            path: Đường dẫn file JSON (tương đối so với thư mục app/ hoặc tuyệt đối).
+            indexes: Các chỉ mục phụ cần duy trì.
+            cache: Nếu False, mọi thao tác đều đọc lại toàn bộ file (hành vi cũ, dùng để so sánh).
+            write_behind: Nếu True, thay đổi chỉ cập nhật bộ nhớ ngay; một luồng nền gộp chúng
+                          thành một lần ghi file. Gọi flush()/close() để ghi ngay.
+            flush_delay: (write-behind) Ghi sau khi không có thay đổi mới trong ngần ấy giây.
+            max_flush_delay: (write-behind) Thời gian tối đa một thay đổi được phép chờ ghi.
+            encoding: Định dạng khi ghi file: "json", "json-min" hoặc "binary" (xem ENCODINGS).
+                      Khi đọc, định dạng luôn được tự nhận diện.
+            process_lock: Nếu True, các thao tác ghi giữ khóa fcntl trên `<path>.lock` để
+                          nhiều tiến trình (nhiều bản ứng dụng) dùng chung file an toàn.
+            warm_start: Nếu True (và có cache), close() ghi `<path>.warm` và lần nạp đầu tiên
+                        dùng file này thay vì parse lại file nguồn, nếu file nguồn chưa đổi.
+            metrics_name: Tên store trong số liệu đo lường (mặc định: tên file không có đuôi),
+                          xem app.models.storage_metrics.
+            record_type: (cần cache) Lớp có from_dict() dùng để giữ bản ghi trong bộ nhớ ở dạng
+                         gọn, ví dụ CompactProduct (xem app.models.compact_record). Mọi thao tác
+                         đọc vẫn trả về dict. Mặc định giữ nguyên dict.
+        """
+        super().__init__()
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Encoding '{encoding}' không hợp lệ. Hỗ trợ: {', '.join(ENCODINGS)}")
+        self.encoding = encoding
         base_dir = os.path.dirname(os.path.abspath(__file__))
         self.path = os.path.join(base_dir, '..', path)
         self.path = os.path.abspath(self.path)
-        self._lock = threading.Lock()
+        # Khóa ghi: chỉ các thao tác thay đổi dữ liệu (và việc nạp lại file) giữ khóa này.
+        # Thao tác đọc dùng ảnh chụp self._snapshot mà không cần khóa.
+        self._lock = threading.RLock()
+        self._use_cache = cache
+        # Đo lường: thời gian từng thao tác, byte đọc/ghi, thời gian chờ khóa, tỉ lệ trúng cache
+        self.metrics = metrics_for(
+            metrics_name or os.path.splitext(os.path.basename(self.path))[0] or type(self).__name__,
+            type(self).__name__,
+        )
+        self._timed_lock = timed_lock(self._lock, self.metrics)
+        # Khóa liên tiến trình: mỗi lần ghi giữ khóa, nạp lại file nếu tiến trình khác vừa
+        # commit, áp thay đổi rồi ghi ra file tạm và os.replace (người đọc không bao giờ
+        # thấy file ghi dở, nên việc đọc không cần khóa).
+        self._file_lock = FileLock(self.path + ".lock") if process_lock else None
+        self._warm_path = self.path + ".warm" if warm_start and cache else None
+        # Không có cache thì mỗi thao tác đọc lại file: chuyển sang dạng gọn chỉ tốn thêm thời gian
+        self._record_type = record_type if cache else None
+
+        # Dữ liệu đã parse được giữ trong bộ nhớ, kèm "chữ ký" (mtime, size) của file
+        # tại thời điểm đọc/ghi gần nhất để phát hiện file bị thay đổi từ bên ngoài.
+        self._cache: Optional[CowList] = None
+        self._cache_sig: Optional[Tuple[int, int, int]] = None
+        # Chỉ mục khóa chính: id -> vị trí trong self._cache, giúp get/update/delete O(1)
+        self._id_index: CowDict = CowDict()
+        # Chỉ mục phụ: tên chỉ mục -> giá trị -> các id (dict giữ thứ tự chèn)
+        self._indexes: Dict[str, StorageIndex] = {idx.name: idx for idx in (indexes or [])}
+        self._index_data: Dict[str, CowDict] = {name: CowDict() for name in self._indexes}
+
+        # Copy-on-write: self._cache/_id_index/_index_data là bản làm việc của người ghi,
+        # self._snapshot là bản đã công bố cho người đọc.
+        self._snapshot: Optional[_Snapshot] = None
+        self._writing = False
+        # Các bucket chỉ mục (tên, giá trị) đã được sao chép trong lần ghi hiện tại;
+        # None nghĩa là toàn bộ chỉ mục vừa được dựng mới, không chia sẻ với ảnh chụp.
+        self._owned_buckets: Optional[set] = None
+
+        # Write-behind: trạng thái "bẩn" và luồng ghi nền (chỉ khởi động khi có thay đổi đầu tiên)
+        self._write_behind = write_behind and cache
+        self._flush_delay = flush_delay
+        self._max_flush_delay = max_flush_delay
+        self._dirty = False
+        self._dirty_since = 0.0
+        self._pending_changes: List[Tuple[str, str, Optional[Dict[str, Any]]]] = []
+        self._last_change = 0.0
+        self._flush_cond = threading.Condition(self._lock)
+        self._flusher: Optional[threading.Thread] = None
+        self._closing = False
+
+        self._ensure_file()
+        print('[DEBUG] path : ', self.path)
+
+    def _ensure_file(self):
         dir_path = os.path.dirname(self.path)
         if dir_path and not os.path.exists(dir_path):
             os.makedirs(dir_path, exist_ok=True)
 
-        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
-        print('[DEBUG] path : ', self.path)
+        self._lock_file()
+        try:
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                self._atomic_dump([])
+        finally:
+            self._unlock_file()
+
+    def _lock_file(self):
+        if self._file_lock is not None:
+            if self.metrics is None:
+                self._file_lock.acquire()
+                return
+            start = time.perf_counter()
+            self._file_lock.acquire()
+            self.metrics.add_file_lock_wait(time.perf_counter() - start)
+
+    def _unlock_file(self):
+        if self._file_lock is not None:
+            self._file_lock.release()
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        # Ghi bằng os.replace tạo inode mới, nên inode phát hiện được cả những lần
+        # tiến trình khác commit trong cùng một "tick" mtime với cùng kích thước.
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
 
     def _read(self) -> List[Dict[str, Any]]:
+        """
+        Trả về danh sách dữ liệu đang nằm trong bộ nhớ.
+        Chỉ đọc lại file khi mtime/size trên đĩa khác với lần đọc/ghi gần nhất.
+        Lưu ý: đây là danh sách nội bộ, không được trả thẳng ra ngoài.
+        """
         with self._lock:
-            with open(self.path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            if self._dirty:
+                # Còn thay đổi chưa ghi (write-behind): dữ liệu trong bộ nhớ là mới nhất
+                return self._cache
+            sig = self._file_signature()
+            if self._cache is None or sig != self._cache_sig or not self._use_cache:
+                reloaded = self._cache is not None and self._use_cache
+                if not (self._cache is None and self._load_warm(sig)):
+                    self._cache = self._compact_all(load_records(self.path))
+                    self._cache_sig = sig
+                    self._rebuild_index()
+                    if self.metrics is not None and sig is not None:
+                        self.metrics.add_bytes_read(sig[1])
+                if reloaded:
+                    # File bị thay đổi từ bên ngoài (thường là tiến trình khác)
+                    self._queue_change(reloaded=True)
+            return self._cache
+
+    # ------------------------------------------------------------------ #
+    # Warm-start snapshot
+    # ------------------------------------------------------------------ #
+    def _index_spec(self) -> Optional[tuple]:
+        """Mô tả các chỉ mục phụ để kiểm tra warm snapshot; None nếu có chỉ mục dùng hàm (không so được)."""
+        if any(not isinstance(idx.key, str) for idx in self._indexes.values()):
+            return None
+        return tuple((idx.name, idx.key, idx.unique) for idx in self._indexes.values())
+
+    def _load_warm(self, sig: Optional[Tuple[int, int, int]]) -> bool:
+        """Nạp dữ liệu (và chỉ mục) từ warm snapshot nếu nó được ghi cho đúng phiên bản file hiện tại."""
+        if self._warm_path is None or sig is None:
+            return False
+        try:
+            # Hàng trăm nghìn bản ghi mới tạo khi unpickle
+            with _gc_paused(), open(self._warm_path, "rb") as f:
+                warm = pickle.load(f)
+                if self.metrics is not None:
+                    self.metrics.add_bytes_read(f.tell())
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"[Storage] Bỏ qua warm snapshot hỏng {self._warm_path}: {e}")
+            return False
+        if not isinstance(warm, dict) or warm.get("magic") != WARM_MAGIC or tuple(warm.get("sig") or ()) != sig:
+            # File nguồn đã đổi sau lần đóng trước: snapshot không còn dùng được
+            return False
+        if warm.get("record_type") != self._record_type_name():
+            # Snapshot được ghi với dạng bản ghi khác (vừa bật/tắt bản ghi gọn)
+            return False
+        # Snapshot ghi bởi phiên bản cũ chứa list/dict thường
+        self._cache = CowList.wrap(warm["records"])
+        self._cache_sig = sig
+        spec = self._index_spec()
+        if spec is not None and warm.get("index_spec") == spec:
+            self._id_index = CowDict.wrap(warm["id_index"])
+            self._index_data = {name: CowDict.wrap(bucket) for name, bucket in warm["index_data"].items()}
+            self._owned_buckets = None
+        else:
+            self._rebuild_index()
+        return True
+
+    def save_warm_snapshot(self) -> bool:
+        """
+        Ghi warm snapshot của dữ liệu đang có trong bộ nhớ (gọi khi đóng ứng dụng).
+        Không ghi nếu chưa nạp dữ liệu, còn thay đổi chưa ghi, hoặc file nguồn vừa bị
+        tiến trình khác sửa. Trả về True nếu đã ghi.
+        """
+        with self._lock:
+            snap = self._snapshot
+            if self._warm_path is None or snap is None or self._dirty or self._file_signature() != snap.sig:
+                return False
+            spec = self._index_spec()
+            payload = {
+                "magic": WARM_MAGIC,
+                "sig": snap.sig,
+                "records": snap.records,
+                "id_index": snap.id_index,
+                "index_spec": spec,
+                "index_data": snap.index_data if spec is not None else None,
+                "record_type": self._record_type_name(),
+            }
+            tmp_path = f"{self._warm_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(payload, f, protocol=WARM_PICKLE_PROTOCOL)
+                    if self.metrics is not None:
+                        self.metrics.add_bytes_written(f.tell())
+                os.replace(tmp_path, self._warm_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return True
+
+    def _record_type_name(self) -> Optional[str]:
+        cls = self._record_type
+        return None if cls is None else f"{cls.__module__}.{cls.__qualname__}"
+
+    # ------------------------------------------------------------------ #
+    # Bản ghi gọn trong bộ nhớ (record_type)
+    # ------------------------------------------------------------------ #
+    def _compact(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Dạng bản ghi được giữ trong cache (chính `record` nếu không có record_type)."""
+        return record if self._record_type is None else self._record_type.from_dict(record)
+
+    def _compact_all(self, records: List[Dict[str, Any]]) -> CowList:
+        if self._record_type is None:
+            return CowList(records)
+        from_dict = self._record_type.from_dict
+        with _gc_paused():
+            return CowList(from_dict(x) for x in records)
+
+    # ------------------------------------------------------------------ #
+    # Ảnh chụp cho người đọc (copy-on-write)
+    # ------------------------------------------------------------------ #
+    def _is_fresh(self, snap: _Snapshot) -> bool:
+        """Ảnh chụp còn dùng được mà không cần đọc lại file hay không."""
+        if not self._use_cache:
+            return False
+        # Đang ghi dở thì file trên đĩa đổi, nhưng ảnh chụp cũ vẫn là dữ liệu đã commit
+        return self._dirty or self._writing or self._file_signature() == snap.sig
+
+    def _current(self) -> _Snapshot:
+        """Ảnh chụp mới nhất cho người đọc. Chỉ lấy khóa khi cần nạp lại từ file."""
+        snap = self._snapshot
+        if snap is not None and self._is_fresh(snap):
+            if self.metrics is not None:
+                self.metrics.cache_hit()
+            return snap
+        if self.metrics is not None:
+            self.metrics.cache_miss()
+        with self._timed_lock:
+            if self._writing and self._snapshot is not None:
+                # Được gọi từ chính luồng đang ghi: không công bố dữ liệu đang sửa dở
+                return self._snapshot
+            self._read()
+            snap = self._snapshot
+            if snap is None or snap.records is not self._cache or snap.sig != self._cache_sig:
+                self._publish()
+            snap = self._snapshot
+        self._dispatch()
+        return snap
+
+    def check_for_changes(self) -> int:
+        """
+        Nạp lại dữ liệu nếu file đã bị tiến trình khác thay đổi (phát sự kiện reloaded).
+        Trả về version hiện tại.
+        """
+        self._current()
+        # Sự kiện do luồng ghi nền xếp hàng (gộp với thay đổi bên ngoài) cũng được gửi ở đây
+        self._dispatch()
+        return self.version
+
+    def _publish(self):
+        """Công bố bản làm việc hiện tại thành ảnh chụp cho người đọc."""
+        self._writing = False
+        if self._cache is None:
+            self._snapshot = None
+            return
+        self._snapshot = _Snapshot(self._cache, self._id_index, self._index_data, self._cache_sig)
+        self._owned_buckets = set()
+
+    def _begin_write(self):
+        """
+        Chuẩn bị bản làm việc riêng cho người ghi: fork list và các chỉ mục (chỉ sao chép
+        danh sách chunk/phân vùng; chunk, phân vùng và bucket chỉ mục phụ được sao chép
+        khi bị chạm tới), nên chi phí không tăng theo số bản ghi.
+        Phải được gọi khi đang giữ self._lock. Giữ khóa file tới _end_write()/_abort_write(),
+        và nạp lại dữ liệu nếu tiến trình khác đã commit kể từ lần đọc trước.
+        """
+        self._lock_file()
+        self._read()
+        if self._snapshot is None or self._snapshot.records is not self._cache:
+            self._publish()
+        self._writing = True
+        self._cache = self._cache.fork()
+        self._id_index = self._id_index.fork()
+        self._index_data = {name: bucket.fork() for name, bucket in self._index_data.items()}
+        self._owned_buckets = set()
+
+    def _end_write(self, changes: Optional[List[Tuple[str, str, Any]]] = None):
+        """Công bố kết quả của lần ghi, xếp hàng sự kiện thay đổi và nhả khóa file."""
+        self._publish()
+        self._unlock_file()
+        if changes:
+            self._queue_changes(changes)
+
+    def _abort_write(self):
+        """Bỏ bản làm việc, quay về ảnh chụp đã công bố (không có gì được ghi)."""
+        snap = self._snapshot
+        self._writing = False
+        try:
+            if snap is None:
+                self.invalidate()
+                return
+            self._cache, self._id_index, self._index_data = snap.records, snap.id_index, snap.index_data
+            self._owned_buckets = set()
+        finally:
+            self._unlock_file()
+
+    def _own_bucket(self, name: str, value: Any) -> Dict[str, None]:
+        """Trả về bucket (tên chỉ mục, giá trị) có thể sửa được, sao chép nếu đang dùng chung."""
+        bucket = self._index_data[name]
+        ids = bucket.get(value)
+        if self._owned_buckets is not None and (name, value) not in self._owned_buckets:
+            ids = dict(ids) if ids is not None else {}
+            bucket[value] = ids
+            self._owned_buckets.add((name, value))
+        elif ids is None:
+            ids = bucket[value] = {}
+        return ids
+
+    def _rebuild_index(self, start: int = 0):
+        """Dựng lại chỉ mục id -> vị trí, bắt đầu từ vị trí `start` trở đi."""
+        if start == 0:
+            self._id_index = CowDict()
+            self._index_data = {name: CowDict() for name in self._indexes}
+            self._owned_buckets = None
+            for record in self._cache:
+                self._index_add(record)
+        for pos in range(start, len(self._cache)):
+            self._id_index[self._cache[pos].get("id")] = pos
+
+    def _index_add(self, record: Dict[str, Any]):
+        for name, idx in self._indexes.items():
+            for value in idx.values_of(record):
+                self._own_bucket(name, value)[record.get("id")] = None
+
+    def _index_remove(self, record: Dict[str, Any]):
+        for name, idx in self._indexes.items():
+            bucket = self._index_data[name]
+            for value in idx.values_of(record):
+                if value not in bucket:
+                    continue
+                ids = self._own_bucket(name, value)
+                ids.pop(record.get("id"), None)
+                if not ids:
+                    del bucket[value]
+
+    def _check_unique(self, record: Dict[str, Any], old: Optional[Dict[str, Any]] = None):
+        """
+        Kiểm tra ràng buộc unique cho các giá trị MỚI của bản ghi.
+        Dữ liệu cũ đã trùng sẵn trong file vẫn được chấp nhận khi nạp.
+        """
+        for name, idx in self._indexes.items():
+            if not idx.unique:
+                continue
+            old_values = idx.values_of(old) if old is not None else []
+            for value in idx.values_of(record):
+                if value in old_values:
+                    continue
+                owners = self._index_data[name].get(value, {})
+                if any(owner != record.get("id") for owner in owners):
+                    raise ValueError(f"Giá trị '{value}' đã tồn tại trong chỉ mục unique '{name}'.")
+
+    def _dump(self, data: List[Dict[str, Any]], path: Optional[str] = None):
+        dump_records(path or self.path, data, self.encoding)
+
+    def _atomic_dump(self, data: List[Dict[str, Any]]):
+        """Ghi ra file tạm (riêng cho tiến trình này), fsync rồi os.replace vào file chính."""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            self._dump(data, tmp_path)
+            with open(tmp_path, "rb") as f:
+                os.fsync(f.fileno())
+                if self.metrics is not None:
+                    self.metrics.add_bytes_written(os.fstat(f.fileno()).st_size)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
     def _write(self, data: List[Dict[str, Any]]):
         with self._lock:
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self._writing = True
+            self._lock_file()
+            try:
+                self._atomic_dump(data)
+            except Exception:
+                # Dữ liệu trong bộ nhớ có thể đã bị sửa dở, buộc đọc lại từ file
+                self.invalidate()
+                raise
+            finally:
+                self._unlock_file()
+            if data is not self._cache:
+                self._cache = self._compact_all(data)
+                self._rebuild_index()
+            self._cache_sig = self._file_signature()
+            self._dirty = False
+            self._pending_changes = []
+            self._publish()
+
+    def _commit(self, op: str, _id: str, payload: Optional[Dict[str, Any]] = None):
+        """
+        Lưu một thay đổi đã áp dụng vào bộ nhớ xuống nơi lưu trữ.
+        JsonStorage ghi lại toàn bộ file; các engine khác có thể chỉ ghi phần thay đổi.
+
+        Args:
+            op: "create", "update", "replace" hoặc "delete".
+            _id: id của bản ghi bị thay đổi.
+            payload: Bản ghi mới (create, replace) hoặc bản vá (update).
+        """
+        self._commit_many([(op, _id, payload)])
+
+    def _commit_many(self, changes: List[Tuple[str, str, Optional[Dict[str, Any]]]]):
+        """Lưu một loạt thay đổi (op, id, payload) đã áp dụng vào bộ nhớ bằng một lần ghi."""
+        if self._write_behind and not self._closing:
+            self._pending_changes.extend(changes)
+            self._schedule_flush()
+        else:
+            self._write(self._cache)
+
+    # ------------------------------------------------------------------ #
+    # Write-behind
+    # ------------------------------------------------------------------ #
+    def _schedule_flush(self):
+        with self._lock:
+            now = time.monotonic()
+            if not self._dirty:
+                self._dirty_since = now
+            self._dirty = True
+            self._last_change = now
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+            self._flush_cond.notify()
+
+    def _flush_loop(self):
+        """Chờ tới khi hết khoảng lặng flush_delay (hoặc chạm max_flush_delay) rồi ghi một lần."""
+        with self._lock:
+            while not self._closing:
+                if not self._dirty:
+                    self._flush_cond.wait()
+                    continue
+                deadline = min(self._last_change + self._flush_delay, self._dirty_since + self._max_flush_delay)
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._flush_cond.wait(remaining)
+                    continue
+                self._flush_pending()
+
+    def _flush_pending(self):
+        self._writing = True
+        self._lock_file()
+        try:
+            if self._file_signature() != self._cache_sig:
+                self._merge_external()
+            self._atomic_dump(self._cache)
+        except Exception as e:
+            # Giữ trạng thái bẩn, lần thay đổi/flush sau sẽ thử ghi lại
+            print(f"[JsonStorage] Lỗi khi ghi {self.path}: {e}")
+            self._dirty_since = self._last_change = time.monotonic()
+            self._writing = False
+            return
+        finally:
+            self._unlock_file()
+        self._cache_sig = self._file_signature()
+        self._dirty = False
+        self._pending_changes = []
+        self._publish()
+
+    def _merge_external(self):
+        """
+        (write-behind) Tiến trình khác đã commit trong lúc các thay đổi của ta còn chờ:
+        nạp lại file rồi áp lại các thay đổi đang chờ lên trên, thay vì ghi đè dữ liệu của họ.
+        """
+        records = {x.get("id"): x for x in load_records(self.path)}
+        if self.metrics is not None:
+            self.metrics.add_bytes_read(os.path.getsize(self.path))
+        for op, _id, payload in self._pending_changes:
+            _apply_change(records, op, _id, payload)
+        self._cache = self._compact_all(list(records.values()))
+        self._rebuild_index()
+        self._queue_change(reloaded=True)
+        print(f"[JsonStorage] {os.path.basename(self.path)} đã bị tiến trình khác thay đổi, "
+              f"gộp {len(self._pending_changes)} thay đổi đang chờ.")
+
+    @instrumented("flush")
+    def flush(self):
+        """Ghi ngay các thay đổi đang chờ (write-behind). Không làm gì nếu không có thay đổi."""
+        with self._timed_lock:
+            if self._dirty:
+                self._flush_pending()
+        self._dispatch()
+
+    def close(self):
+        """Dừng luồng ghi nền và ghi nốt các thay đổi còn chờ."""
+        with self._lock:
+            self._closing = True
+            self._flush_cond.notify_all()
+            self.flush()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+            self._flusher = None
+        with self._lock:
+            try:
+                self.save_warm_snapshot()
+            except Exception as e:
+                print(f"[Storage] Lỗi khi ghi warm snapshot {self._warm_path}: {e}")
+            if self._file_lock is not None:
+                self._file_lock.close()
+
+    def invalidate(self):
+        """Bỏ dữ liệu đang cache, lần truy cập tiếp theo sẽ đọc lại từ file."""
+        with self._lock:
+            self._snapshot = None
+            self._writing = False
+            self._pending_changes = []
+            self._cache = None
+            self._cache_sig = None
+            self._id_index = CowDict()
+            self._index_data = {name: CowDict() for name in self._indexes}
 
+    @instrumented("all")
     def all(self) -> List[Dict[str, Any]]:
-        return self._read()
+        # Trả về bản sao nông để người gọi có thể sort/sửa mà không làm hỏng cache
+        return [x.copy() for x in self._current().records]
 
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        """
+        Duyệt lần lượt từng bản ghi (bản sao), dành cho các đoạn code chỉ cần quét một lượt.
+        Nếu dữ liệu đang nằm trong cache và còn mới thì duyệt ảnh chụp trong bộ nhớ;
+        ngược lại đọc dần từ file (xem iter_records) mà KHÔNG nạp cả kho vào cache.
+        """
+        snap = self._snapshot
+        if (snap is not None and self._is_fresh(snap)) or not self._streams_from_file():
+            for record in self._current().records:
+                yield record.copy()
+            return
+        if self.metrics is not None:
+            self.metrics.cache_miss()
+            self.metrics.add_bytes_read(os.path.getsize(self.path))
+        yield from iter_records(self.path)
+
+    def _streams_from_file(self) -> bool:
+        """File ở self.path có chứa đầy đủ dữ liệu đã commit để iter_all() đọc thẳng hay không."""
+        return True
+
+    @instrumented("get_by_id")
     def get_by_id(self, _id: str):
-        return next((x for x in self._read() if x["id"] == _id), None)
+        snap = self._current()
+        pos = snap.id_index.get(_id)
+        return snap.records[pos].copy() if pos is not None else None
+
+    @instrumented("find_by")
+    def find_by(self, index: str, value: Any) -> List[Dict[str, Any]]:
+        """Trả về các bản ghi có giá trị `value` trong chỉ mục phụ `index`."""
+        if index not in self._indexes:
+            raise KeyError(f"Storage '{self.path}' không có chỉ mục '{index}'.")
+        snap = self._current()
+        ids = snap.index_data[index].get(value, {})
+        return [snap.records[snap.id_index[_id]].copy() for _id in ids]
+
+    def find_one(self, index: str, value: Any) -> Optional[Dict[str, Any]]:
+        """Như find_by() nhưng chỉ trả về bản ghi đầu tiên (hoặc None)."""
+        found = self.find_by(index, value)
+        return found[0] if found else None
+
+    # ------------------------------------------------------------------ #
+    # Truy vấn: lọc, chọn trường, sắp xếp, phân trang (xem app.models.query)
+    # ------------------------------------------------------------------ #
+    @instrumented("query")
+    def query(self, where: Where = None, fields: Optional[Sequence[str]] = None, order_by: OrderBy = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Trả về các bản ghi thỏa `where`, sắp xếp theo `order_by`, bỏ qua `offset` bản ghi
+        đầu và lấy tối đa `limit` bản ghi; mỗi bản ghi chỉ gồm các trường trong `fields`
+        (mặc định: toàn bộ). Điều kiện bằng/in trên trường có chỉ mục phụ dùng chỉ mục;
+        có limit thì chỉ giữ offset+limit bản ghi tốt nhất thay vì sắp xếp cả kho.
+        """
+        snap = self._current()
+        records = self._candidates(snap, where)
+        predicate = compile_where(where)
+        if predicate is not None:
+            records = (r for r in records if predicate(r))
+        if order_by:
+            page = sort_records(records, order_by, limit, offset)
+        else:
+            page = islice(records, offset, None if limit is None else offset + limit)
+        return [project(r, fields) for r in page]
+
+    @instrumented("count")
+    def count(self, where: Where = None) -> int:
+        """Số bản ghi thỏa `where`."""
+        snap = self._current()
+        records = self._candidates(snap, where)
+        predicate = compile_where(where)
+        if predicate is None:
+            return len(records)
+        return sum(1 for r in records if predicate(r))
+
+    def _candidates(self, snap: _Snapshot, where: Where) -> List[Dict[str, Any]]:
+        """
+        Thu hẹp tập bản ghi cần xét bằng chỉ mục id hoặc chỉ mục phụ (điều kiện bằng/in đầu
+        tiên trên id hay trường có chỉ mục), giữ thứ tự lưu trữ. Điều kiện vẫn được kiểm tra
+        lại sau đó.
+        """
+        if not isinstance(where, dict):
+            return snap.records
+        for field, condition in where.items():
+            if field == "$or":
+                continue
+            op, expected = split_condition(condition)
+            if field == "id" and op in ("==", "in"):
+                try:
+                    ids = [expected] if op == "==" else expected
+                    positions = sorted(snap.id_index[_id] for _id in ids if _id in snap.id_index)
+                except TypeError:
+                    continue
+                return [snap.records[pos] for pos in positions]
+            name = next((n for n, idx in self._indexes.items() if idx.key == field), None)
+            if name is None or op not in ("==", "in"):
+                continue
+            bucket = snap.index_data[name]
+            try:
+                ids = [_id for value in ([expected] if op == "==" else expected) for _id in bucket.get(value, ())]
+            except TypeError:
+                # Giá trị không hash được (list, dict...): không dùng chỉ mục được
+                continue
+            positions = sorted({snap.id_index[_id] for _id in ids})
+            return [snap.records[pos] for pos in positions]
+        return snap.records
+
+    def _apply_create(self, record: Dict[str, Any]):
+        """Thêm bản ghi vào dữ liệu trong bộ nhớ và các chỉ mục (chưa ghi xuống đĩa)."""
+        self._check_unique(record)
+        self._cache.append(self._compact(record))
+        self._id_index[record.get("id")] = len(self._cache) - 1
+        self._index_add(record)
 
+    def _apply_update(self, pos: int, _id: str, patch: Dict[str, Any], replace: bool = False) -> Dict[str, Any]:
+        """
+        Áp bản vá vào bản ghi ở vị trí `pos` trong bộ nhớ (chưa ghi xuống đĩa).
+        Với replace=True, `patch` là toàn bộ nội dung mới của bản ghi.
+        """
+        old = self._cache[pos]
+        # Bản ghi cũ có thể đang nằm trong ảnh chụp của người đọc: thay bằng dict mới
+        x = self._compact(dict(patch) if replace else {**old, **patch})
+        self._check_unique(x, old)
+        self._index_remove(old)
+        self._cache[pos] = x
+        self._index_add(x)
+        if x.get("id") != _id:
+            # Bản vá đổi cả id: cập nhật lại khóa trong chỉ mục
+            del self._id_index[_id]
+            self._id_index[x.get("id")] = pos
+        return x
+
+    @instrumented("create")
     def create(self, obj: Dict[str, Any]):
-        data = self._read()
-        data.append(obj)
-        self._write(data)
+        with self._timed_lock:
+            self._begin_write()
+            try:
+                record = dict(obj)
+                self._apply_create(record)
+                self._commit("create", record.get("id"), record)
+            except Exception:
+                self._abort_write()
+                raise
+            self._end_write([("create", record.get("id"), record)])
+        self._dispatch()
         return obj
 
+    @instrumented("update")
     def update(self, _id: str, patch: Dict[str, Any]):
-        data = self._read()
-        for i, x in enumerate(data):
-            if x["id"] == _id:
-                x.update(patch)
-                data[i] = x
-                self._write(data)
-                return x
-        return None
+        with self._timed_lock:
+            self._begin_write()
+            pos = self._id_index.get(_id)
+            if pos is None:
+                self._abort_write()
+                return None
+            try:
+                x = self._apply_update(pos, _id, patch)
+                self._commit("update", _id, patch)
+            except Exception:
+                self._abort_write()
+                raise
+            self._end_write([("update", _id, patch)])
+        self._dispatch()
+        return x.copy()
 
+    @instrumented("delete")
     def delete(self, _id: str):
-        data = self._read()
-        new_data = [x for x in data if x["id"] != _id]
-        self._write(new_data)
-        return len(new_data) != len(data)
+        with self._timed_lock:
+            self._begin_write()
+            pos = self._id_index.get(_id)
+            if pos is None:
+                self._abort_write()
+                return False
+            try:
+                data = self._cache
+                self._index_remove(data[pos])
+                del data[pos]
+                del self._id_index[_id]
+                # Các phần tử phía sau bị dời lên một vị trí
+                self._rebuild_index(pos)
+                self._commit("delete", _id)
+            except Exception:
+                self._abort_write()
+                raise
+            self._end_write([("delete", _id, None)])
+        self._dispatch()
+        return True
+
+    # ------------------------------------------------------------------ #
+    # Thao tác hàng loạt: một lần khóa, một lần ghi cho cả lô
+    # ------------------------------------------------------------------ #
+    def _apply_batch(self, apply: Callable[[List[Tuple[str, str, Any]]], Any]):
+        """
+        Chạy `apply(changes)` dưới khóa ghi rồi ghi toàn bộ `changes` một lần.
+        Nếu có lỗi giữa chừng, bản làm việc bị bỏ và người đọc vẫn thấy ảnh chụp cũ
+        (chưa có gì được ghi).
+        """
+        with self._timed_lock:
+            self._begin_write()
+            changes: List[Tuple[str, str, Any]] = []
+            try:
+                result = apply(changes)
+                if changes:
+                    self._commit_many(changes)
+            except Exception:
+                self._abort_write()
+                raise
+            self._end_write(changes)
+        self._dispatch()
+        return result
+
+    @instrumented("create_many")
+    def create_many(self, objs: Iterable[Dict[str, Any]]) -> int:
+        """Tạo nhiều bản ghi với một lần ghi. Trả về số bản ghi đã tạo."""
+        def apply(changes):
+            for obj in objs:
+                record = dict(obj)
+                self._apply_create(record)
+                changes.append(("create", record.get("id"), record))
+            return len(changes)
+        return self._apply_batch(apply)
+
+    @instrumented("update_many")
+    def update_many(self, patches_by_id: Dict[str, Dict[str, Any]]) -> int:
+        """Áp nhiều bản vá {id: patch} với một lần ghi. Trả về số bản ghi đã cập nhật."""
+        def apply(changes):
+            for _id, patch in patches_by_id.items():
+                pos = self._id_index.get(_id)
+                if pos is None:
+                    continue
+                self._apply_update(pos, _id, patch)
+                changes.append(("update", _id, patch))
+            return len(changes)
+        return self._apply_batch(apply)
+
+    @instrumented("replace_many")
+    def replace_many(self, records_by_id: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Thay toàn bộ nội dung các bản ghi {id: bản ghi} tại chỗ (giữ vị trí; trường không có
+        trong bản ghi mới bị bỏ), với một lần ghi. Trả về số bản ghi đã thay.
+        """
+        def apply(changes):
+            for _id, record in records_by_id.items():
+                pos = self._id_index.get(_id)
+                if pos is None:
+                    continue
+                record = dict(record)
+                self._apply_update(pos, _id, record, replace=True)
+                changes.append(("replace", _id, record))
+            return len(changes)
+        return self._apply_batch(apply)
+
+    @instrumented("delete_many")
+    def delete_many(self, ids: Iterable[str]) -> int:
+        """Xóa nhiều bản ghi với một lần ghi. Trả về số bản ghi đã xóa."""
+        def apply(changes):
+            doomed = {}
+            for _id in ids:
+                if _id in self._id_index:
+                    doomed[_id] = None
+            if not doomed:
+                return 0
+            data = self._cache
+            first = min(self._id_index[_id] for _id in doomed)
+            for _id in doomed:
+                self._index_remove(data[self._id_index.pop(_id)])
+            # Lọc một lượt thay vì xóa từng phần tử (mỗi lần xóa phải dời cả phần đuôi list)
+            data[first:] = [x for x in data[first:] if x.get("id") not in doomed]
+            self._rebuild_index(first)
+            changes.extend(("delete", _id, None) for _id in doomed)
+            return len(doomed)
+        return self._apply_batch(apply)
+
+    @instrumented("upsert_many")
+    def upsert_many(self, records: Iterable[Dict[str, Any]], key: str = "id",
+                    create_factory: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, int]:
+        """
+        Cập nhật bản ghi đã có (so khớp theo trường `key`) hoặc tạo mới nếu chưa có,
+        tất cả với một lần ghi.
+
+        Args:
+            records: Các bản ghi/bản vá cần upsert.
+            key: Trường dùng để so khớp với dữ liệu hiện có.
+            create_factory: Hàm dựng bản ghi đầy đủ từ một bản vá khi cần tạo mới
+                            (ví dụ gán id, giá trị mặc định). Mặc định dùng nguyên bản vá.
 
+        Returns:
+            {"created": số bản ghi tạo mới, "updated": số bản ghi cập nhật}
+        """
+        def apply(changes):
+            lookup = self._key_lookup(key)
+            created = updated = 0
+            for patch in records:
+                value = patch.get(key)
+                _id = lookup.get(value) if value is not None else None
+                if _id is not None and _id in self._id_index:
+                    self._apply_update(self._id_index[_id], _id, patch)
+                    changes.append(("update", _id, patch))
+                    updated += 1
+                else:
+                    record = dict(create_factory(patch) if create_factory else patch)
+                    self._apply_create(record)
+                    changes.append(("create", record.get("id"), record))
+                    if value is not None:
+                        lookup[value] = record.get("id")
+                    created += 1
+            return {"created": created, "updated": updated}
+        return self._apply_batch(apply)
+
+    def _key_lookup(self, key: str) -> Dict[Any, str]:
+        """Bảng tra giá trị trường `key` -> id, dùng chỉ mục nếu có, nếu không thì duyệt một lần."""
+        if key == "id":
+            return {_id: _id for _id in self._id_index}
+        for name, idx in self._indexes.items():
+            if idx.key == key:
+                return {value: next(iter(ids)) for value, ids in self._index_data[name].items()}
+        lookup: Dict[Any, str] = {}
+        for record in self._cache:
+            lookup.setdefault(record.get(key), record.get("id"))
+        return lookup
+
+    @instrumented("save_all")
     def save_all(self, data: list):
-        self._write(data)
\ No newline at end of file
+        with self._timed_lock:
+            self._write([dict(x) for x in data])
+            self._publish()
+            self._queue_change(reloaded=True)
+        self._dispatch()
+
+
+class StorageTransaction:
+    """
+    Transaction đơn giản trải trên nhiều storage.
+
+    Các thay đổi (create/update) được gom trong bộ nhớ, đọc qua tx.get() sẽ thấy
+    cả thay đổi đang chờ. Khi thoát khối `with` bình thường, mỗi storage được ghi
+    bằng một lần ghi hàng loạt; nếu có exception thì không có gì được ghi.
+    Nếu một storage ghi lỗi sau khi storage trước đã ghi xong, các thay đổi đã ghi
+    sẽ được hoàn tác (bản ghi cũ được đặt lại tại chỗ, bản ghi mới bị xóa).
+
+    Trong suốt transaction, khóa ghi của các storage tham gia được giữ để luồng
+    khác (ví dụ scraper) không chen vào giữa lúc đọc và ghi.
+
+    Ví dụ:
+        with StorageTransaction(products_storage, orders_storage) as tx:
+            product = tx.get(products_storage, product_id)
+            tx.update(products_storage, product_id, {"stock": product["stock"] - 1})
+            tx.create(orders_storage, order_dict)
+    """
+
+    def __init__(self, *stores):
+        self._stores = list(stores)
+        self._creates: Dict[int, List[Dict[str, Any]]] = {id(s): [] for s in self._stores}
+        self._patches: Dict[int, Dict[str, Dict[str, Any]]] = {id(s): {} for s in self._stores}
+        self._originals: Dict[int, Dict[str, Dict[str, Any]]] = {id(s): {} for s in self._stores}
+        self._locked = []
+
+    def __enter__(self):
+        # Khóa theo thứ tự cố định để hai transaction không khóa chéo nhau
+        for store in sorted(self._stores, key=id):
+            lock = getattr(store, "_lock", None)
+            if lock is not None:
+                lock.acquire()
+                self._locked.append(lock)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            for lock in reversed(self._locked):
+                lock.release()
+            self._locked = []
+        return False
+
+    def _check_store(self, store):
+        if id(store) not in self._creates:
+            raise ValueError("Storage không tham gia transaction này.")
+
+    def get(self, store, _id: str) -> Optional[Dict[str, Any]]:
+        """Đọc bản ghi, đã áp các thay đổi đang chờ trong transaction."""
+        self._check_store(store)
+        for record in self._creates[id(store)]:
+            if record.get("id") == _id:
+                return dict(record)
+        original = self._originals[id(store)].get(_id)
+        if original is None:
+            original = store.get_by_id(_id)
+            if original is None:
+                return None
+            self._originals[id(store)][_id] = original
+        return {**original, **self._patches[id(store)].get(_id, {})}
+
+    def update(self, store, _id: str, patch: Dict[str, Any]):
+        self._check_store(store)
+        for record in self._creates[id(store)]:
+            if record.get("id") == _id:
+                record.update(patch)
+                return
+        if self.get(store, _id) is None:
+            raise ValueError(f"Bản ghi với ID {_id} không tồn tại.")
+        self._patches[id(store)].setdefault(_id, {}).update(patch)
+
+    def create(self, store, record: Dict[str, Any]):
+        self._check_store(store)
+        self._creates[id(store)].append(dict(record))
+
+    def commit(self):
+        committed = []
+        try:
+            for store in self._stores:
+                patches = self._patches[id(store)]
+                creates = self._creates[id(store)]
+                if patches:
+                    store.update_many(patches)
+                    committed.append((store, "update"))
+                if creates:
+                    store.create_many(creates)
+                    committed.append((store, "create"))
+        except Exception:
+            self._rollback(committed)
+            raise
+        finally:
+            for store in self._stores:
+                self._creates[id(store)] = []
+                self._patches[id(store)] = {}
+                self._originals[id(store)] = {}
+
+    def _rollback(self, committed):
+        """Hoàn tác các storage đã ghi xong trước khi một storage khác ghi lỗi."""
+        for store, kind in reversed(committed):
+            try:
+                if kind == "update":
+                    # Đặt lại nguyên bản ghi cũ tại chỗ: trường do bản vá thêm vào cũng bị bỏ
+                    originals = self._originals[id(store)]
+                    store.replace_many({_id: originals[_id] for _id in self._patches[id(store)]})
+                else:
+                    for record in self._creates[id(store)]:
+                        store.delete(record.get("id"))
+            except Exception as e:
+                print(f"[StorageTransaction] Lỗi khi hoàn tác {getattr(store, 'path', store)}: {e}")
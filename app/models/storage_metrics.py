@@ -0,0 +1,256 @@
+import functools, json, os, threading, time
+from bisect import bisect_left
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+# Cận trên (mili giây) của các bucket trong histogram độ trễ; bucket cuối là "lớn hơn"
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+_enabled = True
+_registry: Dict[str, "StorageMetrics"] = {}
+_registry_lock = threading.Lock()
+_started_at = time.time()
+
+
+class OperationStats:
+    """Số lần gọi, số lần lỗi và histogram độ trễ của một thao tác."""
+
+    __slots__ = ("calls", "errors", "total_seconds", "max_seconds", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, seconds: float, failed: bool):
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+
+    def percentile_ms(self, q: float) -> Optional[float]:
+        """Ước lượng phân vị `q` (0..1) bằng cận trên của bucket chứa nó."""
+        if not self.calls:
+            return None
+        rank = q * self.calls
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else round(self.max_seconds * 1000, 3)
+        return round(self.max_seconds * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "avg_ms": round(self.total_seconds * 1000 / self.calls, 4) if self.calls else None,
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "p50_ms": self.percentile_ms(0.5),
+            "p95_ms": self.percentile_ms(0.95),
+            "p99_ms": self.percentile_ms(0.99),
+            "histogram": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class StorageMetrics:
+    """
+    Bộ đếm của một store: thời gian từng thao tác (all, get_by_id, create, ...),
+    số byte đọc/ghi, thời gian chờ khóa và tỉ lệ trúng cache.
+    Lấy bằng metrics_for(tên store); xem snapshot() để đọc số liệu.
+    """
+
+    def __init__(self, name: str, engine: str = ""):
+        self.name = name
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._ops: Dict[str, OperationStats] = {}
+            self.bytes_read = 0
+            self.bytes_written = 0
+            self.lock_waits = 0
+            self.lock_wait_seconds = 0.0
+            self.file_lock_waits = 0
+            self.file_lock_wait_seconds = 0.0
+            self.cache_hits = 0
+            self.cache_misses = 0
+
+    # ------------------------------------------------------------------ #
+    # Ghi nhận
+    # ------------------------------------------------------------------ #
+    def record(self, op: str, seconds: float, failed: bool = False):
+        with self._lock:
+            stats = self._ops.get(op)
+            if stats is None:
+                stats = self._ops[op] = OperationStats()
+            stats.add(seconds, failed)
+
+    def add_bytes_read(self, n: int):
+        with self._lock:
+            self.bytes_read += n
+
+    def add_bytes_written(self, n: int):
+        with self._lock:
+            self.bytes_written += n
+
+    def add_lock_wait(self, seconds: float):
+        with self._lock:
+            self.lock_waits += 1
+            self.lock_wait_seconds += seconds
+
+    def add_file_lock_wait(self, seconds: float):
+        with self._lock:
+            self.file_lock_waits += 1
+            self.file_lock_wait_seconds += seconds
+
+    def cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def cache_miss(self):
+        with self._lock:
+            self.cache_misses += 1
+
+    # ------------------------------------------------------------------ #
+    # Đọc số liệu
+    # ------------------------------------------------------------------ #
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "engine": self.engine,
+                "operations": {op: stats.to_dict() for op, stats in sorted(self._ops.items())},
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "lock_waits": self.lock_waits,
+                "lock_wait_ms": round(self.lock_wait_seconds * 1000, 3),
+                "file_lock_waits": self.file_lock_waits,
+                "file_lock_wait_ms": round(self.file_lock_wait_seconds * 1000, 3),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cache_hit_ratio": round(self.cache_hits / lookups, 4) if lookups else None,
+            }
+
+
+class TimedLock:
+    """Bọc một Lock/RLock, cộng thời gian chờ lấy khóa vào StorageMetrics (dùng với `with`)."""
+
+    __slots__ = ("_lock", "_metrics")
+
+    def __init__(self, lock, metrics: StorageMetrics):
+        self._lock = lock
+        self._metrics = metrics
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._lock.acquire()
+        self._metrics.add_lock_wait(time.perf_counter() - start)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._lock.release()
+        return False
+
+
+def timed_lock(lock, metrics: Optional[StorageMetrics]):
+    """`lock` có đo thời gian chờ, hoặc chính `lock` nếu đo lường đang tắt."""
+    return lock if metrics is None else TimedLock(lock, metrics)
+
+
+def instrumented(op: str) -> Callable:
+    """
+    Decorator cho phương thức của storage: ghi nhận thời gian của mỗi lần gọi vào
+    `self.metrics` dưới tên `op` (bỏ qua nếu self.metrics là None).
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            metrics = self.metrics
+            if metrics is None:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = method(self, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                metrics.record(op, time.perf_counter() - start, failed)
+        return wrapper
+    return decorate
+
+
+# ---------------------------------------------------------------------- #
+# Sổ đăng ký toàn cục
+# ---------------------------------------------------------------------- #
+def set_enabled(enabled: bool):
+    """Bật/tắt đo lường cho các storage được tạo SAU lời gọi này."""
+    global _enabled
+    _enabled = enabled
+
+
+def metrics_for(name: str, engine: str = "") -> Optional[StorageMetrics]:
+    """Bộ đếm của store `name` (các storage cùng tên dùng chung); None nếu đo lường đang tắt."""
+    if not _enabled:
+        return None
+    with _registry_lock:
+        metrics = _registry.get(name)
+        if metrics is None:
+            metrics = _registry[name] = StorageMetrics(name, engine)
+        return metrics
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Số liệu của mọi store: tên store -> StorageMetrics.snapshot()."""
+    with _registry_lock:
+        stores = list(_registry.values())
+    return {m.name: m.snapshot() for m in sorted(stores, key=lambda m: m.name)}
+
+
+def top_operations(stores: Optional[Dict[str, Dict[str, Any]]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    """Các cặp (store, thao tác) tốn nhiều thời gian nhất, giảm dần theo tổng thời gian."""
+    stores = snapshot() if stores is None else stores
+    rows = [
+        {"store": name, "operation": op, "calls": stats["calls"], "total_ms": stats["total_ms"],
+         "avg_ms": stats["avg_ms"]}
+        for name, data in stores.items() for op, stats in data["operations"].items()
+    ]
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows[:limit]
+
+
+def reset():
+    """Xóa số liệu của mọi store (các storage vẫn tiếp tục ghi nhận)."""
+    with _registry_lock:
+        stores = list(_registry.values())
+    for metrics in stores:
+        metrics.reset()
+
+
+def dump(path: str) -> Dict[str, Any]:
+    """Ghi số liệu của mọi store ra file JSON `path` và trả về nội dung đã ghi."""
+    stores = snapshot()
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "uptime_seconds": round(time.time() - _started_at, 1),
+        "top_operations": top_operations(stores),
+        "stores": stores,
+    }
+    dir_path = os.path.dirname(path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return report
@@ -0,0 +1,50 @@
+import threading
+
+from app.services.order_service import OrderService
+
+
+class OrderArchiveCronTask:
+    """
+    Scheduler chạy định kỳ để chuyển các đơn hàng đã đóng và đủ cũ
+    sang kho lưu trữ lạnh (xem OrderService.archive_orders()).
+    """
+
+    def __init__(self, order_service: OrderService, interval_seconds: int, older_than_days: int):
+        self.order_service = order_service
+        self.interval = interval_seconds
+        self.older_than_days = older_than_days
+        self._timer = None
+        self.is_running = False
+
+    def _schedule(self, delay: float):
+        self._timer = threading.Timer(delay, self._run_task)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run_task(self):
+        """Hàm được thực thi mỗi khi scheduler chạy."""
+        if self.is_running:
+            self._schedule(self.interval)
+
+        print(f"🔄 [OrderArchiveCronTask] Lưu trữ các đơn hàng cũ hơn {self.older_than_days} ngày...")
+        try:
+            archived = self.order_service.archive_orders(self.older_than_days)
+            print(f"✅ [OrderArchiveCronTask] Đã chuyển {archived} đơn hàng vào kho lưu trữ.")
+        except Exception as e:
+            print(f"❌ [OrderArchiveCronTask] Lỗi khi lưu trữ đơn hàng: {e}")
+            import traceback
+            traceback.print_exc()
+
+    def start(self):
+        """Bắt đầu chạy scheduler; lần đầu chạy ngay sau khi ứng dụng khởi động xong."""
+        if not self.is_running:
+            self.is_running = True
+            self._schedule(5)
+            print(f"[OrderArchiveCronTask] Đã được khởi động, chạy lại mỗi {self.interval} giây.")
+
+    def stop(self):
+        """Dừng scheduler."""
+        self.is_running = False
+        if self._timer:
+            self._timer.cancel()
+        print("⏹️ [OrderArchiveCronTask] Đã dừng.")
@@ -3,6 +3,7 @@ import time
 import json
 from typing import Dict, List
 
+from app.models.product import to_category_ids
 from app.services.product_service import ProductService
 from app.services.category_service import CategoryService
 from app.models.storage import JsonStorage  # Có thể không cần nếu CategoryService đã xử lý mọi thứ
@@ -10,8 +11,9 @@ from app.models.storage import JsonStorage  # Có thể không cần nếu Categ
 
 class UpdateCategoryCronTask:
     """
-    Scheduler chạy định kỳ để trích xuất và cập nhật danh sách
-    các danh mục (categories) từ dữ liệu sản phẩm, sử dụng CategoryService.
+    Scheduler chạy định kỳ để đồng bộ bảng danh mục (CategoryService) với dữ liệu sản phẩm:
+    sản phẩm chỉ lưu categoryId, nên tác vụ này xóa các danh mục không còn sản phẩm nào
+    tham chiếu, và lấy tên/uri từ các sản phẩm còn lưu danh mục đầy đủ theo kiểu cũ.
     """
 
     def __init__(self, product_service: ProductService, category_service: CategoryService, interval_seconds: int):
@@ -25,12 +27,16 @@ class UpdateCategoryCronTask:
         """
         Trích xuất danh sách các danh mục duy nhất từ dữ liệu sản phẩm.
         Đảm bảo mỗi danh mục có đủ thông tin (categoryId, categoryName, categoryUri).
+        Chỉ danh mục lưu đầy đủ theo kiểu cũ ({"categoryId", "name", "uri"}) mới có tên/uri;
+        tham chiếu categoryId bị bỏ qua ở đây.
         """
         unique_categories_map = {}  # Dùng map để dễ dàng kiểm tra duy nhất theo categoryUri
         for product in products_data:
             # Lưu ý: product.get("categories", []) có thể chứa dict chỉ có name, uri,
             # hoặc cả categoryId. Cần đảm bảo có đủ thông tin để tạo Category object nếu cần.
             for category_info in product.get("categories", []):
+                if not isinstance(category_info, dict):
+                    continue
                 # Sử dụng categoryUri làm khóa chính tạm thời để đảm bảo tính duy nhất
                 cat_uri = category_info.get("uri")
                 if cat_uri:
@@ -79,8 +85,9 @@ class UpdateCategoryCronTask:
                 # Hiện tại, sẽ không có danh mục mới nào được trích xuất
                 return
 
-            # Bước 1: Trích xuất các danh mục mới từ sản phẩm
+            # Bước 1: Trích xuất các danh mục mới từ sản phẩm và các categoryId còn được tham chiếu
             extracted_categories = self._extract_unique_categories(all_products)
+            referenced_ids = {cid for product in all_products for cid in to_category_ids(product.get("categories", []))}
 
             # Bước 2: Lấy các danh mục hiện có trong CategoryService
             existing_categories = self.category_service.list_all_categories()
@@ -127,8 +134,10 @@ class UpdateCategoryCronTask:
                     self.category_service.create_category(new_category_payload)
                     created_count += 1
 
-            # Bước 4: Xóa các danh mục không còn tồn tại trong dữ liệu sản phẩm
+            # Bước 4: Xóa các danh mục không còn sản phẩm nào tham chiếu
             for uri_to_delete, cat_data_to_delete in existing_categories_map.items():
+                if cat_data_to_delete.get('categoryId') in referenced_ids:
+                    continue
                 self.category_service.delete_category(cat_data_to_delete['id'])  # Dùng ID của Category object
                 deleted_count += 1
 
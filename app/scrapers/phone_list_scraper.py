@@ -12,7 +12,9 @@ from bs4 import BeautifulSoup
 
 from app.scrapers.base_scraper import BaseScraper
 from app.models.storage import JsonStorage
-from app.models.product import Product
+from app.models.category import Category
+from app.models.product import Product, to_category_ids
+from app.utils.money import to_vnd
 
 
 class PhoneListScraper(BaseScraper):
@@ -21,9 +23,20 @@ class PhoneListScraper(BaseScraper):
     và lưu vào JsonStorage theo quy trình ETL.
     """
 
-    def __init__(self):
+    def __init__(self, storage=None, category_storage=None):
+        """
+        Args:
+            storage: Storage sản phẩm dùng chung với ứng dụng (main.py truyền vào products_store).
+                     Nếu không có, tự mở data/products.json.
+            category_storage: Bảng danh mục (main.py truyền vào categories_store). Sản phẩm chỉ
+                              lưu categoryId, tên và uri của danh mục được ghi vào đây.
+                              Nếu không có, tự mở data/categories.json.
+        """
         super().__init__("https://api.cellphones.com.vn/v2/graphql/query")
-        self.product_storage = JsonStorage("data/products.json")
+        # Dùng chung instance với ProductService để mọi thay đổi đi qua cùng một cache và khóa ghi
+        self.product_storage = storage if storage is not None else JsonStorage("data/products.json")
+        self.category_storage = category_storage if category_storage is not None \
+            else JsonStorage("data/categories.json")
         self._progress_current = 0
         self._progress_total = 0
         self._progress_created = 0
@@ -135,10 +148,10 @@ class PhoneListScraper(BaseScraper):
 
         return {
             "name": general.get("name"), "sku": general.get("sku"),
-            "price": float(filterable.get("special_price", 0)),
-            "bought_price": float(filterable.get("special_price", 0)) - 1_000_000,
+            "price": to_vnd(filterable.get("special_price", 0)),
+            "bought_price": to_vnd(filterable.get("special_price", 0)) - 1_000_000,
             "avatar": avatar_url, "images": image_urls, "description": description_text,
-            "categories": categories_data,
+            "categories": to_category_ids(categories_data),
             "screen_size": attributes.get("display_size"), "screen_tech": attributes.get("mobile_type_of_display"),
             "camera_sau": attributes.get("camera_primary"), "camera_truoc": attributes.get("camera_secondary"),
             "chipset": attributes.get("chipset"), "nfc": attributes.get("mobile_nfc"),
@@ -167,13 +180,58 @@ class PhoneListScraper(BaseScraper):
         sys.stdout.write(progress_string.ljust(120))
         sys.stdout.flush()
 
+    def _extract_categories(self, raw_api_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Các danh mục (không trùng categoryId) xuất hiện trong dữ liệu thô, theo dạng của bảng danh mục."""
+        categories = {}
+        for api_item in raw_api_data:
+            for category in api_item.get("general", {}).get("categories") or []:
+                category_id = next(iter(to_category_ids([category])), None)
+                if category_id is not None and category.get("uri"):
+                    categories[category_id] = {"categoryId": category_id, "categoryName": category.get("name"),
+                                               "categoryUri": category.get("uri")}
+        return list(categories.values())
+
+    def _new_category(self, category_patch: Dict[str, Any]) -> Dict[str, Any]:
+        """Dựng bản ghi đầy đủ cho một danh mục chưa có trong bảng danh mục."""
+        return asdict(Category(id=str(uuid.uuid4()), created_at=category_patch.get("updated_at", ""), **category_patch))
+
+    def _load_categories(self, categories: List[Dict[str, Any]]):
+        """LOAD - Ghi tên/uri các danh mục vào bảng danh mục (một lần upsert theo categoryId)."""
+        if not categories:
+            return
+        # Chỉ ghi danh mục mới hoặc đổi tên/uri, để không đổi updated_at của cả bảng mỗi lần cào
+        existing = {c.get("categoryId"): c for c in self.category_storage.query(
+            where={"categoryId": ("in", [c["categoryId"] for c in categories])})}
+        now_iso = datetime.now().isoformat(timespec="seconds")
+        changed = [
+            {**c, "updated_at": now_iso} for c in categories
+            if c["categoryId"] not in existing
+            or (existing[c["categoryId"]].get("categoryName"), existing[c["categoryId"]].get("categoryUri"))
+            != (c["categoryName"], c["categoryUri"])
+        ]
+        if changed:
+            counts = self.category_storage.upsert_many(changed, key="categoryId", create_factory=self._new_category)
+            print(f"   Danh mục: {counts['created']} mới, {counts['updated']} cập nhật.")
+
+    def _new_product(self, product_patch: Dict[str, Any]) -> Dict[str, Any]:
+        """Dựng bản ghi sản phẩm đầy đủ cho một sản phẩm chưa có trong kho."""
+        now_iso = datetime.now().isoformat()
+        # Bản vá đã có updated_at (xem _load_products): giá trị của bản vá được giữ
+        new_product = Product(**{"id": str(uuid.uuid4()), "stock": random.randint(100, 300),
+                                 "created_at": now_iso, "updated_at": now_iso, **product_patch})
+        return asdict(new_product)
+
     def _load_products(self, standardized_products: List[Dict[str, Any]]):
         """
-        LOAD - Lưu sản phẩm trong khi một luồng khác hiển thị tiến trình.
+        LOAD - Lưu toàn bộ sản phẩm bằng một lần upsert hàng loạt (một lần ghi file)
+        trong khi một luồng khác hiển thị tiến trình.
         """
         print("   Bắt đầu quá trình lưu trữ dữ liệu...")
-        existing_products = self.product_storage.all()
-        existing_products_lookup = {p['name']: p for p in existing_products}
+        # Sản phẩm không có tên bị bỏ qua như trước; sản phẩm đã có được so khớp theo tên
+        named_products = [p for p in standardized_products if p.get("name")]
+        now_iso = datetime.now().isoformat()
+        for product_patch in named_products:
+            product_patch['updated_at'] = now_iso
 
         self._progress_total = len(standardized_products)
         self._progress_current = 0
@@ -185,30 +243,15 @@ class PhoneListScraper(BaseScraper):
         progress_thread = threading.Thread(target=self._update_progress_periodically, daemon=True)
         progress_thread.start()
 
-        # Vòng lặp chính xử lý dữ liệu (không còn in log cho từng sản phẩm)
-        for product_patch in standardized_products:
-            product_name = product_patch.get("name")
-            if not product_name:
-                self._progress_current += 1
-                continue
-
-            if product_name in existing_products_lookup:
-                existing_product = existing_products_lookup[product_name]
-                product_patch['updated_at'] = datetime.now().isoformat()
-                self.product_storage.update(existing_product['id'], product_patch)
-                self._progress_updated += 1
-            else:
-                now_iso = datetime.now().isoformat()
-
-                new_product = Product(id=str(uuid.uuid4()), stock=random.randint(100, 300), created_at=now_iso, updated_at=now_iso,
-                                      **product_patch)
-                self.product_storage.create(asdict(new_product))
-                self._progress_created += 1
-
-            self._progress_current += 1
-
-        self._loading_in_progress = False
-        progress_thread.join()
+        try:
+            counts = self.product_storage.upsert_many(named_products, key="name",
+                                                      create_factory=self._new_product)
+            self._progress_created = counts["created"]
+            self._progress_updated = counts["updated"]
+            self._progress_current = self._progress_total
+        finally:
+            self._loading_in_progress = False
+            progress_thread.join()
 
         print()
         print(f"   Lưu trữ hoàn tất. Tổng cộng: {self._progress_created} mới, {self._progress_updated} cập nhật.")
@@ -222,5 +265,6 @@ class PhoneListScraper(BaseScraper):
         print(f"   [Extract] Đã lấy được {len(raw_api_data)} sản phẩm thô từ API.")
         standardized_products = [self._transform_to_product_model(item) for item in raw_api_data]
         print(f"   [Transform] Đã chuẩn hóa {len(standardized_products)} sản phẩm.")
+        self._load_categories(self._extract_categories(raw_api_data))
         self._load_products(standardized_products)
         print("-> Quy trình cào dữ liệu cho điện thoại đã hoàn tất.")
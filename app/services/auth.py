@@ -16,9 +16,8 @@ class AuthService:
         self.storage = storage
 
     def ensure_admin_seed(self):
-        # Lấy tất cả người dùng, sau đó lọc ra những ai có role là 'staff'
-        all_users = self.storage.all()
-        admin_users = [user for user in all_users if user.get("role") == "administrator"]
+        # Tra chỉ mục role để xem đã có tài khoản administrator hay chưa
+        admin_users = self.storage.find_by("role", "administrator")
         if not admin_users:
             admin_username =  os.getenv("ADMIN_USERNAME", "administrator").lower()
             admin_password = os.getenv("ADMIN_PASSWORD", "Strongp@ssword123").lower()
@@ -31,8 +30,8 @@ class AuthService:
 
     def login(self, username: str, password: str):
         hpw = hash_password(password)
-        for u in self.storage.all():
-            if u["username"] == username and u["password_hash"] == hpw:
+        for u in self.storage.find_by("username", username):
+            if u["password_hash"] == hpw:
                 return u
         return None
 
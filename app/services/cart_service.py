@@ -1,6 +1,7 @@
 from app.models.cart import Cart
 from app.models.cart_item import CartItem
 from app.models.storage import JsonStorage
+from app.utils.money import to_vnd
 
 from dataclasses import asdict
 from typing import Dict, List
@@ -13,8 +14,8 @@ class CartService:
     def __init__(self, storage: JsonStorage):
         self.storage = storage
 
-        # Khởi tạo một giỏ hàng duy nhất khi bắt đầu
-        all_carts_data = self.storage.all()
+        # Khởi tạo một giỏ hàng duy nhất khi bắt đầu (chỉ cần id của giỏ đầu tiên, không sao chép cả kho)
+        all_carts_data = self.storage.query(fields=["id"], limit=1)
         if not all_carts_data:
             # Tạo một đối tượng Cart mới và lưu trữ nó
             new_cart = Cart(id=str(uuid.uuid4()), items=[])
@@ -37,7 +38,9 @@ class CartService:
         if not cart_data:
             return Cart(id=self.cart_id, items=[])
 
-        items_list = [CartItem(**item_data) for item_data in cart_data.get("items", [])]
+        # Giỏ hàng lưu trước khi chuyển sang tiền số nguyên có thể còn đơn giá dạng float
+        items_list = [CartItem(**{**item_data, "price": to_vnd(item_data.get("price"))})
+                      for item_data in cart_data.get("items", [])]
 
         return Cart(id=cart_data["id"], items=items_list)
 
@@ -59,7 +62,7 @@ class CartService:
             new_item = CartItem(
                 product_id=product.get("id"),
                 name=product.get("name"),
-                price=float(product.get("price", 0)),
+                price=to_vnd(product.get("price", 0)),
                 quantity=quantity,
                 avatar=product.get("avatar", ""),
             )
@@ -89,6 +92,6 @@ class CartService:
         cart.items = []
         self._save_cart(cart)
 
-    def get_total(self) -> float:
+    def get_total(self) -> int:
         cart = self.get_cart()
         return cart.get_total()
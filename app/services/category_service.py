@@ -20,10 +20,17 @@ class CategoryService:
         """
         Tìm một danh mục theo categoryUri.
         """
-        for cat in self.storage.all():
-            if cat.get('categoryUri') == uri:
-                return cat
-        return None
+        return self.storage.find_one("categoryUri", uri)
+
+    def get_category_by_category_id(self, category_id: int) -> Dict | None:
+        """
+        Tìm một danh mục theo categoryId (giá trị sản phẩm lưu trong trường "categories").
+        """
+        return self.storage.find_one("categoryId", category_id)
+
+    def subscribe(self, listener):
+        """Nhận StorageChange mỗi khi dữ liệu danh mục thay đổi. Trả về hàm hủy đăng ký."""
+        return self.storage.subscribe(listener)
 
     def create_category(self, category_data: Dict) -> Dict:
         """
@@ -9,11 +9,9 @@ class CustomerService:
         self.storage = storage
 
     def list(self, keyword: str = ""):
-        data = self.storage.all()
-        if keyword:
-            k = keyword.lower()
-            data = [c for c in data if k in c["name"].lower() or k in c["phone"]]
-        return data
+        if not keyword:
+            return self.storage.all()
+        return self.storage.query(where={"$or": [{"name": ("contains", keyword)}, {"phone": ("contains", keyword)}]})
 
     def create(self, payload: dict):
         payload["id"] = str(uuid.uuid4())
@@ -25,6 +23,16 @@ class CustomerService:
     def delete(self, _id: str):
         return self.storage.delete(_id)
 
+    def get(self, _id: str) -> Dict | None:
+        return self.storage.get_by_id(_id)
+
+    def subscribe(self, listener):
+        """Nhận StorageChange mỗi khi dữ liệu khách hàng thay đổi. Trả về hàm hủy đăng ký."""
+        return self.storage.subscribe(listener)
+
+    def check_for_changes(self) -> int:
+        return self.storage.check_for_changes()
+
     def find_or_create_customer(self, customer_info: dict) -> str:
         """
         Tìm khách hàng theo SĐT, nếu không có thì tạo mới.
@@ -35,8 +43,7 @@ class CustomerService:
             raise ValueError("Số điện thoại là bắt buộc để tìm hoặc tạo khách hàng.")
 
         # Tìm khách hàng theo SĐT
-        all_customers = self.storage.all()
-        found_customer = next((c for c in all_customers if c.get("phone") == phone), None)
+        found_customer = self.find_by_phone(phone)
 
         if found_customer:
             return found_customer["id"]
@@ -55,6 +62,5 @@ class CustomerService:
 
     def find_by_phone(self, phone: str) -> Dict | None:
         """Tìm khách hàng theo số điện thoại."""
-        all_customers = self.storage.all()
-        return next((c for c in all_customers if c.get("phone") == phone), None)
+        return self.storage.find_one("phone", phone)
 
@@ -1,60 +1,77 @@
-from app.models.storage import JsonStorage
+from app.models.storage import JsonStorage, StorageTransaction
 from app.models.order import Order      # Import model mới
 from dataclasses import asdict
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Iterable, Optional
+
+from app.storage_engines.order_archive import OrderArchive
+from app.utils.money import to_vnd
+
+# Đơn hàng ở các trạng thái này không còn thay đổi, có thể chuyển sang kho lưu trữ lạnh
+CLOSED_STATUSES = ("completed", "cancelled")
+
 
 class OrderService:
-    def __init__(self, orders_storage: JsonStorage, products_storage: JsonStorage):
+    def __init__(self, orders_storage: JsonStorage, products_storage: JsonStorage,
+                 archive: Optional[OrderArchive] = None):
         """
         Khởi tạo OrderService.
 
         Args:
             orders_storage: Kho lưu trữ cho các đơn hàng.
             products_storage: Kho lưu trữ cho sản phẩm (để cập nhật tồn kho).
+            archive: Kho lưu trữ lạnh cho đơn hàng cũ (tùy chọn), đọc kèm một cách trong suốt.
         """
         self.orders_storage = orders_storage
         self.products_storage = products_storage
+        self.archive = archive
 
     def create_order(self, payload: dict) -> dict:
         """
         Tạo một đơn hàng mới, cập nhật tồn kho và lưu vào storage.
         Đây chính là phương thức đang bị thiếu.
         """
-        # 1. Tạo một đối tượng Order từ payload do CartView gửi qua
+        # 1. Tạo một đối tượng Order từ payload do CartView gửi qua (số tiền là số nguyên VNĐ)
         new_order = Order(
             customer_id=payload.get("customer_id"),
             customer_info=payload.get("customer_info"),
-            items=payload.get("items"),
-            total_amount=payload.get("total_amount"),
+            items=[{**item, "price": to_vnd(item.get("price"))} for item in payload.get("items") or []],
+            total_amount=to_vnd(payload.get("total_amount")),
             user_id=payload.get("user_id")
         )
 
-        # 2. Cập nhật tồn kho sản phẩm (bước quan trọng)
+        # 2. Cập nhật tồn kho và lưu đơn hàng trong cùng một transaction:
+        #    mọi thay đổi được gom trong bộ nhớ, kiểm tra xong mới ghi (mỗi storage một lần ghi),
+        #    nếu có lỗi thì không có thay đổi nào được lưu.
         try:
-            for item in new_order.items:
-                product_id = item.get("product_id")
-                quantity_ordered = item.get("quantity")
-
-                # Lấy thông tin sản phẩm từ kho
-                product_to_update = self.products_storage.get_by_id(product_id)
-
-                if not product_to_update:
-                    # Nếu sản phẩm không còn tồn tại, hủy tiến trình
-                    raise ValueError(f"Sản phẩm với ID {product_id} không tồn tại.")
-
-                current_stock = int(product_to_update.get("stock", 0))
-                if current_stock < quantity_ordered:
-                    # Nếu không đủ hàng, hủy tiến trình
-                    raise ValueError(f"Không đủ hàng cho sản phẩm '{product_to_update.get('name')}'. "
-                                     f"Còn lại: {current_stock}, Cần mua: {quantity_ordered}")
-
-                # Trừ đi số lượng đã bán
-                new_stock = current_stock - quantity_ordered
-                self.products_storage.update(product_id, {"stock": new_stock})
-                print(f"Đã cập nhật tồn kho cho {product_id}: {current_stock} -> {new_stock}")
-
-            # 3. Nếu tất cả cập nhật tồn kho thành công, lưu đơn hàng vào storage
-            order_dict = asdict(new_order)
-            self.orders_storage.create(order_dict)
+            with StorageTransaction(self.products_storage, self.orders_storage) as tx:
+                for item in new_order.items:
+                    product_id = item.get("product_id")
+                    quantity_ordered = item.get("quantity")
+
+                    # Lấy thông tin sản phẩm (đã tính cả các dòng trước đó trong cùng đơn hàng)
+                    product_to_update = tx.get(self.products_storage, product_id)
+
+                    if not product_to_update:
+                        # Nếu sản phẩm không còn tồn tại, hủy tiến trình
+                        raise ValueError(f"Sản phẩm với ID {product_id} không tồn tại.")
+
+                    current_stock = int(product_to_update.get("stock", 0))
+                    if current_stock < quantity_ordered:
+                        # Nếu không đủ hàng, hủy tiến trình
+                        raise ValueError(f"Không đủ hàng cho sản phẩm '{product_to_update.get('name')}'. "
+                                         f"Còn lại: {current_stock}, Cần mua: {quantity_ordered}")
+
+                    # Trừ đi số lượng đã bán
+                    new_stock = current_stock - quantity_ordered
+                    tx.update(self.products_storage, product_id, {"stock": new_stock})
+                    print(f"Đã cập nhật tồn kho cho {product_id}: {current_stock} -> {new_stock}")
+
+                # 3. Nếu tất cả cập nhật tồn kho hợp lệ, đưa đơn hàng vào cùng transaction
+                order_dict = asdict(new_order)
+                tx.create(self.orders_storage, order_dict)
+
             print(f"Đã tạo thành công đơn hàng !")
 
             # 4. Trả về thông tin đơn hàng vừa tạo (dạng dict)
@@ -67,15 +84,86 @@ class OrderService:
             print(f"LỖI không xác định khi tạo đơn hàng: {e}")
             raise e
 
-    def list_orders(self):
-        """Lấy danh sách tất cả đơn hàng."""
-        return self.orders_storage.all()
+    def list_orders(self, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """
+        Lấy danh sách đơn hàng, có thể giới hạn theo khoảng ngày đặt [start, end].
+        Với storage chia theo tháng (json-partitioned), chỉ các tháng trong khoảng được đọc;
+        đơn đã lưu trữ chỉ được giải nén khi khoảng ngày giao với các segment lưu trữ.
+        """
+        if (start or end) and hasattr(self.orders_storage, 'query'):
+            live = self.orders_storage.query(where=self._date_range(start, end))
+        else:
+            live = self.orders_storage.all()
+        if self.archive is None:
+            return live
+        return list(self.archive.iter_records(start, end)) + live
+
+    def iter_orders(self, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """
+        Duyệt lần lượt các đơn hàng, không dựng cả danh sách trong bộ nhớ.
+        Dùng cho các đoạn chỉ cần quét một lượt (báo cáo, thống kê).
+        Nếu có start/end thì chỉ lấy các đơn trong khoảng đó (xem list_orders()).
+        """
+        if (start or end) and hasattr(self.orders_storage, 'query'):
+            live = iter(self.orders_storage.query(where=self._date_range(start, end)))
+        elif hasattr(self.orders_storage, 'iter_all'):
+            live = self.orders_storage.iter_all()
+        else:
+            live = iter(self.orders_storage.all())
+        if self.archive is None:
+            return live
+        # chain() chỉ mở segment lưu trữ khi người gọi thực sự duyệt tới
+        return chain(self.archive.iter_records(start, end), live)
+
+    @staticmethod
+    def _date_range(start: Optional[datetime], end: Optional[datetime]) -> dict:
+        # order_date là chuỗi ISO nên so sánh chuỗi đúng với thứ tự thời gian
+        conditions = []
+        if start:
+            conditions.append({"order_date": (">=", start.isoformat())})
+        if end:
+            conditions.append({"order_date": ("<=", end.isoformat())})
+        return {"$and": conditions}
 
     def get_order_by_id(self, order_id: str):
-        """Lấy một đơn hàng cụ thể bằng ID."""
-        return self.orders_storage.get_by_id(order_id)
+        """Lấy một đơn hàng cụ thể bằng ID (tìm cả trong kho lưu trữ nếu không còn ở kho chính)."""
+        order = self.orders_storage.get_by_id(order_id)
+        if order is None and self.archive is not None:
+            order = self.archive.get_by_id(order_id)
+        return order
+
+    def archive_orders(self, older_than_days: int, statuses: Iterable[str] = CLOSED_STATUSES) -> int:
+        """
+        Chuyển các đơn hàng đã đóng, đặt cách đây hơn `older_than_days` ngày, sang kho lưu trữ lạnh.
+
+        Returns:
+            Số đơn hàng đã được chuyển.
+        """
+        if self.archive is None:
+            raise ValueError("OrderService chưa được cấu hình kho lưu trữ (archive).")
+        # Hoàn tất lần lưu trữ trước nếu nó bị gián đoạn giữa chừng
+        self.archive.recover(self.orders_storage)
+
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat(timespec="seconds")
+        old_orders = self.orders_storage.query(
+            where={"order_date": ("<", cutoff), "status": ("in", list(statuses))}
+        )
+        if not old_orders:
+            return 0
+        entries = self.archive.write_segments(old_orders)
+        self.orders_storage.delete_many([o["id"] for o in old_orders])
+        self.archive.commit(e["name"] for e in entries)
+        print(f"Đã lưu trữ {len(old_orders)} đơn hàng đặt trước {cutoff} vào {len(entries)} segment.")
+        return len(old_orders)
 
     def update_order_status(self, order_id: str, new_status: str):
         """Cập nhật trạng thái của một đơn hàng (ví dụ: 'pending' -> 'completed')."""
         return self.orders_storage.update(order_id, {"status": new_status})
 
+    def subscribe(self, listener):
+        """Nhận StorageChange mỗi khi dữ liệu đơn hàng thay đổi. Trả về hàm hủy đăng ký."""
+        return self.orders_storage.subscribe(listener)
+
+    def check_for_changes(self) -> int:
+        return self.orders_storage.check_for_changes()
+
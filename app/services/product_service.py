@@ -1,33 +1,283 @@
+import threading
 import uuid
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+from app.models.product import to_category_ids
+from app.models.query import project, split_condition
 from app.models.storage import JsonStorage
+from app.utils.money import to_vnd
+
+# Các trường sản phẩm mà chỉ mục của ProductService cần đọc
+_INDEXED_FIELDS = ["id", "categories", "price"]
+_price_of_entry = itemgetter(0)
+
+
+def _price_key(product: dict) -> int:
+    """Giá dùng trong chỉ mục giá (giá không hợp lệ coi như 0, như khi hiển thị)."""
+    try:
+        return to_vnd(product.get("price"))
+    except ValueError:
+        return 0
 
 
 class ProductService:
-    def __init__(self, storage: JsonStorage):
+    def __init__(self, storage: JsonStorage, category_service=None):
+        """
+        Args:
+            storage: Storage sản phẩm.
+            category_service: Bảng danh mục dùng chung (CategoryService). Sản phẩm chỉ lưu
+                              categoryId, tên/uri được tra ở đây khi cần (categories_of).
+        """
         self.storage = storage
+        self.category_service = category_service
+        # categoryId -> danh mục, dựng lần đầu khi cần và bỏ đi mỗi khi bảng danh mục thay đổi
+        self._categories_by_id: Dict[int, dict] | None = None
+        self._categories_lock = threading.Lock()
+        if category_service is not None and hasattr(category_service, "subscribe"):
+            category_service.subscribe(self._on_categories_changed)
+        # Chỉ mục của sản phẩm, dựng lần đầu khi cần rồi cập nhật theo từng StorageChange
+        # (create/update/delete, upsert của scraper), dựng lại khi dữ liệu bị nạp lại cả kho:
+        # - chỉ mục ngược categoryId -> id các sản phẩm thuộc danh mục (và id -> các categoryId)
+        # - mảng (giá, id) đã sắp xếp cho lọc khoảng giá và sắp xếp theo giá (và id -> giá)
+        # Listener chỉ ghi nhận id cần đọc lại; storage chỉ được truy vấn ngoài _index_lock
+        # (truy vấn có thể nạp lại file và gọi ngược vào listener trên cùng luồng).
+        self._indexed = False
+        self._building = False
+        self._stale_ids: Set[str] = set()
+        self._generation = 0
+        self._products_by_category: Dict[int, Set[str]] = {}
+        self._product_categories: Dict[str, Tuple[int, ...]] = {}
+        self._price_index: List[Tuple[int, str]] = []
+        self._product_prices: Dict[str, int] = {}
+        self._index_lock = threading.Lock()
+        if hasattr(storage, "subscribe"):
+            storage.subscribe(self._on_products_changed)
 
     def list(self, keyword: str = ""):
-        data = self.storage.all()
-        if keyword:
-            k = keyword.lower()
-            data = [p for p in data if k in p["name"].lower() or k in p["sku"].lower()]
-        return data
+        if not keyword:
+            return self.storage.all()
+        return self.storage.query(where={"$or": [{"name": ("contains", keyword)}, {"sku": ("contains", keyword)}]})
+
+    def query(self, where=None, fields=None, order_by=None, limit=None, offset=0):
+        """
+        Lọc/sắp xếp/phân trang ngay trong storage (xem JsonStorage.query). Sắp xếp theo giá
+        ("price"/"-price") khi không lọc hoặc chỉ lọc theo tập id ({"id": ("in", ids)}, xem
+        ProductsView) đi theo chỉ mục giá: chỉ đọc các sản phẩm của trang cần lấy.
+        """
+        if order_by in ("price", "-price"):
+            page_ids = self._price_sorted_page(where, order_by == "-price", limit, offset)
+            if page_ids is not None:
+                return self._get_many(page_ids, fields)
+        return self.storage.query(where=where, fields=fields, order_by=order_by, limit=limit, offset=offset)
+
+    def count(self, where=None) -> int:
+        """Số sản phẩm thỏa `where`."""
+        return self.storage.count(where)
 
     def create(self, payload: dict):
         payload["id"] = str(uuid.uuid4())
         payload["stock"] = int(payload.get("stock", 0))
-        payload["price"] = float(payload.get("price", 0))
+        payload["price"] = to_vnd(payload.get("price", 0))
+        payload["bought_price"] = to_vnd(payload.get("bought_price", 0))
+        payload["categories"] = to_category_ids(payload.get("categories", []))
         return self.storage.create(payload)
 
     def update(self, _id: str, payload: dict):
         if "stock" in payload: payload["stock"] = int(payload["stock"])
-        if "price" in payload: payload["price"] = float(payload["price"])
+        if "price" in payload: payload["price"] = to_vnd(payload["price"])
+        if "bought_price" in payload: payload["bought_price"] = to_vnd(payload["bought_price"])
+        if "categories" in payload: payload["categories"] = to_category_ids(payload["categories"])
         return self.storage.update(_id, payload)
 
     def delete(self, _id: str):
         return self.storage.delete(_id)
 
+    def subscribe(self, listener):
+        """Nhận StorageChange mỗi khi dữ liệu sản phẩm thay đổi. Trả về hàm hủy đăng ký."""
+        return self.storage.subscribe(listener)
+
+    def check_for_changes(self) -> int:
+        return self.storage.check_for_changes()
+
+    # ------------------------------------------------------------------ #
+    # Danh mục: sản phẩm lưu list categoryId, bảng danh mục nằm trong CategoryService
+    # ------------------------------------------------------------------ #
+    def _on_categories_changed(self, change):
+        with self._categories_lock:
+            self._categories_by_id = None
+
+    def _category_table(self) -> Dict[int, dict]:
+        with self._categories_lock:
+            if self._categories_by_id is None:
+                categories = self.category_service.list_all_categories() if self.category_service else []
+                self._categories_by_id = {c.get("categoryId"): c for c in categories}
+            return self._categories_by_id
+
+    def categories_of(self, product: dict) -> List[dict]:
+        """
+        Các danh mục (bản ghi của bảng danh mục: categoryId, categoryName, categoryUri) của
+        một sản phẩm, theo thứ tự lưu. categoryId không còn trong bảng danh mục bị bỏ qua.
+        """
+        ids = to_category_ids(product.get("categories", [])) if product else []
+        if not ids:
+            return []
+        table = self._category_table()
+        return [table[cid] for cid in ids if cid in table]
+
+    def category_ids_for_uris(self, uris: Iterable[str]) -> List[int]:
+        """categoryId của các danh mục có categoryUri trong `uris` (uri không có bị bỏ qua)."""
+        wanted = set(uris)
+        return [cid for cid, c in self._category_table().items() if c.get("categoryUri") in wanted]
+
+    def _index_categories(self, product_id: str, category_ids: Iterable[int]):
+        """Đặt lại các danh mục của một sản phẩm trong chỉ mục ngược (giữ khóa khi gọi)."""
+        for cid in self._product_categories.pop(product_id, ()):
+            members = self._products_by_category.get(cid)
+            if members is not None:
+                members.discard(product_id)
+                if not members:
+                    del self._products_by_category[cid]
+        category_ids = tuple(category_ids)
+        if category_ids:
+            self._product_categories[product_id] = category_ids
+            for cid in category_ids:
+                self._products_by_category.setdefault(cid, set()).add(product_id)
+
+    def _index_price(self, product_id: str, price: Optional[int]):
+        """Đặt lại giá của một sản phẩm trong mảng (giá, id) đã sắp xếp (giữ khóa khi gọi)."""
+        old = self._product_prices.pop(product_id, None)
+        if old is not None:
+            pos = bisect_left(self._price_index, (old, product_id))
+            if pos < len(self._price_index) and self._price_index[pos] == (old, product_id):
+                del self._price_index[pos]
+        if price is not None:
+            self._product_prices[product_id] = price
+            insort(self._price_index, (price, product_id))
+
+    def _on_products_changed(self, change):
+        with self._index_lock:
+            if change.reloaded:
+                # Cả kho vừa được nạp lại: dựng lại chỉ mục ở lần dùng tới
+                self._indexed = False
+                self._stale_ids = set()
+                self._generation += 1
+            elif self._indexed or self._building:
+                self._stale_ids.update(change.created, change.updated, change.deleted)
+
+    def _ensure_indexes(self):
+        """
+        Đưa các chỉ mục sản phẩm về dữ liệu hiện tại: dựng mới nếu chưa có, hoặc đọc lại
+        các sản phẩm vừa đổi. Không được gọi khi đang giữ _index_lock.
+        """
+        # Thay đổi của bản ứng dụng khác trên cùng dữ liệu đến listener trước khi dùng chỉ mục
+        if hasattr(self.storage, "check_for_changes"):
+            self.storage.check_for_changes()
+        while True:
+            with self._index_lock:
+                if self._indexed and not self._stale_ids:
+                    return
+                full = not self._indexed
+                stale, self._stale_ids = self._stale_ids, set()
+                generation = self._generation
+                self._building = self._building or full
+            if full:
+                products = self.storage.query(fields=_INDEXED_FIELDS)
+            else:
+                # Đọc lại các sản phẩm vừa đổi trong một lần truy vấn (theo id)
+                products = self.storage.query(where={"id": ("in", stale)}, fields=_INDEXED_FIELDS)
+            with self._index_lock:
+                if generation != self._generation:
+                    # Kho bị nạp lại trong lúc truy vấn: kết quả có thể đã cũ
+                    continue
+                if full:
+                    self._build_indexes(products)
+                else:
+                    current = {p.get("id"): p for p in products}
+                    for product_id in stale:
+                        product = current.get(product_id)
+                        self._index_categories(product_id, to_category_ids(product.get("categories", [])) if product else ())
+                        self._index_price(product_id, _price_key(product) if product else None)
+
+    def _build_indexes(self, products: Iterable[dict]):
+        """Dựng lại toàn bộ chỉ mục từ `products` (giữ khóa khi gọi)."""
+        self._products_by_category, self._product_categories = {}, {}
+        self._product_prices = {}
+        for product in products:
+            product_id = product.get("id")
+            self._index_categories(product_id, to_category_ids(product.get("categories", [])))
+            self._product_prices[product_id] = _price_key(product)
+        # Sắp xếp một lần thay vì chèn từng phần tử
+        self._price_index = sorted((price, product_id) for product_id, price in self._product_prices.items())
+        # Thay đổi đến trong lúc truy vấn vẫn nằm trong _stale_ids, được áp ở vòng sau
+        self._indexed = True
+        self._building = False
+
+    def product_ids_in_categories(self, uris: Iterable[str], match_all: bool = False) -> Set[str]:
+        """
+        id các sản phẩm thuộc ít nhất một danh mục (match_all: thuộc mọi danh mục) có
+        categoryUri trong `uris`, tính bằng hợp/giao các tập trong chỉ mục ngược: chi phí
+        tỉ lệ với số sản phẩm của các danh mục đó, không phải với cả danh mục sản phẩm.
+        """
+        uris = set(uris)
+        category_ids = self.category_ids_for_uris(uris)
+        self._ensure_indexes()
+        with self._index_lock:
+            groups = [self._products_by_category.get(cid, set()) for cid in category_ids]
+            if not match_all:
+                return set().union(*groups)
+            # uri không có trong bảng danh mục: không sản phẩm nào thuộc mọi danh mục đã chọn
+            if not groups or len(category_ids) < len(uris):
+                return set()
+            smallest, *others = sorted(groups, key=len)
+            return smallest.intersection(*others)
+
+    def product_ids_in_price_range(self, min_price: Optional[int] = None, max_price: Optional[int] = None) -> List[str]:
+        """
+        id các sản phẩm có giá trong [min_price, max_price] (None: không giới hạn), theo thứ tự
+        (giá, id) tăng dần. Hai lần bisect trên chỉ mục giá: O(log n + k).
+        """
+        self._ensure_indexes()
+        with self._index_lock:
+            index = self._price_index
+            lo = 0 if min_price is None else bisect_left(index, min_price, key=_price_of_entry)
+            hi = len(index) if max_price is None else bisect_right(index, max_price, key=_price_of_entry)
+            return [product_id for _, product_id in index[lo:hi]]
+
+    def _price_sorted_page(self, where, descending: bool, limit: Optional[int], offset: int) -> Optional[List[str]]:
+        """
+        id các sản phẩm của một trang sắp xếp theo giá, lấy từ chỉ mục giá; None nếu `where`
+        có điều kiện khác ngoài tập id (khi đó để storage lọc và sắp xếp).
+        """
+        candidates = None
+        if where is not None:
+            if not isinstance(where, dict) or list(where) != ["id"]:
+                return None
+            op, candidates = split_condition(where["id"])
+            if op != "in":
+                return None
+        end = None if limit is None else offset + limit
+        self._ensure_indexes()
+        with self._index_lock:
+            if candidates is None:
+                # Cả danh mục sản phẩm: cắt thẳng trên mảng đã sắp xếp, O(trang)
+                index, n = self._price_index, len(self._price_index)
+                if not descending:
+                    return [product_id for _, product_id in index[offset:end]]
+                lo = 0 if end is None else max(0, n - end)
+                return [product_id for _, product_id in reversed(index[lo:max(0, n - offset)])]
+            prices = self._product_prices
+            entries = sorted(((prices[i], i) for i in candidates if i in prices), reverse=descending)
+            return [product_id for _, product_id in entries[offset:end]]
+
+    def _get_many(self, ids: List[str], fields=None) -> List[dict]:
+        """Các sản phẩm theo đúng thứ tự `ids` (id không còn bị bỏ qua), chỉ giữ các trường `fields`."""
+        if not ids:
+            return []
+        found = {p.get("id"): p for p in self.storage.query(where={"id": ("in", set(ids))})}
+        return [project(found[i], fields) if fields else found[i] for i in ids if i in found]
+
     def get_product_by_id(self, product_id: str) -> dict | None:
         """
         Tìm kiếm và trả về thông tin sản phẩm theo ID.
@@ -77,21 +327,20 @@ class ProductService:
                 return c
         return None
 
-    def get_cost_by_sku(self, sku: str) -> float:
+    def get_cost_by_sku(self, sku: str) -> int:
         """
         Retrieves the cost ('bought_product') of a product by its SKU.
         Returns 0 if the product or cost is not found.
         """
         if not sku:
-            return 0.0
+            return 0
 
-        all_products = self.list()
-        for product in all_products:
-            if product.get('sku') == sku:
-                # The cost is stored in the 'bought_product' field
-                cost = product.get('bought_product')
-                # Ensure the returned value is a float, defaulting to 0.0
-                return float(cost or 0.0)
+        product = self.storage.find_one("sku", sku)
+        if product:
+            # The cost is stored in the 'bought_product' field
+            cost = product.get('bought_product')
+            # Money is stored as integer VND
+            return to_vnd(cost)
 
         # Return 0 if no product with the given SKU is found
-        return 0.0
\ No newline at end of file
+        return 0
\ No newline at end of file
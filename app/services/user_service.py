@@ -23,11 +23,9 @@ class UserService:
         Returns:
             Danh sách các người dùng khớp với từ khóa.
         """
-        data = self.storage.all()
-        if keyword:
-            k = keyword.lower()
-            data = [u for u in data if k in u.get("username", "").lower() or k in u.get("name", "").lower()]
-        return data
+        if not keyword:
+            return self.storage.all()
+        return self.storage.query(where={"$or": [{"username": ("contains", keyword)}, {"name": ("contains", keyword)}]})
 
     def create(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -78,8 +76,7 @@ class UserService:
         Returns:
             Dictionary của người dùng tìm thấy, hoặc None nếu không tìm thấy.
         """
-        all_users = self.storage.all()
-        return next((u for u in all_users if u.get("username") == username), None)
+        return self.storage.find_one("username", username)
 
     def authenticate(self, username: str, password_hash: str) -> Dict[str, Any] | None:
         """
@@ -0,0 +1,218 @@
+import json, os, threading
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+from app.models.storage import JsonStorage, StorageIndex, load_records
+
+
+class AppendLogStorage(JsonStorage):
+    """
+    Storage dạng nhật ký chỉ-ghi-thêm (append-only journal).
+
+    - File snapshot (`<name>.json` hoặc `<name>.bin`) có cùng định dạng với JsonStorage.
+    - Mỗi create/update/delete được ghi thành MỘT dòng JSON vào `<name>.journal`,
+      nên chi phí ghi tỉ lệ với kích thước bản ghi, không phải cả kho. Thao tác
+      hàng loạt ghi tất cả các dòng của lô rồi flush một lần.
+    - Khi mở, snapshot được nạp rồi journal được phát lại (replay) vào bộ nhớ.
+    - Một luồng nền định kỳ gộp (compact) journal vào snapshot khi số thao tác
+      trong journal vượt ngưỡng. close() luôn compact lần cuối.
+    """
+
+    def __init__(self, path: str, indexes: Optional[Iterable[StorageIndex]] = None,
+                 compact_interval: float = 30, compact_threshold: int = 1000, fsync: bool = False,
+                 encoding: str = "json", record_type: Optional[type] = None):
+        """
+        Args:
+            path: Đường dẫn file snapshot.
+            indexes: Các chỉ mục phụ cần duy trì.
+            compact_interval: Chu kỳ (giây) luồng nền kiểm tra để compact. 0 để tắt luồng nền.
+            compact_threshold: Số thao tác trong journal để kích hoạt compact.
+            fsync: Nếu True, gọi os.fsync sau mỗi dòng journal (bền hơn, chậm hơn).
+            encoding: Định dạng của file snapshot (xem app.models.storage.ENCODINGS).
+            record_type: Dạng bản ghi gọn trong bộ nhớ (xem JsonStorage).
+        """
+        self._compact_interval = compact_interval
+        self._compact_threshold = compact_threshold
+        self._fsync = fsync
+        self._journal = None
+        self._journal_ops = 0
+        self._compact_lock = threading.Lock()
+        super().__init__(path, indexes=indexes, encoding=encoding, record_type=record_type)
+
+        base = os.path.splitext(self.path)[0]
+        self.journal_path = base + ".journal"
+        self._compacting_path = base + ".journal.compacting"
+
+        self._stop_event = threading.Event()
+        self._compactor = None
+        if compact_interval > 0:
+            self._compactor = threading.Thread(target=self._compaction_loop, daemon=True)
+            self._compactor.start()
+
+    # ------------------------------------------------------------------ #
+    # Nạp dữ liệu: snapshot + replay journal
+    # ------------------------------------------------------------------ #
+    def _is_fresh(self, snap) -> bool:
+        # Snapshot trên đĩa chỉ đổi khi compact, từ chính dữ liệu trong bộ nhớ
+        return True
+
+    def _streams_from_file(self) -> bool:
+        # Snapshot trên đĩa chưa gồm các thao tác còn trong journal
+        return False
+
+    def _read(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self._cache is None:
+                snapshot = load_records(self.path)
+                records = {x.get("id"): x for x in snapshot}
+                replayed = 0
+                # File .compacting còn sót lại nghĩa là lần compact trước chưa xong
+                for journal_path in (self._compacting_path, self.journal_path):
+                    replayed += self._replay(journal_path, records)
+                if self.metrics is not None:
+                    self.metrics.add_bytes_read(sum(
+                        os.path.getsize(path) for path in (self.path, self._compacting_path, self.journal_path)
+                        if os.path.exists(path)
+                    ))
+                self._cache = self._compact_all(list(records.values()))
+                self._rebuild_index()
+                self._journal_ops = replayed
+            return self._cache
+
+    @staticmethod
+    def _replay(journal_path: str, records: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Áp dụng các dòng journal vào `records` (id -> bản ghi, giữ thứ tự chèn).
+        Các thao tác là idempotent nên phát lại journal đã nằm trong snapshot vẫn an toàn.
+        """
+        if not os.path.exists(journal_path):
+            return 0
+        count = 0
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng cuối bị ghi dở khi ứng dụng dừng đột ngột
+                    print(f"[AppendLog] Bỏ qua dòng hỏng {line_no} trong {journal_path}")
+                    continue
+                op, _id = entry.get("op"), entry.get("id")
+                if op == "create":
+                    records[_id] = entry["data"]
+                elif op in ("update", "replace") and _id in records:
+                    record = records[_id]
+                    if op == "replace":
+                        record.clear()
+                    record.update(entry["data"])
+                    if record.get("id") != _id:
+                        # Đổi id: dựng lại dict để giữ đúng thứ tự
+                        items = [(record.get("id") if k == _id else k, v) for k, v in records.items()]
+                        records.clear()
+                        records.update(items)
+                elif op == "delete":
+                    records.pop(_id, None)
+                count += 1
+        return count
+
+    # ------------------------------------------------------------------ #
+    # Ghi dữ liệu
+    # ------------------------------------------------------------------ #
+    def _journal_file(self):
+        if self._journal is None:
+            journal = open(self.journal_path, "a", encoding="utf-8")
+            if journal.tell() > 0:
+                with open(self.journal_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+                if torn:
+                    # Dòng cuối bị ghi dở khi dừng đột ngột: xuống dòng để dòng mới không dính vào nó
+                    journal.write("\n")
+            self._journal = journal
+        return self._journal
+
+    def _commit_many(self, changes: List[Tuple[str, str, Optional[Dict[str, Any]]]]):
+        lines = []
+        for op, _id, payload in changes:
+            entry = {"op": op, "id": _id}
+            if payload is not None:
+                entry["data"] = payload
+            lines.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        data = "".join(lines)
+        try:
+            f = self._journal_file()
+            f.write(data)
+            f.flush()
+            if self._fsync:
+                os.fsync(f.fileno())
+        except Exception:
+            self.invalidate()
+            raise
+        self._journal_ops += len(lines)
+        if self.metrics is not None:
+            self.metrics.add_bytes_written(len(data.encode("utf-8")))
+
+    def _write(self, data: List[Dict[str, Any]]):
+        # save_all(): thay toàn bộ dữ liệu rồi compact ngay để journal cũ không còn hiệu lực
+        with self._lock:
+            if data is not self._cache:
+                self._cache = self._compact_all(data)
+                self._rebuild_index()
+        self.compact()
+
+    def invalidate(self):
+        with self._lock:
+            self._close_journal()
+            super().invalidate()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # ------------------------------------------------------------------ #
+    # Compaction
+    # ------------------------------------------------------------------ #
+    def compact(self):
+        """
+        Gộp journal vào snapshot. Chỉ giữ khóa ghi trong lúc chụp dữ liệu và xoay
+        file journal; việc ghi snapshot ra đĩa diễn ra ngoài khóa.
+        """
+        with self._compact_lock:
+            with self._lock:
+                data = [x.copy() for x in self._read()]
+                self._close_journal()
+                if os.path.exists(self.journal_path):
+                    if os.path.exists(self._compacting_path):
+                        # Lần compact trước thất bại: nối tiếp journal vào file đang chờ gộp
+                        with open(self.journal_path, "r", encoding="utf-8") as src, \
+                                open(self._compacting_path, "a", encoding="utf-8") as dst:
+                            dst.write(src.read())
+                        os.remove(self.journal_path)
+                    else:
+                        os.replace(self.journal_path, self._compacting_path)
+                self._journal_ops = 0
+
+            self._atomic_dump(data)
+            if os.path.exists(self._compacting_path):
+                os.remove(self._compacting_path)
+
+    def _compaction_loop(self):
+        while not self._stop_event.wait(self._compact_interval):
+            if self._journal_ops >= self._compact_threshold:
+                try:
+                    self.compact()
+                    print(f"[AppendLog] Đã compact journal vào {os.path.basename(self.path)}")
+                except Exception as e:
+                    print(f"[AppendLog] Lỗi khi compact {self.path}: {e}")
+
+    def close(self):
+        """Dừng luồng compact, gộp journal lần cuối và đóng file."""
+        self._stop_event.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=5)
+        if self._journal_ops or os.path.exists(self.journal_path):
+            self.compact()
+        with self._lock:
+            self._close_journal()
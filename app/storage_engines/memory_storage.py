@@ -0,0 +1,51 @@
+import os
+from typing import List, Dict, Any, Optional, Iterable
+
+from app.models.storage import JsonStorage, StorageIndex, load_records
+
+
+class MemoryStorage(JsonStorage):
+    """
+    Storage chỉ nằm trong bộ nhớ, không bao giờ ghi xuống đĩa.
+    Nếu file JSON ở `path` tồn tại, dữ liệu của nó được nạp một lần làm dữ liệu ban đầu.
+    Phù hợp cho benchmark, chạy thử hoặc các kho có thể dựng lại được.
+    """
+
+    def __init__(self, path: Optional[str] = None, indexes: Optional[Iterable[StorageIndex]] = None,
+                 initial: Optional[List[Dict[str, Any]]] = None, record_type: Optional[type] = None):
+        self._initial = initial
+        super().__init__(path or "", indexes=indexes, process_lock=False, record_type=record_type)
+
+    def _ensure_file(self):
+        # Không tạo file: storage này không có gì trên đĩa
+        pass
+
+    def _is_fresh(self, snap) -> bool:
+        # Bộ nhớ là nguồn dữ liệu duy nhất, ảnh chụp đã công bố luôn là mới nhất
+        return True
+
+    def _streams_from_file(self) -> bool:
+        # Dữ liệu chỉ nằm trong bộ nhớ (file chỉ là dữ liệu ban đầu)
+        return False
+
+    def _read(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self._cache is None:
+                if self._initial is not None:
+                    self._cache = self._compact_all([dict(x) for x in self._initial])
+                elif os.path.isfile(self.path) and os.path.getsize(self.path) > 0:
+                    self._cache = self._compact_all(load_records(self.path))
+                else:
+                    self._cache = self._compact_all([])
+                self._rebuild_index()
+            return self._cache
+
+    def _write(self, data: List[Dict[str, Any]]):
+        with self._lock:
+            if data is not self._cache:
+                self._cache = self._compact_all(data)
+                self._rebuild_index()
+
+    def invalidate(self):
+        # Bộ nhớ chính là nguồn dữ liệu duy nhất, không có gì để đọc lại
+        pass
@@ -0,0 +1,226 @@
+import gzip, json, lzma, os, threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+from app.models.storage import FileLock
+from app.utils.money import to_vnd
+
+# Kiểu nén -> (đuôi file segment, hàm mở file)
+ARCHIVE_COMPRESSIONS = {
+    "gzip": (".jsonl.gz", gzip.open),
+    "lzma": (".jsonl.xz", lzma.open),
+}
+
+PENDING = "pending"
+COMMITTED = "committed"
+
+
+def _iso(value) -> Optional[str]:
+    # order_date là chuỗi ISO nên mốc thời gian cũng được so sánh dưới dạng chuỗi ISO
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+class OrderArchive:
+    """
+    Kho lưu trữ lạnh cho đơn hàng cũ.
+
+    - Mỗi lần lưu trữ ghi các segment nén (gzip/lzma), mỗi segment chứa đơn hàng của
+      một tháng dưới dạng JSON Lines. Segment đã ghi không bao giờ bị sửa.
+    - `index.json` là chỉ mục tóm tắt: với mỗi segment có khoảng ngày, số đơn, tổng tiền
+      và trạng thái. Đọc theo khoảng ngày chỉ giải nén các segment giao với khoảng đó.
+    - Việc chuyển đơn hàng có hai bước: segment được ghi ở trạng thái "pending", rồi
+      đơn hàng bị xóa khỏi kho chính, cuối cùng segment mới được đánh dấu "committed".
+      Người đọc bỏ qua segment pending (đơn hàng vẫn còn ở kho chính); recover() hoàn
+      tất các lần lưu trữ bị gián đoạn.
+    - Số tiền (`amount_field` và `item_amount_fields` của từng phần tử trong "items") được
+      trả về dạng số nguyên VNĐ, kể cả với segment ghi từ trước khi chuyển sang tiền số nguyên.
+    """
+
+    def __init__(self, directory: str, compression: str = "gzip", date_field: str = "order_date",
+                 amount_field: str = "total_amount", item_amount_fields: Iterable[str] = ("price", "cost")):
+        if compression not in ARCHIVE_COMPRESSIONS:
+            raise ValueError(f"Kiểu nén '{compression}' không hợp lệ. Hỗ trợ: {', '.join(ARCHIVE_COMPRESSIONS)}")
+        self.path = directory
+        self.compression = compression
+        self.date_field = date_field
+        self.amount_field = amount_field
+        self.item_amount_fields = tuple(item_amount_fields)
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.RLock()
+        self._file_lock = None
+        self._index: List[Dict[str, Any]] = []
+        self._index_sig = None
+
+    # ------------------------------------------------------------------ #
+    # Chỉ mục tóm tắt
+    # ------------------------------------------------------------------ #
+    def _entries(self) -> List[Dict[str, Any]]:
+        """Các mục trong index.json (chỉ đọc lại file khi nó thay đổi)."""
+        with self._lock:
+            try:
+                st = os.stat(self.index_path)
+            except FileNotFoundError:
+                return []
+            sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if sig != self._index_sig:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+                self._index_sig = sig
+            return self._index
+
+    def _save_index(self, entries: List[Dict[str, Any]]):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def _locked(self) -> FileLock:
+        # Khóa liên tiến trình cho mọi thao tác sửa index.json
+        if self._file_lock is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._file_lock = FileLock(os.path.join(self.path, "index.lock"))
+        return self._file_lock
+
+    def segments(self, start=None, end=None, include_pending: bool = False) -> List[Dict[str, Any]]:
+        """
+        Các segment có khoảng ngày giao với [start, end] (None = không giới hạn),
+        theo thứ tự thời gian.
+        """
+        start, end = _iso(start), _iso(end)
+        found = []
+        for entry in self._entries():
+            if entry["status"] != COMMITTED and not include_pending:
+                continue
+            if (start and entry["end"] < start) or (end and entry["start"] > end):
+                continue
+            found.append(dict(entry))
+        return sorted(found, key=lambda e: (e["start"], e["name"]))
+
+    def summary(self, start=None, end=None) -> Dict[str, Any]:
+        """Số đơn và tổng tiền của các segment giao với [start, end], tính từ chỉ mục (không giải nén)."""
+        entries = self.segments(start, end)
+        return {
+            "segments": len(entries),
+            "count": sum(e["count"] for e in entries),
+            "total_amount": sum(to_vnd(e["total_amount"]) for e in entries),
+            "start": min((e["start"] for e in entries), default=None),
+            "end": max((e["end"] for e in entries), default=None),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Đọc
+    # ------------------------------------------------------------------ #
+    def _read_segment(self, entry: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        opener = ARCHIVE_COMPRESSIONS[entry["compression"]][1]
+        with opener(os.path.join(self.path, entry["name"]), "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield self._to_vnd(json.loads(line))
+
+    def _to_vnd(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Đổi các số tiền còn dạng float của đơn cũ sang số nguyên VNĐ (segment không bao giờ bị sửa)."""
+        amount = record.get(self.amount_field)
+        if amount is not None and type(amount) is not int:
+            record[self.amount_field] = to_vnd(amount)
+        items = record.get("items")
+        if self.item_amount_fields and isinstance(items, list):
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                for name in self.item_amount_fields:
+                    value = item.get(name)
+                    if value is not None and type(value) is not int:
+                        item[name] = to_vnd(value)
+        return record
+
+    def iter_records(self, start=None, end=None) -> Iterator[Dict[str, Any]]:
+        """Duyệt các đơn đã lưu trữ có ngày trong [start, end]; chỉ giải nén các segment liên quan."""
+        start, end = _iso(start), _iso(end)
+        for entry in self.segments(start, end):
+            for record in self._read_segment(entry):
+                value = record.get(self.date_field)
+                if (start and value < start) or (end and value > end):
+                    continue
+                yield record
+
+    def get_by_id(self, _id: str) -> Optional[Dict[str, Any]]:
+        """Tìm một đơn đã lưu trữ theo id (duyệt các segment từ mới tới cũ)."""
+        for entry in reversed(self.segments()):
+            for record in self._read_segment(entry):
+                if record.get("id") == _id:
+                    return record
+        return None
+
+    # ------------------------------------------------------------------ #
+    # Ghi
+    # ------------------------------------------------------------------ #
+    def write_segments(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Ghi các đơn hàng thành segment nén (mỗi tháng một segment), đăng ký vào chỉ mục
+        ở trạng thái pending. Trả về các mục chỉ mục vừa tạo.
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            groups.setdefault(record[self.date_field][:7], []).append(record)
+        if not groups:
+            return []
+
+        ext, opener = ARCHIVE_COMPRESSIONS[self.compression]
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        with self._lock, self._locked():
+            created = []
+            for month, group in sorted(groups.items()):
+                name = f"{month}.{stamp}{ext}"
+                seg_path = os.path.join(self.path, name)
+                tmp_path = f"{seg_path}.{os.getpid()}.tmp"
+                with opener(tmp_path, "wt", encoding="utf-8") as f:
+                    for record in group:
+                        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                with open(tmp_path, "rb") as f:
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, seg_path)
+                dates = [r[self.date_field] for r in group]
+                created.append({
+                    "name": name,
+                    "compression": self.compression,
+                    "start": min(dates),
+                    "end": max(dates),
+                    "count": len(group),
+                    "total_amount": sum(to_vnd(r.get(self.amount_field)) for r in group),
+                    "bytes": os.path.getsize(seg_path),
+                    "archived_at": datetime.now().isoformat(timespec="seconds"),
+                    "status": PENDING,
+                })
+            self._save_index(self._entries() + created)
+            return created
+
+    def commit(self, names: Iterable[str]):
+        """Đánh dấu các segment đã hoàn tất (đơn hàng đã được xóa khỏi kho chính)."""
+        names = set(names)
+        with self._lock, self._locked():
+            entries = [dict(e, status=COMMITTED) if e["name"] in names else e for e in self._entries()]
+            self._save_index(entries)
+
+    def recover(self, live_storage) -> int:
+        """
+        Hoàn tất các lần lưu trữ bị gián đoạn: xóa khỏi kho chính các đơn nằm trong segment
+        pending rồi đánh dấu committed. Trả về số segment đã hoàn tất.
+        """
+        with self._lock, self._locked():
+            pending = [e for e in self._entries() if e["status"] == PENDING]
+            for entry in pending:
+                ids = [r.get("id") for r in self._read_segment(entry)]
+                live_storage.delete_many(ids)
+            if pending:
+                self.commit(e["name"] for e in pending)
+            return len(pending)
+
+    def close(self):
+        with self._lock:
+            if self._file_lock is not None:
+                self._file_lock.close()
+                self._file_lock = None
@@ -0,0 +1,544 @@
+import json, os, re, threading
+from itertools import chain, islice
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence, Callable
+
+from app.models.query import OrderBy, Where, parse_order_by, project, sort_records, split_condition
+from app.models.storage import ChangeNotifier, JsonStorage, StorageIndex, load_records
+from app.models.storage_metrics import instrumented, metrics_for, timed_lock
+
+UNDATED = "undated"
+# Bảng id -> phân vùng của mọi bản ghi (JSON Lines [id, tháng], chỉ ghi thêm; dòng sau thắng)
+ID_LOG = "ids.log"
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+
+def partition_of(value: Any) -> str:
+    """Phân vùng (YYYY-MM) của một giá trị ngày dạng ISO; giá trị không hợp lệ thuộc UNDATED."""
+    if isinstance(value, str) and _MONTH_RE.match(value[:7]):
+        return value[:7]
+    return UNDATED
+
+
+def _may_contain(month: str, where: Where, field: str) -> bool:
+    """
+    Phân vùng `month` có thể chứa bản ghi thỏa `where` hay không (chỉ xét các điều kiện
+    trên trường phân vùng; các điều kiện khác để shard tự lọc). Trả lời "có" khi không chắc.
+    """
+    if not isinstance(where, dict) or month == UNDATED:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_may_contain(month, branch, field) for branch in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_may_contain(month, branch, field) for branch in condition):
+                return False
+            continue
+        if key != field:
+            continue
+        op, expected = split_condition(condition)
+        if op == "in":
+            values = list(expected)
+            if all(isinstance(v, str) for v in values) and month not in {v[:7] for v in values}:
+                return False
+            continue
+        if not isinstance(expected, str):
+            continue
+        # Mọi giá trị trong phân vùng đều bắt đầu bằng `month`, nên so sánh theo 7 ký tự đầu là đủ
+        if op == "==" and month != expected[:7]:
+            return False
+        if op in (">", ">=") and month < expected[:7]:
+            return False
+        if op in ("<", "<=") and month > expected[:7]:
+            return False
+    return True
+
+
+class PartitionedStorage(ChangeNotifier):
+    """
+    Storage chia theo tháng của một trường ngày (mặc định `order_date`): mỗi tháng
+    `YYYY-MM` là một shard riêng (`<thư mục>/2025-08.json`), bản ghi không có ngày
+    hợp lệ nằm trong shard `undated`.
+
+    - Ghi chỉ chạm tới shard của tháng tương ứng, nên đơn hàng mới được thêm vào file
+      nhỏ của tháng hiện tại thay vì ghi lại cả kho.
+    - query()/count() loại bỏ các shard không thể thỏa điều kiện trên trường ngày
+      (partition pruning): báo cáo một tháng chỉ đọc đúng một file.
+    - Shard chỉ được mở (và nạp vào bộ nhớ) khi được dùng tới. Tra theo id dùng bảng
+      id -> phân vùng trong `ids.log` (dựng một lần nếu chưa có), nên id không tồn tại
+      không làm mở mọi shard.
+
+    Có cùng giao diện với JsonStorage nên dùng được với service và StorageTransaction.
+    """
+
+    def __init__(self, directory: str, partition_field: str = "order_date",
+                 indexes: Optional[Iterable[StorageIndex]] = None, encoding: str = "json", warm_start: bool = False,
+                 shard_factory: Optional[Callable[[str], Any]] = None, legacy_path: Optional[str] = None,
+                 record_type: Optional[type] = None):
+        """
+        Args:
+            directory: Thư mục chứa các shard (được tạo nếu chưa có).
+            partition_field: Trường ngày dạng ISO dùng để chia phân vùng.
+            indexes: Các chỉ mục phụ, được duy trì trong từng shard.
+            encoding: Định dạng file của các shard (xem app.models.storage.ENCODINGS).
+            warm_start: Bật warm snapshot cho các shard mặc định (xem JsonStorage).
+            shard_factory: Hàm (đường dẫn) -> storage cho một shard; mặc định là JsonStorage có cache.
+            legacy_path: File dữ liệu chưa phân vùng; nếu thư mục chưa có shard nào,
+                         dữ liệu của file này được chia vào các shard một lần.
+            record_type: Dạng bản ghi gọn trong bộ nhớ của các shard mặc định (xem JsonStorage).
+        """
+        super().__init__()
+        self.path = directory
+        self.partition_field = partition_field
+        self._indexes = list(indexes or [])
+        self._encoding = encoding
+        self._ext = ".bin" if encoding == "binary" else ".json"
+        name = os.path.basename(os.path.normpath(directory))
+        # Mỗi shard có số liệu riêng dưới tên "<store>/<tháng>"
+        self._shard_factory = shard_factory or (
+            lambda path: JsonStorage(path, indexes=self._indexes, encoding=self._encoding, warm_start=warm_start,
+                                     metrics_name=f"{name}/{os.path.splitext(os.path.basename(path))[0]}",
+                                     record_type=record_type)
+        )
+        self._lock = threading.RLock()
+        self.metrics = metrics_for(name, type(self).__name__)
+        self._timed_lock = timed_lock(self._lock, self.metrics)
+        self._shards: Dict[str, Any] = {}
+        self._unsubscribes = []
+        # id -> phân vùng, điền dần khi tra cứu/ghi; luôn được kiểm tra lại trước khi dùng
+        self._locations: Dict[str, str] = {}
+        # Bản trong bộ nhớ của ids.log (chung cho mọi tiến trình) và vị trí đã đọc tới
+        self._id_log_path = os.path.join(directory, ID_LOG)
+        self._id_map: Optional[Dict[str, str]] = None
+        self._id_log_pos = (None, 0)
+        self._known_partitions = set()
+
+        os.makedirs(directory, exist_ok=True)
+        if legacy_path and not self.partitions() and os.path.isfile(legacy_path) \
+                and os.path.getsize(legacy_path) > 0:
+            self._migrate(legacy_path)
+        self._known_partitions = set(self.partitions())
+
+    # ------------------------------------------------------------------ #
+    # Shard
+    # ------------------------------------------------------------------ #
+    def _shard_path(self, month: str) -> str:
+        return os.path.join(self.path, month + self._ext)
+
+    def partitions(self) -> List[str]:
+        """Các phân vùng đang có trên đĩa, theo thứ tự thời gian (UNDATED đứng đầu)."""
+        months = []
+        for name in os.listdir(self.path):
+            month, ext = os.path.splitext(name)
+            if ext == self._ext and (month == UNDATED or _MONTH_RE.match(month)):
+                months.append(month)
+        # "undated" > mọi "YYYY-MM" theo thứ tự chuỗi, nên đặt riêng lên đầu
+        return sorted(months, key=lambda m: (m != UNDATED, m))
+
+    def _shard(self, month: str, create: bool = False):
+        """Storage của phân vùng `month`; None nếu chưa có và không yêu cầu tạo."""
+        with self._lock:
+            shard = self._shards.get(month)
+            if shard is None:
+                if not create and not os.path.exists(self._shard_path(month)):
+                    return None
+                shard = self._shard_factory(self._shard_path(month))
+                if hasattr(shard, "subscribe"):
+                    self._unsubscribes.append(shard.subscribe(self._forward))
+                self._shards[month] = shard
+            return shard
+
+    def _forward(self, event):
+        # Chuyển sự kiện của shard thành sự kiện của cả kho (version riêng, tăng dần)
+        self._queue_change(event.created, event.updated, event.deleted, event.reloaded)
+        self._dispatch()
+
+    def _month_of(self, record: Dict[str, Any]) -> str:
+        return partition_of(record.get(self.partition_field))
+
+    def _locate(self, _id: str) -> Optional[str]:
+        """Phân vùng đang chứa bản ghi `_id`; chỉ mở shard mà ids.log ghi cho id đó."""
+        cached = self._locations.pop(_id, None)
+        if cached is not None:
+            shard = self._shard(cached)
+            if shard is not None and shard.get_by_id(_id) is not None:
+                self._locations[_id] = cached
+                return cached
+        month = self._partition_ids().get(_id)
+        if month is not None and month != cached:
+            shard = self._shard(month)
+            if shard is not None and shard.get_by_id(_id) is not None:
+                self._locations[_id] = month
+                return month
+        return None
+
+    # ------------------------------------------------------------------ #
+    # Bảng id -> phân vùng (ids.log)
+    # ------------------------------------------------------------------ #
+    def _partition_ids(self) -> Dict[str, str]:
+        """
+        Bảng id -> phân vùng, đọc thêm các dòng tiến trình khác vừa ghi vào ids.log.
+        Nếu chưa có file (dữ liệu từ phiên bản cũ), bảng được dựng một lần từ các shard.
+        """
+        with self._lock:
+            try:
+                st = os.stat(self._id_log_path)
+            except FileNotFoundError:
+                self._write_id_log({
+                    r.get("id"): month for month in self.partitions()
+                    for r in self._shard(month).query(fields=["id"])
+                })
+                return self._id_map
+            ino, pos = self._id_log_pos
+            if self._id_map is None or ino != st.st_ino or st.st_size < pos:
+                # Lần đầu, hoặc file vừa được viết lại (save_all): đọc từ đầu
+                self._id_map, pos = {}, 0
+            if st.st_size > pos:
+                with open(self._id_log_path, "rb") as f:
+                    f.seek(pos)
+                    chunk = f.read(st.st_size - pos)
+                # Chỉ lấy các dòng đã ghi xong
+                done = chunk.rfind(b"\n") + 1
+                for line in chunk[:done].splitlines():
+                    try:
+                        _id, month = json.loads(line)
+                    except (ValueError, TypeError):
+                        continue
+                    self._id_map[_id] = month
+                pos += done
+            self._id_log_pos = (st.st_ino, pos)
+            return self._id_map
+
+    @staticmethod
+    def _id_lines(pairs: Iterable[Any]) -> str:
+        return "".join(json.dumps([_id, month], ensure_ascii=False) + "\n" for _id, month in pairs)
+
+    def _write_id_log(self, locations: Dict[str, str]):
+        """Viết lại ids.log từ `locations` (ghi file tạm rồi thay thế)."""
+        tmp_path = f"{self._id_log_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self._id_lines(locations.items()))
+        os.replace(tmp_path, self._id_log_path)
+        st = os.stat(self._id_log_path)
+        self._id_map = dict(locations)
+        self._id_log_pos = (st.st_ino, st.st_size)
+
+    def _remember(self, pairs: Iterable[Any]):
+        """Ghi nhận phân vùng của các bản ghi vừa tạo/chuyển/đổi id: [(id, tháng), ...]."""
+        pairs = list(pairs)
+        if not pairs:
+            return
+        ids = self._partition_ids()
+        for _id, month in pairs:
+            self._locations[_id] = month
+            ids[_id] = month
+        data = self._id_lines(pairs).encode("utf-8")
+        # Một lần write() với O_APPEND: các tiến trình cùng ghi không chen vào giữa dòng
+        fd = os.open(self._id_log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size:
+                with open(self._id_log_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # Dòng cuối bị ghi dở khi dừng đột ngột
+                        data = b"\n" + data
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _migrate(self, legacy_path: str):
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        records = load_records(legacy_path)
+        for record in records:
+            groups.setdefault(self._month_of(record), []).append(record)
+        for month, group in groups.items():
+            self._shard(month, create=True).save_all(group)
+        self._write_id_log({r.get("id"): month for month, group in groups.items() for r in group})
+        print(f"[Storage] Đã chia {len(records)} bản ghi từ {os.path.basename(legacy_path)} "
+              f"vào {len(groups)} phân vùng trong {self.path}.")
+
+    # ------------------------------------------------------------------ #
+    # Đọc
+    # ------------------------------------------------------------------ #
+    def _pruned(self, where: Where) -> List[str]:
+        return [m for m in self.partitions() if _may_contain(m, where, self.partition_field)]
+
+    @instrumented("all")
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self.iter_all())
+
+    def iter_all(self) -> Iterator[Dict[str, Any]]:
+        """Duyệt lần lượt các shard theo thứ tự thời gian."""
+        for month in self.partitions():
+            shard = self._shard(month)
+            yield from (shard.iter_all() if hasattr(shard, "iter_all") else shard.all())
+
+    @instrumented("get_by_id")
+    def get_by_id(self, _id: str) -> Optional[Dict[str, Any]]:
+        with self._timed_lock:
+            month = self._locate(_id)
+            return self._shard(month).get_by_id(_id) if month is not None else None
+
+    @instrumented("find_by")
+    def find_by(self, index: str, value: Any) -> List[Dict[str, Any]]:
+        if index not in {idx.name for idx in self._indexes}:
+            raise KeyError(f"Storage '{self.path}' không có chỉ mục '{index}'.")
+        return list(chain.from_iterable(self._shard(m).find_by(index, value) for m in self.partitions()))
+
+    def find_one(self, index: str, value: Any) -> Optional[Dict[str, Any]]:
+        found = self.find_by(index, value)
+        return found[0] if found else None
+
+    @instrumented("query")
+    def query(self, where: Where = None, fields: Optional[Sequence[str]] = None, order_by: OrderBy = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Như JsonStorage.query(), chỉ đọc các shard có thể chứa kết quả. Nếu sắp xếp
+        trước hết theo trường phân vùng và có limit, các shard được duyệt theo chiều
+        sắp xếp và dừng ngay khi đã đủ offset+limit bản ghi.
+        """
+        months = self._pruned(where)
+        end = None if limit is None else offset + limit
+        keys = parse_order_by(order_by)
+        if keys and keys[0][0] == self.partition_field and end is not None:
+            dated = [m for m in months if m != UNDATED]
+            if keys[0][1]:
+                dated.reverse()
+            collected = self._shard(UNDATED).query(where=where, order_by=order_by, limit=end) \
+                if UNDATED in months else []
+            dated_count = 0
+            for month in dated:
+                found = self._shard(month).query(where=where, order_by=order_by, limit=end)
+                collected.extend(found)
+                dated_count += len(found)
+                if dated_count >= end:
+                    # Mọi bản ghi ở các tháng còn lại đều đứng sau những bản ghi đã lấy
+                    break
+            page = sort_records(collected, order_by, limit, offset)
+        elif keys:
+            collected = []
+            for month in months:
+                collected.extend(self._shard(month).query(where=where, order_by=order_by, limit=end))
+            page = sort_records(collected, order_by, limit, offset)
+        else:
+            results = (r for m in months for r in self._shard(m).query(where=where))
+            page = list(islice(results, offset, end))
+        return [project(r, fields) for r in page]
+
+    @instrumented("count")
+    def count(self, where: Where = None) -> int:
+        return sum(self._shard(m).count(where) for m in self._pruned(where))
+
+    # ------------------------------------------------------------------ #
+    # Ghi
+    # ------------------------------------------------------------------ #
+    @instrumented("create")
+    def create(self, obj: Dict[str, Any]):
+        with self._timed_lock:
+            month = self._month_of(obj)
+            result = self._shard(month, create=True).create(obj)
+            self._remember([(obj.get("id"), month)])
+            return result
+
+    @instrumented("create_many")
+    def create_many(self, objs: Iterable[Dict[str, Any]]) -> int:
+        """
+        Tạo nhiều bản ghi, mỗi shard một lần ghi. Trả về số bản ghi đã tạo.
+        Nếu một shard ghi lỗi, các bản ghi đã tạo ở shard trước được xóa lại.
+        """
+        with self._timed_lock:
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for obj in objs:
+                groups.setdefault(self._month_of(obj), []).append(obj)
+            done = []
+            try:
+                for month, group in groups.items():
+                    self._shard(month, create=True).create_many(group)
+                    done.append((month, group))
+            except Exception:
+                for month, group in done:
+                    for obj in group:
+                        self._shard(month).delete(obj.get("id"))
+                raise
+            self._remember((obj.get("id"), month) for month, group in done for obj in group)
+            return sum(len(group) for group in groups.values())
+
+    @instrumented("update")
+    def update(self, _id: str, patch: Dict[str, Any]):
+        with self._timed_lock:
+            month = self._locate(_id)
+            if month is None:
+                return None
+            if self.partition_field in patch and partition_of(patch[self.partition_field]) != month:
+                return self._move(month, _id, patch)
+            result = self._shard(month).update(_id, patch)
+            if result is not None and result.get("id") != _id:
+                self._locations.pop(_id, None)
+                self._remember([(result.get("id"), month)])
+            return result
+
+    def _move(self, month: str, _id: str, patch: Dict[str, Any]) -> Dict[str, Any]:
+        """Áp bản vá làm đổi tháng: tạo bản ghi ở shard mới rồi xóa khỏi shard cũ."""
+        shard = self._shard(month)
+        record = {**shard.get_by_id(_id), **patch}
+        new_month = self._month_of(record)
+        self._shard(new_month, create=True).create(record)
+        shard.delete(_id)
+        self._locations.pop(_id, None)
+        self._remember([(record.get("id"), new_month)])
+        return dict(record)
+
+    @instrumented("update_many")
+    def update_many(self, patches_by_id: Dict[str, Dict[str, Any]]) -> int:
+        """Áp nhiều bản vá {id: patch}, mỗi shard một lần ghi. Trả về số bản ghi đã cập nhật."""
+        with self._timed_lock:
+            groups: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            moves = []
+            for _id, patch in patches_by_id.items():
+                month = self._locate(_id)
+                if month is None:
+                    continue
+                if self.partition_field in patch and partition_of(patch[self.partition_field]) != month:
+                    moves.append((month, _id, patch))
+                else:
+                    groups.setdefault(month, {})[_id] = patch
+            updated = sum(self._shard(month).update_many(group) for month, group in groups.items())
+            self._remember((patch["id"], month) for month, group in groups.items()
+                           for _id, patch in group.items() if patch.get("id", _id) != _id)
+            for month, _id, patch in moves:
+                self._move(month, _id, patch)
+            return updated + len(moves)
+
+    @instrumented("replace_many")
+    def replace_many(self, records_by_id: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Như JsonStorage.replace_many(), mỗi shard một lần ghi. Bản ghi mới thuộc tháng khác
+        được chuyển sang shard của tháng đó.
+        """
+        with self._timed_lock:
+            groups: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            moves = []
+            for _id, record in records_by_id.items():
+                month = self._locate(_id)
+                if month is None:
+                    continue
+                if self._month_of(record) != month:
+                    moves.append((month, _id, record))
+                else:
+                    groups.setdefault(month, {})[_id] = record
+            replaced = sum(self._shard(month).replace_many(group) for month, group in groups.items())
+            self._remember((record.get("id"), month) for month, group in groups.items()
+                           for _id, record in group.items() if record.get("id") != _id)
+            for month, _id, record in moves:
+                self._shard(self._month_of(record), create=True).create(dict(record))
+                self._shard(month).delete(_id)
+                self._locations.pop(_id, None)
+                self._remember([(record.get("id"), self._month_of(record))])
+            return replaced + len(moves)
+
+    @instrumented("upsert_many")
+    def upsert_many(self, records: Iterable[Dict[str, Any]], key: str = "id",
+                    create_factory: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, int]:
+        """Như JsonStorage.upsert_many(); bản ghi mới được đưa vào shard theo tháng của nó."""
+        with self._timed_lock:
+            patches: Dict[str, Dict[str, Any]] = {}
+            creates: List[Dict[str, Any]] = []
+            created_keys: Dict[Any, Dict[str, Any]] = {}
+            for patch in records:
+                value = patch.get(key)
+                _id = self._id_for(key, value) if value is not None else None
+                if _id is not None:
+                    patches.setdefault(_id, {}).update(patch)
+                elif value is not None and value in created_keys:
+                    # Trùng khóa trong cùng lô: gộp vào bản ghi sắp tạo
+                    created_keys[value].update(patch)
+                else:
+                    record = dict(create_factory(patch) if create_factory else patch)
+                    creates.append(record)
+                    if value is not None:
+                        created_keys[value] = record
+            updated = self.update_many(patches) if patches else 0
+            created = self.create_many(creates) if creates else 0
+            return {"created": created, "updated": updated}
+
+    def _id_for(self, key: str, value: Any) -> Optional[str]:
+        if key == "id":
+            return value if self._locate(value) is not None else None
+        found = self.query(where={key: value}, fields=["id"], limit=1)
+        return found[0]["id"] if found else None
+
+    @instrumented("delete")
+    def delete(self, _id: str) -> bool:
+        with self._timed_lock:
+            month = self._locate(_id)
+            if month is None:
+                return False
+            self._locations.pop(_id, None)
+            return self._shard(month).delete(_id)
+
+    @instrumented("delete_many")
+    def delete_many(self, ids: Iterable[str]) -> int:
+        """Xóa nhiều bản ghi, mỗi shard một lần ghi. Trả về số bản ghi đã xóa."""
+        with self._timed_lock:
+            groups: Dict[str, List[str]] = {}
+            for _id in ids:
+                month = self._locate(_id)
+                if month is not None:
+                    groups.setdefault(month, []).append(_id)
+                    self._locations.pop(_id, None)
+            return sum(self._shard(month).delete_many(group) for month, group in groups.items())
+
+    @instrumented("save_all")
+    def save_all(self, data: List[Dict[str, Any]]):
+        """Thay toàn bộ dữ liệu: chia lại theo tháng, các shard không còn bản ghi được làm rỗng."""
+        with self._timed_lock:
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for record in data:
+                groups.setdefault(self._month_of(record), []).append(record)
+            for month in set(self.partitions()) | set(groups):
+                self._shard(month, create=True).save_all(groups.get(month, []))
+            self._locations = {r.get("id"): m for m, group in groups.items() for r in group}
+            self._write_id_log(self._locations)
+
+    # ------------------------------------------------------------------ #
+    # Vòng đời
+    # ------------------------------------------------------------------ #
+    def check_for_changes(self) -> int:
+        """Kiểm tra các shard đang mở; shard mới do tiến trình khác tạo được báo là reloaded."""
+        with self._lock:
+            opened = list(self._shards.values())
+            current = set(self.partitions())
+            added = current - self._known_partitions
+            self._known_partitions = current
+        for shard in opened:
+            if hasattr(shard, "check_for_changes"):
+                shard.check_for_changes()
+        if added:
+            self._queue_change(reloaded=True)
+            self._dispatch()
+        return self.version
+
+    def invalidate(self):
+        with self._lock:
+            self._locations = {}
+            self._id_map = None
+            for shard in self._shards.values():
+                if hasattr(shard, "invalidate"):
+                    shard.invalidate()
+
+    @instrumented("flush")
+    def flush(self):
+        for shard in list(self._shards.values()):
+            if hasattr(shard, "flush"):
+                shard.flush()
+
+    def close(self):
+        with self._lock:
+            for unsubscribe in self._unsubscribes:
+                unsubscribe()
+            self._unsubscribes = []
+            for shard in self._shards.values():
+                if hasattr(shard, "close"):
+                    shard.close()
+            self._shards = {}
@@ -0,0 +1,143 @@
+import os
+from typing import Callable, Dict, Iterable, Optional
+
+from app.models.product import CompactProduct
+from app.models.storage import ENCODINGS, JsonStorage, StorageIndex, dump_records, load_records
+from app.storage_engines.append_log_storage import AppendLogStorage
+from app.storage_engines.memory_storage import MemoryStorage
+from app.storage_engines.partitioned_storage import PartitionedStorage
+from app.storage_engines.sqlite_storage import SqliteStorage
+
+DEFAULT_ENGINE = "json-cached"
+DEFAULT_ENCODING = "json"
+
+# Trường ngày dùng để chia phân vùng theo tháng cho engine "json-partitioned"
+PARTITION_FIELDS = {"orders": "order_date"}
+DEFAULT_PARTITION_FIELD = "created_at"
+
+# Store -> dạng bản ghi gọn trong bộ nhớ cho các engine JSON có cache (xem app.models.compact_record)
+RECORD_TYPES = {"products": CompactProduct}
+
+
+def _json_path(data_dir: str, store_name: str) -> str:
+    return os.path.join(data_dir, f"{store_name}.json")
+
+
+def encoding_for(store_name: str) -> str:
+    """
+    Định dạng file của một store: STORAGE_ENCODING_<STORE>, rồi STORAGE_ENCODING,
+    cuối cùng là DEFAULT_ENCODING.
+    """
+    value = os.getenv(f"STORAGE_ENCODING_{store_name.upper()}") or os.getenv("STORAGE_ENCODING") or DEFAULT_ENCODING
+    value = value.strip().lower()
+    if value not in ENCODINGS:
+        raise ValueError(f"Encoding '{value}' không hợp lệ. Hỗ trợ: {', '.join(ENCODINGS)}")
+    return value
+
+
+def warm_start_enabled() -> bool:
+    """STORAGE_WARM_START: ghi/nạp warm snapshot cho các engine JSON có cache (mặc định bật)."""
+    return os.getenv("STORAGE_WARM_START", "true").strip().lower() in ("true", "1", "t", "on")
+
+
+def record_type_for(store_name: str) -> Optional[type]:
+    """
+    Dạng bản ghi trong bộ nhớ của một store: lớp trong RECORD_TYPES, hoặc None (dict thường)
+    nếu store không có hoặc STORAGE_COMPACT_RECORDS=false.
+    """
+    if os.getenv("STORAGE_COMPACT_RECORDS", "true").strip().lower() not in ("true", "1", "t", "on"):
+        return None
+    return RECORD_TYPES.get(store_name)
+
+
+def _data_path(data_dir: str, store_name: str) -> str:
+    """
+    Đường dẫn file dữ liệu theo encoding của store. Định dạng nhị phân dùng `<name>.bin`;
+    lần đầu chuyển sang, dữ liệu được chuyển đổi từ `<name>.json` cùng tên.
+    """
+    if encoding_for(store_name) != "binary":
+        return _json_path(data_dir, store_name)
+    bin_path = os.path.join(data_dir, f"{store_name}.bin")
+    json_path = _json_path(data_dir, store_name)
+    if not os.path.exists(bin_path) and os.path.exists(json_path) and os.path.getsize(json_path) > 0:
+        data = load_records(json_path)
+        dump_records(bin_path, data, "binary")
+        print(f"[Storage] Đã chuyển {len(data)} bản ghi từ {store_name}.json sang {store_name}.bin.")
+    return bin_path
+
+
+def _create_sqlite(data_dir: str, store_name: str, indexes: Optional[Iterable[StorageIndex]]):
+    storage = SqliteStorage(os.path.join(data_dir, f"{store_name}.db"), indexes=indexes)
+    # Lần đầu chuyển sang SQLite: nạp dữ liệu sẵn có từ file JSON cùng tên
+    imported = storage.import_json(_json_path(data_dir, store_name))
+    if imported:
+        print(f"[Storage] Đã nạp {imported} bản ghi từ {store_name}.json vào SQLite.")
+    return storage
+
+
+def _create_partitioned(data_dir: str, store_name: str, indexes: Optional[Iterable[StorageIndex]]):
+    # Các shard nằm trong thư mục <data_dir>/<store>/; lần đầu dữ liệu được chia từ <store>.json
+    return PartitionedStorage(
+        os.path.join(data_dir, store_name),
+        partition_field=PARTITION_FIELDS.get(store_name, DEFAULT_PARTITION_FIELD),
+        indexes=indexes, encoding=encoding_for(store_name), warm_start=warm_start_enabled(),
+        legacy_path=_json_path(data_dir, store_name), record_type=record_type_for(store_name),
+    )
+
+
+# Tên engine -> hàm khởi tạo (data_dir, store_name, indexes) -> storage
+STORAGE_ENGINES: Dict[str, Callable] = {
+    "json": lambda data_dir, name, indexes: JsonStorage(
+        _data_path(data_dir, name), indexes=indexes, cache=False, encoding=encoding_for(name),
+    ),
+    "json-cached": lambda data_dir, name, indexes: JsonStorage(
+        _data_path(data_dir, name), indexes=indexes, encoding=encoding_for(name), warm_start=warm_start_enabled(),
+        record_type=record_type_for(name),
+    ),
+    "json-write-behind": lambda data_dir, name, indexes: JsonStorage(
+        _data_path(data_dir, name), indexes=indexes, encoding=encoding_for(name), write_behind=True,
+        warm_start=warm_start_enabled(), record_type=record_type_for(name),
+        flush_delay=float(os.getenv("STORAGE_FLUSH_DELAY_SECONDS", 0.5)),
+        max_flush_delay=float(os.getenv("STORAGE_MAX_FLUSH_DELAY_SECONDS", 5)),
+    ),
+    "sqlite": _create_sqlite,
+    "append-log": lambda data_dir, name, indexes: AppendLogStorage(
+        _data_path(data_dir, name), indexes=indexes, encoding=encoding_for(name),
+        compact_interval=float(os.getenv("STORAGE_COMPACT_INTERVAL_SECONDS", 30)),
+        compact_threshold=int(os.getenv("STORAGE_COMPACT_THRESHOLD", 1000)),
+        record_type=record_type_for(name),
+    ),
+    "json-partitioned": _create_partitioned,
+    "in-memory": lambda data_dir, name, indexes: MemoryStorage(
+        _data_path(data_dir, name), indexes=indexes, record_type=record_type_for(name),
+    ),
+}
+
+
+def register_engine(name: str, factory: Callable):
+    """Đăng ký thêm một storage engine dưới tên `name`."""
+    STORAGE_ENGINES[name] = factory
+
+
+def engine_for(store_name: str) -> str:
+    """
+    Xác định engine cho một store từ biến môi trường:
+    STORAGE_ENGINE_<STORE> (ví dụ STORAGE_ENGINE_ORDERS=sqlite), nếu không có thì
+    dùng STORAGE_ENGINE, cuối cùng là DEFAULT_ENGINE.
+    """
+    value = os.getenv(f"STORAGE_ENGINE_{store_name.upper()}") or os.getenv("STORAGE_ENGINE") or DEFAULT_ENGINE
+    return value.strip().lower()
+
+
+def create_storage(store_name: str, data_dir: str, indexes: Optional[Iterable[StorageIndex]] = None,
+                   engine: Optional[str] = None):
+    """
+    Tạo storage cho store `store_name` (users, orders, ...) trong thư mục `data_dir`
+    bằng engine được chọn (tham số `engine` hoặc cấu hình .env).
+    """
+    engine = engine or engine_for(store_name)
+    if engine not in STORAGE_ENGINES:
+        raise ValueError(f"Storage engine '{engine}' không tồn tại. "
+                         f"Các engine hỗ trợ: {', '.join(STORAGE_ENGINES)}")
+    print(f"[Storage] {store_name}: engine '{engine}'")
+    return STORAGE_ENGINES[engine](data_dir, store_name, indexes)
@@ -0,0 +1,558 @@
+import json, os, re, sqlite3, threading
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence, Tuple
+
+from app.models.query import OrderBy, Where, compile_where, parse_order_by, project, sort_records, split_condition
+from app.models.storage import ChangeNotifier, StorageIndex, load_records
+from app.models.storage_metrics import instrumented, metrics_for, timed_lock
+
+
+def _fold(value):
+    # Chữ thường kiểu Python (đúng cả với tiếng Việt có dấu, khác lower() của SQLite chỉ hiểu ASCII)
+    return value.lower() if isinstance(value, str) else value
+
+
+# Tập giá trị "in" dài hơn được lọc bằng Python (SQLite giới hạn số tham số mỗi câu lệnh)
+_MAX_IN_VALUES = 10_000
+_SQL_OPERATORS = {"==": "IS", "!=": "IS NOT", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+_SQL_TYPES = (str, int, float, type(None))
+# SQLite xếp mọi TEXT sau mọi số, còn Python coi so sánh khác kiểu là không thỏa (query._test):
+# các phép so sánh thứ tự chỉ được áp dụng cho giá trị cùng loại với vế phải
+_ORDERING_OPERATORS = ("<", "<=", ">", ">=")
+
+
+class SqliteStorage(ChangeNotifier):
+    """
+    Storage engine lưu mỗi bản ghi là một document JSON trong một bảng SQLite.
+    Có cùng giao diện với JsonStorage (all/get_by_id/create/update/delete/save_all,
+    find_by/find_one), nhưng mỗi thao tác ghi chỉ chạm tới đúng một dòng.
+
+    - Cột `id` và các chỉ mục theo tên trường là cột sinh (generated column)
+      từ json_extract(doc, ...) và được đánh index trong SQLite.
+    - Chỉ mục khai báo bằng hàm (ví dụ nhiều giá trị mỗi bản ghi) được lưu ở
+      bảng phụ `<table>_keys` và cập nhật trong cùng transaction.
+    - Database chạy ở chế độ WAL, câu lệnh SQL là hằng số để sqlite3 tái sử dụng
+      prepared statement từ cache.
+    - Phát StorageChange như JsonStorage; thay đổi từ tiến trình khác được phát hiện
+      qua PRAGMA data_version trong check_for_changes().
+    """
+
+    def __init__(self, path: str, indexes: Optional[Iterable[StorageIndex]] = None, table: str = "records"):
+        super().__init__()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.path = os.path.join(base_dir, '..', path)
+        self.path = os.path.abspath(self.path)
+        self._lock = threading.RLock()
+        self.metrics = metrics_for(os.path.splitext(os.path.basename(self.path))[0], type(self).__name__)
+        self._timed_lock = timed_lock(self._lock, self.metrics)
+
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Tên bảng không hợp lệ: '{table}'")
+        self.table = table
+        self._indexes: Dict[str, StorageIndex] = {idx.name: idx for idx in (indexes or [])}
+        for name in self._indexes:
+            if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+                raise ValueError(f"Tên chỉ mục không hợp lệ: '{name}'")
+
+        dir_path = os.path.dirname(self.path)
+        if dir_path and not os.path.exists(dir_path):
+            os.makedirs(dir_path, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_function("py_fold", 1, _fold, deterministic=True)
+        self._create_schema()
+        self._prepare_sql()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        print('[DEBUG] path : ', self.path)
+
+    # ------------------------------------------------------------------ #
+    # Schema
+    # ------------------------------------------------------------------ #
+    def _create_schema(self):
+        t = self.table
+        with self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {t} ("
+                f" seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                f" doc TEXT NOT NULL,"
+                f" id TEXT GENERATED ALWAYS AS (json_extract(doc, '$.id')) STORED)"
+            )
+            self._conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {t}_id ON {t}(id)")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {t}_keys (name TEXT NOT NULL, value, id TEXT NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {t}_keys_lookup ON {t}_keys(name, value)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {t}_keys_owner ON {t}_keys(id)")
+
+            existing_cols = {row[1] for row in self._conn.execute(f"PRAGMA table_xinfo({t})")}
+            for name, idx in self._indexes.items():
+                if not self._is_column_index(idx):
+                    continue
+                col = f"idx_{name}"
+                if col not in existing_cols:
+                    # ALTER TABLE chỉ cho phép thêm cột sinh dạng VIRTUAL
+                    self._conn.execute(
+                        f"ALTER TABLE {t} ADD COLUMN {col} "
+                        f"GENERATED ALWAYS AS (json_extract(doc, '$.\"{idx.key}\"')) VIRTUAL"
+                    )
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {t}_{col} ON {t}({col})")
+
+    @staticmethod
+    def _is_column_index(idx: StorageIndex) -> bool:
+        return isinstance(idx.key, str) and '"' not in idx.key
+
+    def _prepare_sql(self):
+        t = self.table
+        self._sql_all = f"SELECT doc FROM {t} ORDER BY seq"
+        self._sql_page = f"SELECT seq, doc FROM {t} WHERE seq > ? ORDER BY seq LIMIT ?"
+        self._sql_get = f"SELECT doc FROM {t} WHERE id = ?"
+        self._sql_insert = f"INSERT INTO {t}(doc) VALUES (?)"
+        self._sql_update = f"UPDATE {t} SET doc = ? WHERE id = ?"
+        self._sql_delete = f"DELETE FROM {t} WHERE id = ?"
+        self._sql_clear = f"DELETE FROM {t}"
+        self._sql_keys_insert = f"INSERT INTO {t}_keys(name, value, id) VALUES (?, ?, ?)"
+        self._sql_keys_delete = f"DELETE FROM {t}_keys WHERE id = ?"
+        self._sql_keys_clear = f"DELETE FROM {t}_keys"
+        self._sql_keys_find = (
+            f"SELECT r.doc FROM {t}_keys k JOIN {t} r ON r.id = k.id "
+            f"WHERE k.name = ? AND k.value = ? ORDER BY r.seq"
+        )
+        self._sql_find_col = {
+            name: f"SELECT doc FROM {t} WHERE idx_{name} = ? ORDER BY seq"
+            for name, idx in self._indexes.items() if self._is_column_index(idx)
+        }
+        # Trường -> cột có index trong SQLite (id có unique index riêng)
+        self._field_columns = {"id": "id"}
+        self._field_columns.update(
+            (idx.key, f"idx_{name}") for name, idx in self._indexes.items() if self._is_column_index(idx)
+        )
+
+    # ------------------------------------------------------------------ #
+    # Helpers
+    # ------------------------------------------------------------------ #
+    def _dumps(self, obj: Dict[str, Any]) -> str:
+        doc = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+        if self.metrics is not None:
+            # Số byte ghi được tính theo độ dài document JSON (SQLite không cho biết số byte thật)
+            self.metrics.add_bytes_written(len(doc))
+        return doc
+
+    def _loads(self, doc: str) -> Dict[str, Any]:
+        if self.metrics is not None:
+            self.metrics.add_bytes_read(len(doc))
+        return json.loads(doc)
+
+    def _write_keys(self, record: Dict[str, Any]):
+        for name, idx in self._indexes.items():
+            if self._is_column_index(idx):
+                continue
+            for value in idx.values_of(record):
+                self._conn.execute(self._sql_keys_insert, (name, value, record.get("id")))
+
+    def _check_unique(self, record: Dict[str, Any], old: Optional[Dict[str, Any]] = None):
+        for name, idx in self._indexes.items():
+            if not idx.unique:
+                continue
+            old_values = idx.values_of(old) if old is not None else []
+            for value in idx.values_of(record):
+                if value in old_values:
+                    continue
+                if any(owner.get("id") != record.get("id") for owner in self.find_by(name, value)):
+                    raise ValueError(f"Giá trị '{value}' đã tồn tại trong chỉ mục unique '{name}'.")
+
+    # ------------------------------------------------------------------ #
+    # Giao diện storage
+    # ------------------------------------------------------------------ #
+    @instrumented("all")
+    def all(self) -> List[Dict[str, Any]]:
+        with self._timed_lock:
+            return [self._loads(row[0]) for row in self._conn.execute(self._sql_all)]
+
+    def iter_all(self, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Duyệt lần lượt các bản ghi theo từng lô `batch_size` dòng (phân trang theo seq).
+        Khóa chỉ được giữ trong lúc đọc một lô, không giữ trong lúc người gọi xử lý.
+        """
+        last_seq = 0
+        while True:
+            with self._timed_lock:
+                rows = self._conn.execute(self._sql_page, (last_seq, batch_size)).fetchall()
+            for _, doc in rows:
+                yield self._loads(doc)
+            if len(rows) < batch_size:
+                return
+            last_seq = rows[-1][0]
+
+    @instrumented("get_by_id")
+    def get_by_id(self, _id: str):
+        with self._timed_lock:
+            row = self._conn.execute(self._sql_get, (_id,)).fetchone()
+            return self._loads(row[0]) if row else None
+
+    @instrumented("find_by")
+    def find_by(self, index: str, value: Any) -> List[Dict[str, Any]]:
+        with self._timed_lock:
+            if index not in self._indexes:
+                raise KeyError(f"Storage '{self.path}' không có chỉ mục '{index}'.")
+            if index in self._sql_find_col:
+                rows = self._conn.execute(self._sql_find_col[index], (value,))
+            else:
+                rows = self._conn.execute(self._sql_keys_find, (index, value))
+            return [self._loads(row[0]) for row in rows]
+
+    def find_one(self, index: str, value: Any) -> Optional[Dict[str, Any]]:
+        found = self.find_by(index, value)
+        return found[0] if found else None
+
+    # ------------------------------------------------------------------ #
+    # Truy vấn: đẩy lọc/sắp xếp/phân trang/chọn trường xuống SQL
+    # ------------------------------------------------------------------ #
+    def _field_sql(self, field: str) -> Optional[Tuple[str, list]]:
+        """Biểu thức SQL đọc một trường cấp một; None nếu không dịch được (đường dẫn "a.b", ...)."""
+        if "." in field or '"' in field:
+            return None
+        if field in self._field_columns:
+            return self._field_columns[field], []
+        return "json_extract(doc, ?)", [f'$."{field}"']
+
+    def _where_sql(self, where: Where) -> Tuple[List[str], list, Where]:
+        """
+        Dịch `where` thành (các mệnh đề SQL, tham số, phần còn lại phải lọc bằng Python).
+        """
+        if where is None:
+            return [], [], None
+        if callable(where):
+            return [], [], where
+        clauses, params, residual = [], [], {}
+        for field, condition in where.items():
+            if field == "$or":
+                branches = [self._where_sql(branch) for branch in condition]
+                if any(rest for _, _, rest in branches):
+                    residual[field] = condition
+                    continue
+                parts = []
+                for branch_clauses, branch_params, _ in branches:
+                    parts.append("(" + (" AND ".join(branch_clauses) or "1") + ")")
+                    params.extend(branch_params)
+                clauses.append("(" + (" OR ".join(parts) or "0") + ")")
+                continue
+            if field == "$and":
+                rests = []
+                for branch_clauses, branch_params, rest in map(self._where_sql, condition):
+                    clauses.extend(branch_clauses)
+                    params.extend(branch_params)
+                    if rest:
+                        rests.append(rest)
+                if rests:
+                    residual[field] = rests
+                continue
+            op, expected = split_condition(condition)
+            expr = self._field_sql(field)
+            if expr is None:
+                residual[field] = condition
+                continue
+            sql, expr_params = expr
+            if op in _ORDERING_OPERATORS and isinstance(expected, _SQL_TYPES):
+                clause, clause_params = self._ordering_sql(field, sql, expr_params, op, expected)
+                clauses.append(clause)
+                params.extend(clause_params)
+            elif op in _SQL_OPERATORS and isinstance(expected, _SQL_TYPES):
+                clauses.append(f"{sql} {_SQL_OPERATORS[op]} ?")
+                params.extend(expr_params + [expected])
+            elif op == "in" and len(expected) <= _MAX_IN_VALUES \
+                    and all(isinstance(v, (str, int, float)) for v in expected):
+                values = list(expected)
+                clauses.append(f"{sql} IN ({', '.join('?' * len(values))})" if values else "0")
+                params.extend(expr_params + values if values else [])
+            elif op == "contains":
+                clauses.append(f"instr(py_fold({sql}), ?) > 0 AND typeof({sql}) = 'text'")
+                params.extend(expr_params + [str(expected).lower()] + expr_params)
+            else:
+                residual[field] = condition
+        return clauses, params, residual or None
+
+    @staticmethod
+    def _ordering_sql(field: str, sql: str, expr_params: list, op: str, expected: Any) -> Tuple[str, list]:
+        """
+        Mệnh đề cho `field op expected` (op là <, <=, >, >=) khớp đúng như khi lọc bằng Python:
+        số chỉ so với số (kể cả true/false), chuỗi chỉ so với chuỗi, còn lại không thỏa.
+        """
+        if expected is None:
+            return "0", []
+        compare = f"{sql} {op} ?"
+        if isinstance(expected, str):
+            # Mảng/đối tượng JSON cũng được json_extract trả về dạng TEXT
+            return (f"{compare} AND typeof({sql}) = 'text' AND json_type(doc, ?) = 'text'",
+                    expr_params + [expected] + expr_params + [f'$."{field}"'])
+        return f"{compare} AND typeof({sql}) IN ('integer', 'real')", expr_params + [expected] + expr_params
+
+    def _order_sql(self, order_by: OrderBy) -> Optional[Tuple[str, list]]:
+        """ORDER BY tương ứng với order_by (None nếu có trường không dịch được)."""
+        parts, params = [], []
+        for field, descending in parse_order_by(order_by):
+            expr = self._field_sql(field)
+            if expr is None:
+                return None
+            parts.append(f"py_fold({expr[0]}) {'DESC' if descending else 'ASC'}")
+            params.extend(expr[1])
+        # Giữ thứ tự chèn cho các bản ghi bằng nhau, giống sắp xếp ổn định của Python
+        parts.append("seq ASC")
+        return " ORDER BY " + ", ".join(parts), params
+
+    @instrumented("query")
+    def query(self, where: Where = None, fields: Optional[Sequence[str]] = None, order_by: OrderBy = None,
+              limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Như JsonStorage.query(). Lọc, sắp xếp, LIMIT/OFFSET và chọn trường chạy trong SQL;
+        điều kiện không dịch được (đường dẫn lồng, hàm Python...) được lọc bằng Python
+        trên kết quả của phần đã dịch được.
+        """
+        clauses, params, residual = self._where_sql(where)
+        order = self._order_sql(order_by)
+        where_sql = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._timed_lock:
+            if residual is None and order is not None:
+                if fields:
+                    pairs = ", ".join("?, json_extract(doc, ?)" for _ in fields)
+                    select = f"json_object({pairs})"
+                    select_params = [p for f in fields for p in (f, f'$."{f}"')]
+                else:
+                    select, select_params = "doc", []
+                sql = f"SELECT {select} FROM {self.table}{where_sql}{order[0]} LIMIT ? OFFSET ?"
+                rows = self._conn.execute(
+                    sql, select_params + params + order[1] + [-1 if limit is None else limit, offset]
+                )
+                return [self._loads(row[0]) for row in rows]
+
+            sql = f"SELECT doc FROM {self.table}{where_sql} ORDER BY seq"
+            records = (self._loads(row[0]) for row in self._conn.execute(sql, params))
+            predicate = compile_where(residual)
+            if predicate is not None:
+                records = (r for r in records if predicate(r))
+            if order_by:
+                page = sort_records(records, order_by, limit, offset)
+            else:
+                page = list(islice(records, offset, None if limit is None else offset + limit))
+        return [project(r, fields) for r in page]
+
+    @instrumented("count")
+    def count(self, where: Where = None) -> int:
+        clauses, params, residual = self._where_sql(where)
+        where_sql = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._timed_lock:
+            if residual is None:
+                return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}{where_sql}", params).fetchone()[0]
+            predicate = compile_where(residual)
+            rows = self._conn.execute(f"SELECT doc FROM {self.table}{where_sql}", params)
+            return sum(1 for row in rows if predicate(self._loads(row[0])))
+
+    @instrumented("create")
+    def create(self, obj: Dict[str, Any]):
+        with self._timed_lock:
+            self._check_unique(obj)
+            try:
+                with self._conn:
+                    self._conn.execute(self._sql_insert, (self._dumps(obj),))
+                    self._write_keys(obj)
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Không thể tạo bản ghi id '{obj.get('id')}': {e}") from e
+            self._queue_change(created=[obj.get("id")])
+        self._dispatch()
+        return obj
+
+    @instrumented("update")
+    def update(self, _id: str, patch: Dict[str, Any]):
+        with self._timed_lock:
+            old = self.get_by_id(_id)
+            if old is None:
+                return None
+            record = {**old, **patch}
+            self._check_unique(record, old)
+            with self._conn:
+                self._conn.execute(self._sql_update, (self._dumps(record), _id))
+                self._conn.execute(self._sql_keys_delete, (_id,))
+                self._write_keys(record)
+            self._queue_changes([("update", _id, patch)])
+        self._dispatch()
+        return record
+
+    @instrumented("delete")
+    def delete(self, _id: str):
+        with self._timed_lock:
+            with self._conn:
+                cur = self._conn.execute(self._sql_delete, (_id,))
+                self._conn.execute(self._sql_keys_delete, (_id,))
+            if cur.rowcount > 0:
+                self._queue_change(deleted=[_id])
+        self._dispatch()
+        return cur.rowcount > 0
+
+    # ------------------------------------------------------------------ #
+    # Thao tác hàng loạt: một transaction cho cả lô
+    # ------------------------------------------------------------------ #
+    def _update_row(self, old: Dict[str, Any], _id: str, patch: Dict[str, Any],
+                    replace: bool = False) -> Dict[str, Any]:
+        record = dict(patch) if replace else {**old, **patch}
+        self._check_unique(record, old)
+        self._conn.execute(self._sql_update, (self._dumps(record), _id))
+        self._conn.execute(self._sql_keys_delete, (_id,))
+        self._write_keys(record)
+        return record
+
+    @instrumented("create_many")
+    def create_many(self, objs: Iterable[Dict[str, Any]]) -> int:
+        objs = list(objs)
+        with self._timed_lock:
+            try:
+                with self._conn:
+                    for obj in objs:
+                        self._check_unique(obj)
+                        self._conn.execute(self._sql_insert, (self._dumps(obj),))
+                        self._write_keys(obj)
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Không thể tạo lô bản ghi: {e}") from e
+            if objs:
+                self._queue_change(created=[obj.get("id") for obj in objs])
+        self._dispatch()
+        return len(objs)
+
+    @instrumented("update_many")
+    def update_many(self, patches_by_id: Dict[str, Dict[str, Any]]) -> int:
+        with self._timed_lock:
+            changes = []
+            with self._conn:
+                for _id, patch in patches_by_id.items():
+                    old = self.get_by_id(_id)
+                    if old is None:
+                        continue
+                    self._update_row(old, _id, patch)
+                    changes.append(("update", _id, patch))
+            if changes:
+                self._queue_changes(changes)
+        self._dispatch()
+        return len(changes)
+
+    @instrumented("replace_many")
+    def replace_many(self, records_by_id: Dict[str, Dict[str, Any]]) -> int:
+        """Như JsonStorage.replace_many(): thay nguyên nội dung, giữ dòng (và thứ tự seq)."""
+        with self._timed_lock:
+            changes = []
+            with self._conn:
+                for _id, record in records_by_id.items():
+                    old = self.get_by_id(_id)
+                    if old is None:
+                        continue
+                    record = dict(record)
+                    self._update_row(old, _id, record, replace=True)
+                    changes.append(("replace", _id, record))
+            if changes:
+                self._queue_changes(changes)
+        self._dispatch()
+        return len(changes)
+
+    @instrumented("delete_many")
+    def delete_many(self, ids: Iterable[str]) -> int:
+        with self._timed_lock:
+            deleted = []
+            with self._conn:
+                for _id in ids:
+                    if self._conn.execute(self._sql_delete, (_id,)).rowcount > 0:
+                        self._conn.execute(self._sql_keys_delete, (_id,))
+                        deleted.append(_id)
+            if deleted:
+                self._queue_change(deleted=deleted)
+        self._dispatch()
+        return len(deleted)
+
+    @instrumented("upsert_many")
+    def upsert_many(self, records: Iterable[Dict[str, Any]], key: str = "id",
+                    create_factory=None) -> Dict[str, int]:
+        with self._timed_lock:
+            column_index = next((name for name, idx in self._indexes.items()
+                                 if idx.key == key and name in self._sql_find_col), None)
+            lookup = None
+            if key != "id" and column_index is None:
+                # Không có chỉ mục cho trường này: duyệt một lần để dựng bảng tra
+                lookup = {}
+                for x in self.all():
+                    lookup.setdefault(x.get(key), x)
+
+            created = updated = 0
+            changes = []
+            try:
+                with self._conn:
+                    for patch in records:
+                        value = patch.get(key)
+                        existing = None
+                        if value is not None:
+                            if key == "id":
+                                existing = self.get_by_id(value)
+                            elif column_index is not None:
+                                existing = self.find_one(column_index, value)
+                            else:
+                                existing = lookup.get(value)
+                        if existing is not None:
+                            record = self._update_row(existing, existing["id"], patch)
+                            changes.append(("update", existing["id"], patch))
+                            if lookup is not None:
+                                lookup[value] = record
+                            updated += 1
+                        else:
+                            record = create_factory(patch) if create_factory else patch
+                            self._check_unique(record)
+                            self._conn.execute(self._sql_insert, (self._dumps(record),))
+                            self._write_keys(record)
+                            changes.append(("create", record.get("id"), record))
+                            if lookup is not None and value is not None:
+                                lookup[value] = record
+                            created += 1
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Không thể upsert lô bản ghi: {e}") from e
+            if changes:
+                self._queue_changes(changes)
+        self._dispatch()
+        return {"created": created, "updated": updated}
+
+    @instrumented("save_all")
+    def save_all(self, data: list):
+        with self._timed_lock:
+            with self._conn:
+                self._conn.execute(self._sql_clear)
+                self._conn.execute(self._sql_keys_clear)
+                self._conn.executemany(self._sql_insert, ((self._dumps(x),) for x in data))
+                for x in data:
+                    self._write_keys(x)
+            self._queue_change(reloaded=True)
+        self._dispatch()
+
+    def import_json(self, json_path: str) -> int:
+        """
+        Nạp dữ liệu từ một file JSON (định dạng của JsonStorage) nếu bảng đang rỗng.
+        Trả về số bản ghi đã nạp.
+        """
+        with self._timed_lock:
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            if count or not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+                return 0
+            data = load_records(json_path)
+            self.save_all(data)
+            return len(data)
+
+    def check_for_changes(self) -> int:
+        """
+        Phát sự kiện reloaded nếu database đã bị một kết nối/tiến trình khác thay đổi.
+        Trả về version hiện tại.
+        """
+        with self._timed_lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._queue_change(reloaded=True)
+        self._dispatch()
+        return self.version
+
+    def close(self):
+        with self._timed_lock:
+            self._conn.close()
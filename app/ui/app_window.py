@@ -146,7 +146,11 @@ class AppWindow(tk.Toplevel):
                                padx=self.config['content_padding'],
                                pady=self.config['content_padding'])
 
-        if hasattr(self.current_view, 'refresh') and callable(getattr(self.current_view, 'refresh')):
+        # View hỗ trợ sync() chỉ cập nhật phần dữ liệu đã thay đổi kể từ lần hiển thị trước
+        if hasattr(self.current_view, 'sync') and callable(getattr(self.current_view, 'sync')):
+            print(f"⚡ Gọi sync() cho view {view_class.__name__}")
+            self.current_view.sync()
+        elif hasattr(self.current_view, 'refresh') and callable(getattr(self.current_view, 'refresh')):
             print(f"⚡ Gọi refresh() cho view {view_class.__name__}")
             self.current_view.refresh()
 
@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from app.ui.store_sync import StoreChangeTracker, patch_treeview
+
 
 class CustomerPurchaseHistoryView(tk.Toplevel):
     """
@@ -87,6 +89,10 @@ class CustomersView(ttk.Frame):
         self.sort_column = None
         self.sort_direction = {} # Stores 'asc', 'desc', or '' for each column
 
+        # Theo dõi thay đổi của storage để chỉ vá các dòng bị ảnh hưởng khi view hiển thị lại
+        self.change_tracker = StoreChangeTracker(customer_service)
+        self._rows = {}  # id -> khách hàng đang hiển thị
+
         self._create_widgets()
         self.refresh()
 
@@ -144,24 +150,55 @@ class CustomersView(ttk.Frame):
         self.sort_direction[col] = new_direction
         self.refresh()
 
+    def _matches(self, customer) -> bool:
+        keyword = self.search_entry.get().lower()
+        return keyword in customer.get("name", "").lower() or keyword in customer.get("phone", "")
+
+    @staticmethod
+    def _row_values(customer) -> tuple:
+        return (
+            customer.get("name"), customer.get("phone"),
+            customer.get("email"), customer.get("address")
+        )
+
+    def _sort_key(self):
+        """Trả về (hàm khóa, giảm dần) của cột đang sắp xếp, hoặc (None, False)."""
+        if self.sort_column and self.sort_direction[self.sort_column]:
+            data_key = self.columns_info[self.sort_column]["data_key"]
+            return (lambda c: str(c.get(data_key, "")).lower()), self.sort_direction[self.sort_column] == 'desc'
+        return None, False
+
+    def sync(self):
+        """
+        Được AppWindow gọi mỗi khi view hiển thị lại: bỏ qua nếu dữ liệu không đổi,
+        nếu không thì chỉ vá các dòng đã thay đổi.
+        """
+        changes = self.change_tracker.take()
+        if changes is None:
+            return
+        changed_ids, full = changes
+        if full:
+            self.refresh()
+            return
+        sort_key, reverse = self._sort_key()
+        patch_treeview(self.tree, changed_ids, self.customer_service.get, self._matches, self._row_values,
+                       self._rows, sort_key, reverse)
+        self._on_customer_select()
+
     def refresh(self):
         # Always clear the tree before populating it
         self.tree.delete(*self.tree.get_children())
 
-        keyword = self.search_entry.get().lower()
+        self.change_tracker.mark_synced()
         all_customers = self.customer_service.list()
 
-        filtered_customers = []
-        for customer in all_customers:
-            if keyword in customer.get("name", "").lower() or keyword in customer.get("phone", ""):
-                filtered_customers.append(customer)
+        filtered_customers = [customer for customer in all_customers if self._matches(customer)]
+        self._rows = {customer["id"]: customer for customer in filtered_customers}
 
         # Apply sorting logic
-        if self.sort_column and self.sort_direction[self.sort_column]:
-            sort_key = self.columns_info[self.sort_column]["data_key"]
-            reverse_sort = (self.sort_direction[self.sort_column] == 'desc')
-
-            filtered_customers.sort(key=lambda c: str(c.get(sort_key, "")).lower(), reverse=reverse_sort)
+        sort_key, reverse_sort = self._sort_key()
+        if sort_key:
+            filtered_customers.sort(key=sort_key, reverse=reverse_sort)
 
             # Update heading with arrow
             arrow = ""
@@ -177,12 +214,8 @@ class CustomersView(ttk.Frame):
 
 
         for customer in filtered_customers:
-            values = (
-                customer.get("name"), customer.get("phone"),
-                customer.get("email"), customer.get("address")
-            )
             # It's crucial to use a unique ID for iid. customer["id"] should be unique.
-            self.tree.insert("", tk.END, iid=customer["id"], values=values)
+            self.tree.insert("", tk.END, iid=customer["id"], values=self._row_values(customer))
 
         self._on_customer_select()
 
@@ -1,7 +1,10 @@
 import tkinter as tk
+from datetime import datetime, time
 from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 
+from app.ui.store_sync import StoreChangeTracker, patch_treeview
+
 
 class OrdersView(ttk.Frame):
     """Giao diện nâng cao để xem và quản lý lịch sử đơn hàng."""
@@ -26,6 +29,10 @@ class OrdersView(ttk.Frame):
         self.sort_column = None
         self.sort_direction = {}  # Stores 'asc', 'desc', or '' for each column
 
+        # Theo dõi thay đổi của storage để chỉ vá các dòng bị ảnh hưởng khi view hiển thị lại
+        self.change_tracker = StoreChangeTracker(order_service)
+        self._rows = {}  # id -> đơn hàng đang hiển thị
+
         self._create_widgets()
         self._bind_events()
         if self.initial_customer_id:
@@ -140,12 +147,21 @@ class OrdersView(ttk.Frame):
         self.sort_direction[col] = new_direction
         self.refresh()
 
-    def refresh(self):
-        all_orders = self.order_service.list_orders()
-        kw = self.search_kw.get().lower()
+    def _date_range(self):
+        """Khoảng ngày đang chọn dưới dạng (datetime đầu ngày, datetime cuối ngày); None nếu chưa chọn."""
+        try:
+            start = datetime.combine(self.from_date_entry.get_date(), time.min)
+        except (AttributeError, ValueError):
+            start = None
+        try:
+            end = datetime.combine(self.to_date_entry.get_date(), time.max)
+        except (AttributeError, ValueError):
+            end = None
+        return start, end
 
-        if self.initial_customer_id:
-            all_orders = [o for o in all_orders if o.get("customer_id") == self.initial_customer_id]
+    def _make_filter(self):
+        """Dựng hàm lọc đơn hàng theo khách hàng, từ khóa và khoảng ngày hiện tại."""
+        kw = self.search_kw.get().lower()
 
         try:
             from_date_str = self.from_date_entry.get_date().strftime('%Y-%m-%d')
@@ -157,30 +173,81 @@ class OrdersView(ttk.Frame):
         except (AttributeError, ValueError):
             to_date_str = None
 
-        # Lọc dữ liệu
-        filtered_orders = []
-        for order in all_orders:
+        def matches(order) -> bool:
+            if self.initial_customer_id and order.get("customer_id") != self.initial_customer_id:
+                return False
             customer_name = order.get("customer_info", {}).get("name", "").lower()
             if kw and kw not in customer_name:
-                continue
+                return False
             order_date_str = order.get("order_date", "")[:10]
             if from_date_str and order_date_str < from_date_str:
-                continue
+                return False
             if to_date_str and order_date_str > to_date_str:
-                continue
-            filtered_orders.append(order)
+                return False
+            return True
 
-        # Sắp xếp (prioritize column header sorting if active)
+        return matches
+
+    def _sort_key(self):
+        """Trả về (hàm khóa, giảm dần): ưu tiên cột đang sắp xếp, nếu không thì theo dropdown."""
         if self.sort_column and self.sort_direction[self.sort_column]:
             sort_key_path = self.columns_info[self.sort_column]["data_key"]
-            reverse_sort = (self.sort_direction[self.sort_column] == 'desc')
-
+            reverse = (self.sort_direction[self.sort_column] == 'desc')
             if "." in sort_key_path:
                 key1, key2 = sort_key_path.split('.')
-                filtered_orders.sort(key=lambda o: str(o.get(key1, {}).get(key2, "")).lower(), reverse=reverse_sort)
-            else:
-                filtered_orders.sort(key=lambda o: o.get(sort_key_path, 0), reverse=reverse_sort)
+                return (lambda o: str(o.get(key1, {}).get(key2, "")).lower()), reverse
+            return (lambda o: o.get(sort_key_path, 0)), reverse
+
+        sort_map = {
+            "Ngày tạo (mới nhất)": ("order_date", True), "Ngày tạo (cũ nhất)": ("order_date", False),
+            "Giá trị (cao-thấp)": ("total_amount", True), "Giá trị (thấp-cao)": ("total_amount", False),
+            "Tên khách hàng (A-Z)": ("customer_info.name", False),
+            "Tên khách hàng (Z-A)": ("customer_info.name", True),
+        }
+        sort_field, reverse = sort_map.get(self.sort_var.get(), ("order_date", True))
+        if "." in sort_field:
+            key1, key2 = sort_field.split('.')
+            return (lambda o: str(o.get(key1, {}).get(key2, "")).lower()), reverse
+        return (lambda o: o.get(sort_field, 0)), reverse
+
+    @staticmethod
+    def _row_values(order) -> tuple:
+        return (
+            order.get("customer_info", {}).get("name", "N/A"), f"{order.get('total_amount', 0):,.0f} ₫",
+            order.get("status", "N/A"), order.get("order_date", "N/A"),
+            order.get("user_id", "N/A")[:8] + "..."
+        )
+
+    def sync(self):
+        """
+        Được AppWindow gọi mỗi khi view hiển thị lại: bỏ qua nếu dữ liệu không đổi,
+        nếu không thì chỉ vá các dòng đã thay đổi (ví dụ đơn vừa tạo ở giỏ hàng).
+        """
+        changes = self.change_tracker.take()
+        if changes is None:
+            return
+        changed_ids, full = changes
+        if full:
+            self.refresh()
+            return
+        sort_key, reverse = self._sort_key()
+        patch_treeview(self.tree, changed_ids, self.order_service.get_order_by_id, self._make_filter(),
+                       self._row_values, self._rows, sort_key, reverse)
+
+    def refresh(self):
+        self.change_tracker.mark_synced()
+        # Chỉ lấy các đơn trong khoảng ngày đang chọn (storage chia theo tháng chỉ đọc các tháng đó)
+        all_orders = self.order_service.list_orders(*self._date_range())
+
+        # Lọc dữ liệu
+        matches = self._make_filter()
+        filtered_orders = [order for order in all_orders if matches(order)]
+        self._rows = {order["id"]: order for order in filtered_orders}
 
+        # Sắp xếp (prioritize column header sorting if active)
+        sort_key, reverse = self._sort_key()
+        filtered_orders.sort(key=sort_key, reverse=reverse)
+        if self.sort_column and self.sort_direction[self.sort_column]:
             # Update heading with arrow
             arrow = ""
             if self.sort_direction[self.sort_column] == 'asc':
@@ -188,32 +255,14 @@ class OrdersView(ttk.Frame):
             elif self.sort_direction[self.sort_column] == 'desc':
                 arrow = " \u25bc"  # Down arrow
             self.tree.heading(self.sort_column, text=self.columns_info[self.sort_column]["heading"] + arrow)
-        else:  # Fallback to existing sort_var if no column sorting
-            sort_map = {
-                "Ngày tạo (mới nhất)": ("order_date", True), "Ngày tạo (cũ nhất)": ("order_date", False),
-                "Giá trị (cao-thấp)": ("total_amount", True), "Giá trị (thấp-cao)": ("total_amount", False),
-                "Tên khách hàng (A-Z)": ("customer_info.name", False),
-                "Tên khách hàng (Z-A)": ("customer_info.name", True),
-            }
-            sort_field, reverse = sort_map.get(self.sort_var.get(), ("order_date", True))
-            if "." in sort_field:
-                key1, key2 = sort_field.split('.')
-                filtered_orders.sort(key=lambda o: str(o.get(key1, {}).get(key2, "")).lower(), reverse=reverse)
-            else:
-                filtered_orders.sort(key=lambda o: o.get(sort_field, 0), reverse=reverse)
-
+        else:
             # Clear all column arrows if sorting is by dropdown
             for col in self.columns_info:
                 self.tree.heading(col, text=self.columns_info[col]["heading"])
 
         self.tree.delete(*self.tree.get_children())
         for order in filtered_orders:
-            values = (
-                order.get("customer_info", {}).get("name", "N/A"), f"{order.get('total_amount', 0):,.0f} ₫",
-                order.get("status", "N/A"), order.get("order_date", "N/A"),
-                order.get("user_id", "N/A")[:8] + "..."
-            )
-            self.tree.insert("", tk.END, iid=order["id"], values=values)
+            self.tree.insert("", tk.END, iid=order["id"], values=self._row_values(order))
 
     def _show_selected_detail(self):
         selected_items = self.tree.selection()
@@ -9,6 +9,9 @@ from io import BytesIO
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from app.models.product import to_category_ids
+from app.ui.store_sync import StoreChangeTracker
+from app.utils.money import to_vnd
 
 class ScrollableFrame(ttk.Frame):
     """Custom scrollable frame with mouse wheel support"""
@@ -101,6 +104,9 @@ class ProductsView(ttk.Frame):
         # NEW: Category filter state
         self.selected_categories: Set[str] = set()  # Stores categoryUris of selected categories
 
+        # Theo dõi thay đổi của storage để bỏ qua việc dựng lại lưới khi dữ liệu không đổi
+        self.change_tracker = StoreChangeTracker(product_service)
+
         self._create_widgets()
         self._bind_events()
 
@@ -342,12 +348,12 @@ class ProductsView(ttk.Frame):
         kw = self.e_kw.get().strip().lower()
 
         try:
-            min_price = float(self.e_min_price.get()) if self.e_min_price.get().strip() else None
+            min_price = to_vnd(self.e_min_price.get()) if self.e_min_price.get().strip() else None
         except ValueError:
             min_price = None
 
         try:
-            max_price = float(self.e_max_price.get()) if self.e_max_price.get().strip() else None
+            max_price = to_vnd(self.e_max_price.get()) if self.e_max_price.get().strip() else None
         except ValueError:
             max_price = None
 
@@ -380,6 +386,16 @@ class ProductsView(ttk.Frame):
         else:
             return base_cols
 
+    def sync(self):
+        """
+        Được AppWindow gọi mỗi khi view hiển thị lại. Lưới thẻ được phân trang và lọc/sắp xếp
+        theo nhiều trường nên không vá từng thẻ: chỉ dựng lại trang hiện tại khi dữ liệu đã đổi.
+        """
+        if self.change_tracker.take() is None:
+            print("⏭️ Sản phẩm không thay đổi, bỏ qua refresh")
+            return
+        self.refresh()
+
     def refresh(self, reset_page: bool = False):
         """Main refresh with performance optimization"""
         if self._refreshing:
@@ -394,25 +410,26 @@ class ProductsView(ttk.Frame):
 
             # Clear existing widgets efficiently
             self._clear_grid()
+            self.change_tracker.mark_synced()
 
             # Get and process data
             # MODIFIED: Get selected_categories from get_filters()
             kw, min_price, max_price, sort_by, selected_categories = self.get_filters()
-            # MODIFIED: Pass selected_categories to _get_filtered_products()
-            products_all = self._get_filtered_products(kw, min_price, max_price, sort_by, selected_categories)
+            where, order_by = self._build_query(kw, min_price, max_price, sort_by, selected_categories)
 
             # Calculate pagination
             items_per_page_val = self.items_per_page.get()
-            total_items = len(products_all)
+            total_items = self.product_service.count(where)
             self.total_pages = max(1, math.ceil(total_items / items_per_page_val))
 
             # Validate current page
             self.current_page = min(max(1, self.current_page), self.total_pages)
 
-            # Get page items
+            # Chỉ lấy đúng trang cần hiển thị từ storage
             start_idx = (self.current_page - 1) * items_per_page_val
-            end_idx = start_idx + items_per_page_val
-            products_to_display = products_all[start_idx:end_idx]
+            products_to_display = self.product_service.query(
+                where=where, order_by=order_by, limit=items_per_page_val, offset=start_idx
+            )
 
             # MODIFIED: Include categories in print statement
             print(
@@ -440,45 +457,30 @@ class ProductsView(ttk.Frame):
             widget.destroy()
         self._img_labels.clear()
 
-    # MODIFIED: Accept selected_categories parameter
-    def _get_filtered_products(self, kw, min_price, max_price, sort_by, selected_categories: Set[str]):
-        """Get and filter products with proper sorting and category filter"""
-        products_all = self.product_service.list()
+    _SORT_ORDERS = {"name_az": "name", "name_za": "-name", "price_asc": "price", "price_desc": "-price"}
 
-        # Apply keyword filter
+    def _build_query(self, kw, min_price, max_price, sort_by, selected_categories: Set[str]):
+        """Chuyển bộ lọc trên giao diện thành (where, order_by) cho product_service.query()"""
+        where = {}
         if kw:
-            products_all = [p for p in products_all if kw in p["name"].lower()]
-
-        # Apply price filters
-        if min_price is not None:
-            products_all = [p for p in products_all if float(p.get("price", 0)) >= min_price]
-        if max_price is not None:
-            products_all = [p for p in products_all if float(p.get("price", 0)) <= max_price]
-
-        # NEW: Apply category filter
+            where["name"] = ("contains", kw)
+        # Khoảng giá và danh mục được thu về một tập id nhờ các chỉ mục của ProductService
+        # (bisect trên mảng giá đã sắp xếp, hợp các tập trong chỉ mục ngược danh mục), storage
+        # chỉ đọc đúng các sản phẩm đó
+        candidate_ids = None
+        if min_price is not None or max_price is not None:
+            candidate_ids = set(self.product_service.product_ids_in_price_range(min_price, max_price))
         if selected_categories:
-            # A product is included if it has at least one category that is in selected_categories
-            products_all = [
-                p for p in products_all
-                if any(cat.get('uri') in selected_categories for cat in p.get('categories', []))
-            ]
-
-        # ENHANCED: Apply sorting with comprehensive error handling
-        try:
-            if sort_by == "name_az":
-                products_all.sort(key=lambda x: str(x.get("name", "")).lower())
-            elif sort_by == "name_za":
-                products_all.sort(key=lambda x: str(x.get("name", "")).lower(), reverse=True)
-            elif sort_by == "price_asc":
-                products_all.sort(key=lambda x: float(x.get("price", 0)))
-            elif sort_by == "price_desc":
-                products_all.sort(key=lambda x: float(x.get("price", 0)), reverse=True)
-            else:
-                print(f"⚠️ Unknown sort option: '{sort_by}', using default order")
-        except Exception as e:
-            print(f"❌ Sorting error: {e}")
+            # Sản phẩm thỏa nếu có ít nhất một danh mục nằm trong các danh mục đã chọn
+            category_ids = self.product_service.product_ids_in_categories(selected_categories)
+            candidate_ids = category_ids if candidate_ids is None else candidate_ids & category_ids
+        if candidate_ids is not None:
+            where["id"] = ("in", candidate_ids)
 
-        return products_all
+        order_by = self._SORT_ORDERS.get(sort_by)
+        if order_by is None:
+            print(f"⚠️ Unknown sort option: '{sort_by}', using default order")
+        return where or None, order_by
 
     def _display_products(self, products, items_per_page_val):
         """Display products in scrollable grid"""
@@ -638,9 +640,8 @@ class ProductsView(ttk.Frame):
         # Calculate filtered total
         # MODIFIED: Get selected_categories from get_filters()
         kw, min_price, max_price, sort_by, selected_categories = self.get_filters()
-        # MODIFIED: Pass selected_categories to _get_filtered_products()
-        products_all = self._get_filtered_products(kw, min_price, max_price, sort_by, selected_categories)
-        filtered_total = len(products_all)
+        where, _ = self._build_query(kw, min_price, max_price, sort_by, selected_categories)
+        filtered_total = self.product_service.count(where)
 
         # Update status
         if filtered_total > 0:
@@ -707,7 +708,9 @@ class ProductsView(ttk.Frame):
     # CRUD Operations - keep from previous code
     def show_detail(self, product):
         """Show product detail, pass cart_service as well"""
-        ProductDetailView(self, self.cart_service, product)
+        # Danh mục của sản phẩm là các categoryId: đổi sang bản ghi danh mục để hiển thị tên
+        ProductDetailView(self, self.cart_service,
+                          {**product, "categories": self.product_service.categories_of(product)})
 
     def add(self):
         """Add new product"""
@@ -722,25 +725,6 @@ class ProductsView(ttk.Frame):
         payload['created_at'] = now_iso
         payload['updated_at'] = now_iso
 
-        # Kiểm tra và chuyển đổi định dạng cho trường 'categories'
-        if 'categories' in payload and isinstance(payload['categories'], list):
-            # Lấy tất cả danh mục một lần và tạo một map để tra cứu hiệu quả
-            all_categories_map = {
-                cat['categoryUri']: cat for cat in self.category_service.list_all_categories()
-            }
-
-            processed_categories = []
-            for cat_uri in payload['categories']:  # payload['categories'] hiện là list các categoryUri
-                cat_data = all_categories_map.get(cat_uri)
-                if cat_data:
-                    # Chuyển đổi định dạng mong muốn: categoryId, name, uri
-                    processed_categories.append({
-                        "categoryId": cat_data.get('categoryId'),
-                        "name": cat_data.get('categoryName'),  # Đổi tên từ categoryName thành name
-                        "uri": cat_data.get('categoryUri')
-                    })
-            payload['categories'] = processed_categories  # Gán lại danh sách đã xử lý
-
         self.product_service.create(payload)
         self.refresh(reset_page=True)
 
@@ -759,25 +743,6 @@ class ProductsView(ttk.Frame):
         """Handle edit submit"""
         patch['updated_at'] = datetime.now().isoformat(timespec="seconds")
 
-        # Kiểm tra và chuyển đổi định dạng cho trường 'categories'
-        if 'categories' in patch and isinstance(patch['categories'], list):
-            # Lấy tất cả danh mục một lần và tạo một map để tra cứu hiệu quả
-            all_categories_map = {
-                cat['categoryUri']: cat for cat in self.category_service.list_all_categories()
-            }
-
-            processed_categories = []
-            for cat_uri in patch['categories']:  # patch['categories'] hiện là list các categoryUri
-                cat_data = all_categories_map.get(cat_uri)
-                if cat_data:
-                    # Chuyển đổi định dạng mong muốn: categoryId, name, uri
-                    processed_categories.append({
-                        "categoryId": cat_data.get('categoryId'),
-                        "name": cat_data.get('categoryName'),  # Đổi tên từ categoryName thành name
-                        "uri": cat_data.get('categoryUri')
-                    })
-            patch['categories'] = processed_categories  # Gán lại danh sách đã xử lý
-
         self.product_service.update(product_id, patch)
         self.refresh()
 
@@ -876,18 +841,16 @@ class ProductDialog(tk.Toplevel):
         scroll_frame = ScrollableFrame(parent)
         scroll_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
-        # Get existing product categories (as uris)
-        existing_product_category_uris = {
-            cat.get('uri') for cat in self.product.get('categories', []) if cat.get('uri')
-        }
+        # Get existing product categories (as categoryIds)
+        existing_product_category_ids = set(to_category_ids(self.product.get('categories', [])))
 
         for category in self.all_categories:
-            category_uri = category['categoryUri']
+            category_id = category['categoryId']
             category_name = category['categoryName']
             # Create an IntVar for each checkbox, default to 1 if already selected for this product
-            var = tk.IntVar(value=1 if category_uri in existing_product_category_uris else 0)
+            var = tk.IntVar(value=1 if category_id in existing_product_category_ids else 0)
 
-            self.category_vars[category_uri] = var
+            self.category_vars[category_id] = var
 
             cb = ttk.Checkbutton(scroll_frame.scrollable_frame, text=category_name, variable=var)
             cb.pack(anchor="w", padx=5, pady=2)
@@ -923,18 +886,14 @@ class ProductDialog(tk.Toplevel):
             # Type conversion
             if key in ["price", "bought_price", "stock"]:
                 try:
-                    val = float(val) if key == "price" or "bought_price" else int(val)
+                    val = to_vnd(val) if key in ("price", "bought_price") else int(val)
                 except (ValueError, TypeError):
                     val = 0
 
             payload[key] = val
 
-        # NEW: Add selected categories to payload
-        selected_category_uris = []
-        for uri, var in self.category_vars.items():
-            if var.get() == 1:
-                selected_category_uris.append(uri)
-        payload['categories'] = selected_category_uris
+        # NEW: Add selected categories to payload (as categoryIds)
+        payload['categories'] = [category_id for category_id, var in self.category_vars.items() if var.get() == 1]
 
         # Validation
         if not payload.get("name") or not payload.get("sku"):
@@ -1092,7 +1051,7 @@ class ProductDetailView(tk.Toplevel):
             color = "#495057"
         elif data_type == "categories_list":  # NEW: Handle categories list
             if isinstance(value, list) and value:
-                formatted_value = ", ".join([cat.get('name', '') for cat in value if cat.get('name')])
+                formatted_value = ", ".join([cat.get('categoryName', '') for cat in value if cat.get('categoryName')])
             else:
                 formatted_value = "N/A"
             color = "#495057"
@@ -6,45 +6,7 @@ from datetime import datetime
 from collections import defaultdict
 import calendar
 
-
-def get_most_specific_product_category(product_info):
-    """
-    Tìm danh mục cụ thể nhất từ list 'categories' của một sản phẩm.
-    Có thể lọc bỏ các danh mục chung chung hoặc ưu tiên danh mục có tên cụ thể.
-    """
-    if not product_info:
-        return None, None
-
-    product_categories = product_info.get('categories', [])
-    if not product_categories:
-        return None, None
-
-    # Danh sách các tên danh mục chung chung hoặc không mong muốn để báo cáo
-    # Bạn có thể điều chỉnh danh sách này dựa trên dữ liệu thực tế của mình
-    # Ví dụ, nếu 'Điện thoại' là một danh mục cha, bạn có thể thêm nó vào đây để loại trừ
-    generic_names_to_exclude = ['root', 'điện thoại', 'phone', 'chuẩn nfc']
-
-    # Ưu tiên các danh mục không nằm trong danh sách loại trừ
-    filtered_cats = [
-        cat for cat in product_categories
-        if cat.get('categoryName', '').lower() not in generic_names_to_exclude
-    ]
-
-    chosen_category = None
-    if filtered_cats:
-        # Nếu có các danh mục đã lọc (không phải generic), lấy danh mục đầu tiên trong số đó
-        chosen_category = filtered_cats[0]
-    elif product_categories:
-        # Nếu không có danh mục cụ thể nào (chỉ có generic), fallback về danh mục đầu tiên
-        chosen_category = product_categories
-
-    if chosen_category:
-        # Sử dụng categoryId hoặc id cho ID, categoryName cho tên
-        cat_id = chosen_category.get('id') or str(chosen_category.get('categoryId'))
-        cat_name = chosen_category.get('categoryName')
-        return cat_id, cat_name
-
-    return None, None
+from app.utils.money import to_vnd
 
 
 class ReportFrame(ttk.Frame):
@@ -274,7 +236,8 @@ class ReportFrame(ttk.Frame):
 
     def _filter_orders_by_date(self, orders):
         """
-        Lọc danh sách đơn hàng dựa trên khoảng thời gian đã chọn.
+        Lọc đơn hàng dựa trên khoảng thời gian đã chọn.
+        `orders` có thể là list hoặc iterator (order_service.iter_orders()), chỉ được duyệt một lần.
         """
         # Nếu start_date hoặc end_date chưa được thiết lập (ví dụ, lỗi validation ban đầu)
         if not self.start_date or not self.end_date:
@@ -282,7 +245,9 @@ class ReportFrame(ttk.Frame):
             return []  # Trả về rỗng
 
         filtered = []
+        scanned = 0
         for o in orders:
+            scanned += 1
             order_date_str = o.get('order_date')
             if not order_date_str:
                 continue
@@ -293,14 +258,14 @@ class ReportFrame(ttk.Frame):
             except ValueError:
                 print(f"Lọc: Lỗi định dạng ngày cho đơn hàng ID {o.get('id', 'N/A')}: '{order_date_str}'. Bỏ qua.")
                 continue
-        print(f"Lọc: Đã lọc {len(filtered)}/{len(orders)} đơn hàng trong khoảng {self.start_date} - {self.end_date}")
+        print(f"Lọc: Đã lọc {len(filtered)}/{scanned} đơn hàng trong khoảng {self.start_date} - {self.end_date}")
         return filtered
 
     def _aggregate_orders_by_time(self, orders):
         """
         Tổng hợp dữ liệu đơn hàng (doanh thu) theo lựa chọn nhóm (Tháng, Quý, Năm).
         """
-        data = defaultdict(float)
+        data = defaultdict(int)
         group_by = self.group_by_var.get()
 
         for o in orders:
@@ -408,10 +373,8 @@ class ReportFrame(ttk.Frame):
             plot_func()
 
     def _plot_revenue_over_time(self):
-        orders = self.order_service.list_orders()
-
-        # Chỉ lọc dữ liệu trong khoảng Năm hoặc Quý đã chọn
-        filtered_orders = self._filter_orders_by_date(orders)
+        # Chỉ lọc dữ liệu trong khoảng Năm hoặc Quý đã chọn (quét từng đơn, không nạp cả kho)
+        filtered_orders = self._filter_orders_by_date(self.order_service.iter_orders(self.start_date, self.end_date))
 
         # Xác định năm/quý đang báo cáo
         year_to_report = int(self.year_var.get())
@@ -426,7 +389,7 @@ class ReportFrame(ttk.Frame):
             labels = [datetime.strptime(mk, "%Y-%m").strftime("%m/%Y") for mk in all_month_keys] # Format for display
 
             # Lấy doanh thu từng tháng từ dữ liệu đã lọc
-            monthly_revenue = defaultdict(float)
+            monthly_revenue = defaultdict(int)
             for o in filtered_orders:
                 try:
                     dt = datetime.strptime(o['order_date'], "%Y-%m-%dT%H:%M:%S")
@@ -447,7 +410,7 @@ class ReportFrame(ttk.Frame):
             labels = [datetime.strptime(mk, "%Y-%m").strftime("%m/%Y") for mk in all_month_keys_in_quarter] # Format for display
 
             # Aggregate revenue by month within the quarter
-            monthly_revenue_in_quarter = defaultdict(float)
+            monthly_revenue_in_quarter = defaultdict(int)
             for o in filtered_orders:
                 try:
                     dt = datetime.strptime(o['order_date'], "%Y-%m-%dT%H:%M:%S")
@@ -485,9 +448,8 @@ class ReportFrame(ttk.Frame):
                   font=("Arial", 10, "italic")).pack(pady=10, padx=10, anchor='w')
 
     def _plot_top_products(self):
-        orders = self.order_service.list_orders()
-        filtered_orders = self._filter_orders_by_date(orders)
-        product_sales = defaultdict(float)
+        filtered_orders = self._filter_orders_by_date(self.order_service.iter_orders(self.start_date, self.end_date))
+        product_sales = defaultdict(int)
 
         for o in filtered_orders:
             for it in o.get('items', []):
@@ -569,9 +531,8 @@ class ReportFrame(ttk.Frame):
                   font=("Arial", 10, "italic")).pack(pady=10, padx=10, anchor='w')
 
     def _plot_customer_summary(self):
-        orders = self.order_service.list_orders()
-        filtered_orders = self._filter_orders_by_date(orders)
-        customer_purchase_value = defaultdict(float)
+        filtered_orders = self._filter_orders_by_date(self.order_service.iter_orders(self.start_date, self.end_date))
+        customer_purchase_value = defaultdict(int)
 
         for o in filtered_orders:
             customer_name = o.get('customer_info', {}).get('name', 'Khách vãng lai')
@@ -625,11 +586,12 @@ class ReportFrame(ttk.Frame):
         """
         Calculates revenue, cost of goods sold (COGS), gross profit, and margin for a single order.
         """
-        revenue = float(order.get('total_amount', 0))
-        cogs = 0.0
+        # Số tiền là số nguyên VNĐ: cộng dồn chính xác, không sai số float với tổng lớn
+        revenue = order.get('total_amount', 0) or 0
+        cogs = 0
 
         for item in order.get('items', []):
-            qty = float(item.get('quantity', 0) or 0)
+            qty = int(item.get('quantity', 0) or 0)
 
             # Check if 'cost' is explicitly provided in the order item.
             # This allows for historical cost tracking if orders store the cost at time of purchase.
@@ -644,9 +606,9 @@ class ReportFrame(ttk.Frame):
                 else:
                     # Fallback if no SKU is available or method doesn't exist.
                     # Setting cost to 0 is safer than using price, as it prevents misleading profit margins.
-                    cost = 0.0
+                    cost = 0
 
-            cogs += qty * float(cost or 0.0)
+            cogs += qty * to_vnd(cost)
 
         gross_profit = revenue - cogs
         # Calculate margin as a percentage, handling division by zero.
@@ -655,9 +617,8 @@ class ReportFrame(ttk.Frame):
         return revenue, cogs, gross_profit, margin
 
     def _plot_sales_by_employee(self):
-        orders = self.order_service.list_orders()
-        filtered_orders = self._filter_orders_by_date(orders)
-        sales_by_emp = defaultdict(float)
+        filtered_orders = self._filter_orders_by_date(self.order_service.iter_orders(self.start_date, self.end_date))
+        sales_by_emp = defaultdict(int)
 
         for o in filtered_orders:
             emp_id = o.get('user_id') or 'N/A'
@@ -679,7 +640,7 @@ class ReportFrame(ttk.Frame):
                     emp_name = f'ID: {emp_id}'
                     print(f"  Warning: User {emp_id} not found in UserService. Using ID.")  # Debug 4
 
-            sales_by_emp[emp_name] += float(o.get('total_amount', 0) or 0)
+            sales_by_emp[emp_name] += o.get('total_amount', 0) or 0
 
         print(f"Final sales_by_emp content: {sales_by_emp}")
 
@@ -727,8 +688,7 @@ class ReportFrame(ttk.Frame):
             return str(dt.year)
 
     def _plot_gross_profit_over_time(self):
-        orders = self.order_service.list_orders()
-        filtered_orders = self._filter_orders_by_date(orders)
+        filtered_orders = self._filter_orders_by_date(self.order_service.iter_orders(self.start_date, self.end_date))
         group = self.group_by_var.get()
 
         agg = {}  # key -> dict(revenue, cogs)
@@ -740,7 +700,7 @@ class ReportFrame(ttk.Frame):
             key = self._time_key_for_dt(dt, group)
             r, c, _, _ = self._calc_order_revenue_cogs(o)
             if key not in agg:
-                agg[key] = {'revenue': 0.0, 'cogs': 0.0}
+                agg[key] = {'revenue': 0, 'cogs': 0}
             agg[key]['revenue'] += r
             agg[key]['cogs'] += c
 
@@ -809,21 +769,20 @@ class ReportFrame(ttk.Frame):
                   font=("Arial", 10, "italic")).pack(pady=10, padx=10, anchor='w')
 
     def _plot_peak_hours_and_days(self):
-        orders = self.order_service.list_orders()
-        filtered = self._filter_orders_by_date(orders)
+        filtered = self._filter_orders_by_date(self.order_service.iter_orders(self.start_date, self.end_date))
         if not filtered:
             ttk.Label(self.canvas_frame, text="Không có dữ liệu trong khoảng đã chọn.").pack(pady=20)
             return
 
-        revenue_by_hour = [0.0] * 24
-        revenue_by_dow = [0.0] * 7  # 0=Mon ... 6=Sun
+        revenue_by_hour = [0] * 24
+        revenue_by_dow = [0] * 7  # 0=Mon ... 6=Sun
 
         for o in filtered:
             try:
                 dt = datetime.strptime(o['order_date'], "%Y-%m-%dT%H:%M:%S")
             except (KeyError, ValueError):
                 continue
-            amount = float(o.get('total_amount', 0) or 0)
+            amount = o.get('total_amount', 0) or 0
             revenue_by_hour[dt.hour] += amount
             revenue_by_dow[dt.weekday()] += amount
 
@@ -869,12 +828,11 @@ class ReportFrame(ttk.Frame):
                   font=("Arial", 10, "italic")).pack(pady=10, padx=10, anchor='w')
 
     def _plot_customer_growth(self):
-        orders = self.order_service.list_orders()
         # ... (phần còn lại của code cho báo cáo tăng trưởng khách hàng)
-        filtered_orders = self._filter_orders_by_date(orders)
+        filtered_orders = self._filter_orders_by_date(self.order_service.iter_orders(self.start_date, self.end_date))
 
         first_purchase_dates = defaultdict(lambda: datetime.max)
-        for o in orders:  # Lặp qua TẤT CẢ order để tìm ngày mua đầu tiên
+        for o in self.order_service.iter_orders():  # Lặp qua TẤT CẢ order để tìm ngày mua đầu tiên
             user_id = o.get('user_id')
             dt_str = o.get('order_date')
             if not user_id or not dt_str:
@@ -932,10 +890,9 @@ class ReportFrame(ttk.Frame):
                   font=("Arial", 10, "italic")).pack(pady=10, padx=10, anchor='w')
 
     def _plot_customer_ltv_and_frequency(self):
-        orders = self.order_service.list_orders()
-        filtered_orders = self._filter_orders_by_date(orders)
+        filtered_orders = self._filter_orders_by_date(self.order_service.iter_orders(self.start_date, self.end_date))
 
-        customer_orders = defaultdict(lambda: {'total_amount': 0.0, 'order_dates': []})
+        customer_orders = defaultdict(lambda: {'total_amount': 0, 'order_dates': []})
 
         for o in filtered_orders:
             user_id = o.get('user_id')
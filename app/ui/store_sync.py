@@ -0,0 +1,117 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class StoreChangeTracker:
+    """
+    Gom các StorageChange của một storage (hoặc service có subscribe()) cho một view.
+
+    Sự kiện có thể đến từ luồng khác (ví dụ scraper), nên ở đây chỉ ghi nhận id dưới
+    khóa; view lấy chúng ra bằng take() trên luồng Tk rồi tự vá Treeview.
+    Nếu nguồn không hỗ trợ subscribe(), take() luôn yêu cầu dựng lại toàn bộ.
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self._lock = threading.Lock()
+        self._changed_ids: Dict[str, None] = {}
+        self._full = False
+        self._latest_version = 0
+        self._seen_version = 0
+        self._supported = hasattr(source, "subscribe")
+        self._unsubscribe = source.subscribe(self._on_change) if self._supported else None
+
+    def _on_change(self, event):
+        with self._lock:
+            self._latest_version = max(self._latest_version, event.version)
+            if event.reloaded:
+                self._full = True
+            for _id in event.created + event.updated + event.deleted:
+                self._changed_ids[_id] = None
+
+    def mark_synced(self):
+        """
+        Gọi NGAY TRƯỚC khi view đọc toàn bộ dữ liệu để dựng lại: mọi sự kiện đến sau
+        thời điểm này sẽ được vá ở lần take() tiếp theo.
+        """
+        with self._lock:
+            self._seen_version = self._latest_version
+            self._changed_ids = {}
+            self._full = False
+
+    def take(self) -> Optional[Tuple[List[str], bool]]:
+        """
+        Lấy các thay đổi kể từ lần đồng bộ trước.
+
+        Returns:
+            None nếu không có gì thay đổi, ngược lại (danh sách id đã thay đổi, cần_dựng_lại_toàn_bộ).
+        """
+        if not self._supported:
+            return [], True
+        if hasattr(self._source, "check_for_changes"):
+            # Phát hiện thay đổi do tiến trình khác ghi vào file/database
+            self._source.check_for_changes()
+        with self._lock:
+            if self._latest_version == self._seen_version and not self._changed_ids and not self._full:
+                return None
+            changes = (list(self._changed_ids), self._full)
+            self._seen_version = self._latest_version
+            self._changed_ids = {}
+            self._full = False
+        return changes
+
+    def close(self):
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+
+
+def patch_treeview(tree, changed_ids: List[str], fetch: Callable[[str], Optional[Dict[str, Any]]],
+                   matches: Callable[[Dict[str, Any]], bool], values_of: Callable[[Dict[str, Any]], tuple],
+                   rows: Dict[str, Dict[str, Any]], sort_key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                   reverse: bool = False):
+    """
+    Vá một Treeview (iid = id bản ghi) theo các id đã thay đổi, thay vì xóa và dựng lại.
+
+    Args:
+        tree: Treeview cần vá.
+        changed_ids: Các id đã được tạo/sửa/xóa.
+        fetch: Hàm lấy bản ghi mới nhất theo id (None nếu đã bị xóa).
+        matches: Bản ghi có thỏa bộ lọc hiện tại của view không.
+        values_of: Giá trị các cột của một dòng.
+        rows: Bản ghi đang hiển thị (iid -> bản ghi), được cập nhật tại chỗ.
+        sort_key/reverse: Thứ tự hiện tại của view; None nghĩa là giữ thứ tự chèn.
+    """
+    for _id in changed_ids:
+        record = fetch(_id)
+        if record is None or not matches(record):
+            if tree.exists(_id):
+                tree.delete(_id)
+            rows.pop(_id, None)
+            continue
+
+        rows[_id] = record
+        if tree.exists(_id):
+            tree.item(_id, values=values_of(record))
+            if sort_key is None:
+                continue
+            tree.detach(_id)
+        index = _sorted_position(tree, rows, record, sort_key, reverse) if sort_key else "end"
+        if tree.exists(_id):
+            tree.move(_id, "", index)
+        else:
+            tree.insert("", index, iid=_id, values=values_of(record))
+
+
+def _sorted_position(tree, rows, record, sort_key, reverse) -> int:
+    """Vị trí chèn giữ đúng thứ tự (ổn định: đứng sau các dòng có cùng khóa)."""
+    key = sort_key(record)
+    children = tree.get_children()
+    for index, iid in enumerate(children):
+        other = rows.get(iid)
+        if other is None:
+            continue
+        other_key = sort_key(other)
+        if (key > other_key) if reverse else (key < other_key):
+            return index
+    return len(children)
@@ -10,6 +10,7 @@ from tkcalendar import DateEntry
 import re
 
 from app.auth.user_permission import UserPermissions
+from app.ui.store_sync import StoreChangeTracker, patch_treeview
 from app.services.auth import hash_password
 from app.utils.password_utils import is_strong_password
 from app.utils.phone_util import is_vietnamese_phone
@@ -42,6 +43,10 @@ class UsersView(ttk.Frame):
         self.search_kw = tk.StringVar()
         self._search_timer = None  # For debouncing search input
 
+        # Theo dõi thay đổi của storage để chỉ vá các dòng bị ảnh hưởng khi view hiển thị lại
+        self.change_tracker = StoreChangeTracker(storage)
+        self._rows = {}  # id -> người dùng đang hiển thị
+
         self._create_widgets()
         self.refresh()
 
@@ -158,26 +163,21 @@ class UsersView(ttk.Frame):
         # Schedule refresh after 300ms (adjust as needed)
         self._search_timer = self.after(300, self.refresh)
 
-    def refresh(self):
-        """Làm mới danh sách người dùng, giữ nguyên lựa chọn hiện tại."""
-        selected_iid = self.tree.selection()[0] if self.tree.selection() else None
-
-        self.tree.delete(*self.tree.get_children())  # Clear existing items
-
-        all_users = self.storage.all()
+    def _matches(self, user) -> bool:
         search_keyword = self.search_kw.get().lower()
-
-        filtered_users = []
-        for user in all_users:
-            # Check if keyword is in name, email, or phone
-            if (not search_keyword or
+        # Check if keyword is in name, email, or phone
+        return bool(not search_keyword or
                     (user.get('name', '').lower() and search_keyword in user['name'].lower()) or
                     (user.get('email', '').lower() and search_keyword in user['email'].lower()) or
                     (user.get('phone', '') and search_keyword in user['phone'])  # Phone might not be lowercased
-            ):
-                filtered_users.append(user)
+                    )
 
-        # Apply sorting logic
+    @staticmethod
+    def _row_values(user) -> tuple:
+        return user.get('name'), user.get('email'), user.get('phone'), user.get('role')
+
+    def _sort_key(self):
+        """Trả về (hàm khóa, giảm dần) theo cột đang sắp xếp, mặc định theo username."""
         if self.sort_column and self.sort_direction[self.sort_column]:
             sort_key = self.columns_info[self.sort_column]["data_key"]
             reverse_sort = (self.sort_direction[self.sort_column] == 'desc')
@@ -186,10 +186,47 @@ class UsersView(ttk.Frame):
             if sort_key == "role":
                 # Example: Define a custom order for roles
                 role_order = {"administrator": 0, "employee_manager": 1, "sales_manager": 2, "sales_person": 3, "accountant": 4}
-                filtered_users.sort(key=lambda u: role_order.get(u.get(sort_key, "accountant"), 99), reverse=reverse_sort)
-            else:
-                filtered_users.sort(key=lambda u: str(u.get(sort_key, "")).lower(), reverse=reverse_sort)
+                return (lambda u: role_order.get(u.get(sort_key, "accountant"), 99)), reverse_sort
+            return (lambda u: str(u.get(sort_key, "")).lower()), reverse_sort
+        # Default sort (e.g., by username or creation date) if no column sort is active
+        return (lambda u: str(u.get('username', '')).lower()), False
+
+    def sync(self):
+        """
+        Được AppWindow gọi mỗi khi view hiển thị lại: bỏ qua nếu dữ liệu không đổi,
+        nếu không thì chỉ vá các dòng đã thay đổi.
+        """
+        changes = self.change_tracker.take()
+        if changes is None:
+            return
+        changed_ids, full = changes
+        if full:
+            self.refresh()
+            return
+        sort_key, reverse = self._sort_key()
+        patch_treeview(self.tree, changed_ids, self.storage.get_by_id, self._matches, self._row_values,
+                       self._rows, sort_key, reverse)
+        if self.selected_user_id and not self.tree.exists(self.selected_user_id):
+            self._on_selection_clear()
+        elif self.selected_user_id in changed_ids:
+            self._on_user_select()
 
+    def refresh(self):
+        """Làm mới danh sách người dùng, giữ nguyên lựa chọn hiện tại."""
+        selected_iid = self.tree.selection()[0] if self.tree.selection() else None
+
+        self.tree.delete(*self.tree.get_children())  # Clear existing items
+
+        self.change_tracker.mark_synced()
+        all_users = self.storage.all()
+
+        filtered_users = [user for user in all_users if self._matches(user)]
+        self._rows = {user.get('id'): user for user in filtered_users}
+
+        # Apply sorting logic
+        sort_key, reverse_sort = self._sort_key()
+        filtered_users.sort(key=sort_key, reverse=reverse_sort)
+        if self.sort_column and self.sort_direction[self.sort_column]:
             # Update heading with arrow
             arrow = ""
             if self.sort_direction[self.sort_column] == 'asc':
@@ -201,13 +238,10 @@ class UsersView(ttk.Frame):
             # If no specific column is sorted, ensure all arrows are cleared
             for col in self.columns_info:
                 self.tree.heading(col, text=self.columns_info[col]["heading"])
-            # Default sort (e.g., by username or creation date) if no column sort is active
-            filtered_users.sort(key=lambda u: str(u.get('username', '')).lower())  # Keeping a default sort
 
         for user in filtered_users:
             # Pass the values for the displayed columns (UPDATED)
-            self.tree.insert("", tk.END,
-                             values=(user.get('name'), user.get('email'), user.get('phone'), user.get('role')),
+            self.tree.insert("", tk.END, values=self._row_values(user),
                              iid=user.get('id'))  # Keep using user['id'] as iid for uniqueness
         if selected_iid and self.tree.exists(selected_iid):
             self.tree.selection_set(selected_iid)
@@ -222,7 +256,7 @@ class UsersView(ttk.Frame):
             return
         self.selected_user_id = selected_items[0]
         # Fetch full user data from storage using the iid (which is the user's ID)
-        user_data = next((u for u in self.storage.all() if u['id'] == self.selected_user_id), None)
+        user_data = self.storage.get_by_id(self.selected_user_id)
         if user_data:
             self._display_user_details(user_data)
             # --- Sử dụng lớp permissions để kiểm tra ---
@@ -290,7 +324,7 @@ class UsersView(ttk.Frame):
         """Xử lý logic khi form thêm người dùng được gửi đi."""
         # This function needs access to `hash_password` from `app.services.auth`
         # Assuming it's imported or defined globally.
-        if any(u["username"] == user_data["username"] for u in self.storage.all()):
+        if self.storage.find_one("username", user_data["username"]):
             messagebox.showerror("Lỗi", "Tên đăng nhập đã tồn tại.", parent=self)
             return
         now_iso = datetime.now().isoformat(timespec="seconds")
@@ -306,7 +340,7 @@ class UsersView(ttk.Frame):
         if not self.selected_user_id:
             messagebox.showerror("Lỗi", "Vui lòng chọn một người dùng để sửa.", parent=self)
             return
-        user = next((u for u in self.storage.all() if u['id'] == self.selected_user_id), None)
+        user = self.storage.get_by_id(self.selected_user_id)
         if not user:
             messagebox.showerror("Lỗi", "Không tìm thấy thông tin người dùng.", parent=self)
             return
@@ -335,7 +369,7 @@ class UsersView(ttk.Frame):
             messagebox.showerror("Lỗi", "Vui lòng chọn một người dùng để xóa.", parent=self)
             return
 
-        user = next((u for u in self.storage.all() if u['id'] == self.selected_user_id), None)
+        user = self.storage.get_by_id(self.selected_user_id)
         if not self.permissions.can_delete_user(user):
             messagebox.showerror("Lỗi", "Bạn không thể tự xóa chính mình.", parent=self)
             return
@@ -0,0 +1,45 @@
+"""
+Chuyển đổi file dữ liệu storage giữa các định dạng (json, json-min, binary).
+
+Ví dụ:
+    python -m app.utils.convert_storage_encoding app/data/orders.json --to binary
+    python -m app.utils.convert_storage_encoding app/data/orders.bin --to json -o app/data/orders.json
+"""
+import argparse
+import os
+
+from app.models.storage import ENCODINGS, dump_records, load_records
+
+
+def convert_file(src: str, encoding: str, dst: str = None) -> str:
+    """
+    Đọc `src` (tự nhận diện định dạng) và ghi lại theo `encoding`.
+    Nếu không chỉ định `dst`: binary ghi ra `<tên>.bin`, các định dạng JSON ghi ra `<tên>.json`.
+    Trả về đường dẫn file đích.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Encoding '{encoding}' không hợp lệ. Hỗ trợ: {', '.join(ENCODINGS)}")
+    if dst is None:
+        base = os.path.splitext(src)[0]
+        dst = base + (".bin" if encoding == "binary" else ".json")
+
+    data = load_records(src)
+    # Ghi ra file tạm rồi thay thế, để src == dst cũng an toàn
+    tmp_path = dst + ".tmp"
+    dump_records(tmp_path, data, encoding)
+    os.replace(tmp_path, dst)
+    print(f"[Convert] {src} -> {dst} ({encoding}, {len(data)} bản ghi, {os.path.getsize(dst)} bytes)")
+    return dst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển đổi định dạng file dữ liệu storage.")
+    parser.add_argument("src", help="File nguồn (.json hoặc .bin)")
+    parser.add_argument("--to", dest="encoding", required=True, choices=ENCODINGS, help="Định dạng đích")
+    parser.add_argument("-o", "--output", help="File đích (mặc định: cùng tên, đổi phần mở rộng)")
+    args = parser.parse_args()
+    convert_file(args.src, args.encoding, args.output)
+
+
+if __name__ == "__main__":
+    main()
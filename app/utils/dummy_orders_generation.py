@@ -2,6 +2,8 @@ import random
 import uuid
 from datetime import datetime, timedelta
 
+from app.utils.money import to_vnd
+
 # Import các service của bạn
 # Đảm bảo đường dẫn import chính xác với cấu trúc dự án của bạn
 # from app.services.product_service import ProductService
@@ -71,15 +73,16 @@ class DummyOrderCreator:
             # Tạo danh sách các mặt hàng cho đơn hàng
             for prod in chosen_products_for_order:
                 quantity = random.randint(1, 10) # Số lượng của mỗi sản phẩm
+                price = to_vnd(prod["price"])  # Số nguyên VNĐ
                 item = {
                     "product_id": prod["id"],
-                    "price": prod["price"],
+                    "price": price,
                     "quantity": quantity,
                     "name": prod["name"],
                     "item_id": str(uuid.uuid4()) # ID duy nhất cho mỗi item trong đơn hàng
                 }
                 items_for_order.append(item)
-                total_amount_for_order += prod["price"] * quantity
+                total_amount_for_order += price * quantity
 
             # Tạo ngày đặt hàng ngẫu nhiên trong khoảng 'max_days_back' ngày gần đây
             order_date = datetime.now() - timedelta(days=random.randint(0, max_days_back))
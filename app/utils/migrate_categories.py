@@ -0,0 +1,92 @@
+"""
+Chuyển danh mục lưu đầy đủ trong từng sản phẩm ({"categoryId", "name", "uri"}) sang tham
+chiếu categoryId: tên và uri được ghi (một lần) vào bảng danh mục - store "categories" của
+CategoryService - còn sản phẩm chỉ giữ list categoryId (xem ProductService.categories_of).
+
+Danh mục đã có trong bảng (cùng categoryId) giữ nguyên tên/uri của bảng. Dữ liệu được đọc/ghi
+qua storage engine đang cấu hình cho từng store (nạp từ .env như khi chạy ứng dụng), nên dùng
+được cho mọi engine. Chạy lại nhiều lần cũng không sao: sản phẩm đã chuyển được bỏ qua.
+
+Ví dụ:
+    python -m app.utils.migrate_categories
+    python -m app.utils.migrate_categories --data-dir app/data
+"""
+import argparse
+import os
+import uuid
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+from app.models.category import Category
+from app.models.product import to_category_ids
+from app.storage_engines.registry import create_storage
+
+
+def embedded_categories(product: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Các danh mục lưu đầy đủ trong sản phẩm, theo dạng của bảng danh mục."""
+    return [
+        {"categoryId": category_id, "categoryName": category.get("name"), "categoryUri": category.get("uri")}
+        for category in product.get("categories") or []
+        if isinstance(category, dict)
+        for category_id in to_category_ids([category])
+    ]
+
+
+def migrate_products(product_storage, category_storage) -> Dict[str, int]:
+    """
+    Ghi các danh mục chưa có vào bảng danh mục rồi đổi danh mục của sản phẩm thành categoryId
+    (mỗi store một lần ghi). Trả về {"products": số sản phẩm đã đổi, "categories": số danh mục mới}.
+    """
+    patches, found = {}, {}
+    for product in product_storage.iter_all():
+        categories = product.get("categories") or []
+        if all(isinstance(c, int) and not isinstance(c, bool) for c in categories):
+            continue
+        for category in embedded_categories(product):
+            found.setdefault(category["categoryId"], category)
+        patches[product.get("id")] = {"categories": to_category_ids(categories)}
+
+    known = {c.get("categoryId") for c in category_storage.iter_all()}
+    now_iso = datetime.now().isoformat(timespec="seconds")
+    new_categories = [
+        asdict(Category(id=str(uuid.uuid4()), created_at=now_iso, updated_at=now_iso, **category))
+        for category_id, category in found.items() if category_id not in known
+    ]
+    # Bảng danh mục được ghi trước để sản phẩm không bao giờ tham chiếu categoryId chưa có
+    if new_categories:
+        category_storage.create_many(new_categories)
+    if patches:
+        product_storage.update_many(patches)
+    return {"products": len(patches), "categories": len(new_categories)}
+
+
+def migrate(data_dir: str) -> Dict[str, int]:
+    """Chuyển store "products" trong `data_dir`, bảng danh mục là store "categories"."""
+    product_storage = create_storage("products", data_dir)
+    category_storage = create_storage("categories", data_dir)
+    try:
+        result = migrate_products(product_storage, category_storage)
+    finally:
+        for storage in (product_storage, category_storage):
+            if hasattr(storage, "close"):
+                storage.close()
+    print(f"[Migrate] products: {result['products']} sản phẩm chuyển sang tham chiếu categoryId, "
+          f"{result['categories']} danh mục mới trong bảng danh mục")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển danh mục của sản phẩm sang tham chiếu categoryId.")
+    parser.add_argument("--data-dir", default=os.path.join("app", "data"), help="Thư mục dữ liệu (mặc định app/data)")
+    args = parser.parse_args()
+    # Engine của từng store (STORAGE_ENGINE_<STORE>...) được cấu hình trong .env
+    load_dotenv()
+    # Storage hiểu đường dẫn tương đối theo thư mục app/, còn tham số dòng lệnh theo thư mục hiện tại
+    migrate(os.path.abspath(args.data_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Chuyển các số tiền đã lưu dạng float sang số nguyên VNĐ (xem app.utils.money.to_vnd):
+giá và giá nhập của sản phẩm, đơn giá trong giỏ hàng và đơn hàng, tổng tiền đơn hàng.
+
+Dữ liệu được đọc/ghi qua storage engine đang cấu hình cho từng store (STORAGE_ENGINE...),
+nên dùng được cho mọi engine; cấu hình được nạp từ .env như khi chạy ứng dụng. Chạy lại nhiều
+lần cũng không sao: bản ghi đã đúng được bỏ qua. Segment nén của kho lưu trữ lạnh không bao giờ
+bị sửa: OrderArchive đổi số tiền của đơn đã lưu trữ sang số nguyên VNĐ khi đọc.
+
+Ví dụ:
+    python -m app.utils.migrate_money
+    python -m app.utils.migrate_money --data-dir app/data --stores products,orders
+"""
+import argparse
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.storage_engines.registry import create_storage
+from app.utils.money import to_vnd
+
+# Store -> (các trường tiền của bản ghi, các trường tiền của từng phần tử trong "items")
+MONEY_FIELDS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "products": (("price", "bought_price"), ()),
+    "carts": ((), ("price",)),
+    "orders": (("total_amount",), ("price", "cost")),
+}
+
+
+def money_patch(record: Dict[str, Any], fields: Iterable[str], item_fields: Iterable[str] = ()) -> Dict[str, Any]:
+    """Bản vá đưa các số tiền của `record` về số nguyên VNĐ; rỗng nếu không có gì phải đổi."""
+    patch = {}
+    for name in fields:
+        value = record.get(name)
+        if value is not None and type(value) is not int:
+            patch[name] = to_vnd(value)
+    items = record.get("items")
+    if item_fields and isinstance(items, list):
+        new_items: List[Any] = []
+        changed = False
+        for item in items:
+            if isinstance(item, dict):
+                fixed = {k: to_vnd(item[k]) for k in item_fields
+                         if item.get(k) is not None and type(item[k]) is not int}
+                if fixed:
+                    item = {**item, **fixed}
+                    changed = True
+            new_items.append(item)
+        if changed:
+            patch["items"] = new_items
+    return patch
+
+
+def migrate_store(storage, store_name: str) -> int:
+    """Chuyển các số tiền của một store (bằng một lần update_many). Trả về số bản ghi đã đổi."""
+    fields, item_fields = MONEY_FIELDS[store_name]
+    patches = {}
+    for record in storage.iter_all():
+        patch = money_patch(record, fields, item_fields)
+        if patch:
+            patches[record.get("id")] = patch
+    if patches:
+        storage.update_many(patches)
+    return len(patches)
+
+
+def migrate(data_dir: str, stores: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Chuyển các store trong `stores` (mặc định: mọi store có số tiền). Trả về store -> số bản ghi đã đổi."""
+    result = {}
+    for name in stores or MONEY_FIELDS:
+        if name not in MONEY_FIELDS:
+            raise ValueError(f"Store '{name}' không có số tiền. Hỗ trợ: {', '.join(MONEY_FIELDS)}")
+        storage = create_storage(name, data_dir)
+        try:
+            result[name] = migrate_store(storage, name)
+        finally:
+            if hasattr(storage, "close"):
+                storage.close()
+        print(f"[Migrate] {name}: {result[name]} bản ghi đã chuyển sang tiền số nguyên VNĐ")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chuyển các số tiền đã lưu sang số nguyên VNĐ.")
+    parser.add_argument("--data-dir", default=os.path.join("app", "data"), help="Thư mục dữ liệu (mặc định app/data)")
+    parser.add_argument("--stores", default=",".join(MONEY_FIELDS), help="Các store cần chuyển, cách nhau bởi dấu phẩy")
+    args = parser.parse_args()
+    # Engine của từng store (STORAGE_ENGINE_<STORE>...) được cấu hình trong .env
+    load_dotenv()
+    # Storage hiểu đường dẫn tương đối theo thư mục app/, còn tham số dòng lệnh theo thư mục hiện tại
+    migrate(os.path.abspath(args.data_dir), [s.strip() for s in args.stores.split(",") if s.strip()])
+
+
+if __name__ == "__main__":
+    main()
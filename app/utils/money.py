@@ -0,0 +1,41 @@
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any
+
+# Số có dấu phân cách hàng nghìn: "1.990.000", "1,990,000", "1 990 000"
+_GROUPED = re.compile(r"^-?\d{1,3}([., ]\d{3})+$")
+
+
+def to_vnd(value: Any) -> int:
+    """
+    Chuyển một số tiền về số nguyên VNĐ, dạng lưu trữ chung của mọi số tiền trong ứng dụng
+    (giá, giá nhập, đơn giá trong giỏ/đơn hàng, tổng tiền đơn hàng).
+
+    Nhận int, float (làm tròn tới đồng, ví dụ 29990000.0), chuỗi số ("29990000", "29990000.0")
+    hoặc chuỗi có dấu phân cách hàng nghìn và ký hiệu tiền ("29.990.000 ₫", "29,990,000").
+    None hoặc chuỗi rỗng là 0.
+
+    Raises:
+        ValueError: Nếu giá trị không phải là một số tiền.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f"Số tiền không hợp lệ: {value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        if value != value or value in (float("inf"), float("-inf")):
+            raise ValueError(f"Số tiền không hợp lệ: {value!r}")
+        return int(Decimal(repr(value)).to_integral_value(ROUND_HALF_UP))
+    if isinstance(value, str):
+        text = value.replace("₫", "").replace("đ", "").replace("VNĐ", "").strip()
+        if not text:
+            return 0
+        if _GROUPED.match(text):
+            text = re.sub(r"[., ]", "", text)
+        try:
+            return int(Decimal(text).to_integral_value(ROUND_HALF_UP))
+        except (InvalidOperation, ValueError, OverflowError):
+            raise ValueError(f"Số tiền không hợp lệ: {value!r}") from None
+    raise ValueError(f"Số tiền không hợp lệ: {value!r}")
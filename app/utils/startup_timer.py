@@ -0,0 +1,40 @@
+import time
+from typing import List, Tuple
+
+
+class StartupTimer:
+    """
+    Đo thời gian từng giai đoạn khởi động ứng dụng.
+
+    Ví dụ:
+        timer = StartupTimer()
+        ...                      # nạp cấu hình
+        timer.mark("Nạp .env")
+        ...                      # khởi tạo storage
+        timer.mark("Khởi tạo storage")
+        timer.report()
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._last = self._start
+        self._phases: List[Tuple[str, float]] = []
+
+    def mark(self, label: str):
+        """Kết thúc giai đoạn hiện tại với tên `label`."""
+        now = time.perf_counter()
+        self._phases.append((label, now - self._last))
+        self._last = now
+
+    @property
+    def elapsed(self) -> float:
+        """Tổng thời gian (giây) từ lúc tạo tới lần mark() gần nhất."""
+        return self._last - self._start
+
+    def report(self):
+        """In bảng thời gian các giai đoạn ra console."""
+        width = max((len(label) for label, _ in self._phases), default=0)
+        print("--- ⏱️ Thời gian khởi động ---")
+        for label, seconds in self._phases:
+            print(f"  {label:<{width}}  {seconds * 1000:8.1f} ms")
+        print(f"  {'Tổng':<{width}}  {self.elapsed * 1000:8.1f} ms")
@@ -0,0 +1,159 @@
+"""
+Sinh dữ liệu giả cho benchmark: sản phẩm, khách hàng và đơn hàng có cùng cấu trúc với
+các model trong app/models (Product, Customer, Order).
+
+Bản ghi thứ i (kể cả id) chỉ phụ thuộc vào (loại dữ liệu, i, seed), nên benchmark có thể
+tra cứu, cập nhật hoặc upsert một bản ghi bất kỳ mà không phải giữ cả bộ dữ liệu trong bộ nhớ.
+"""
+import json
+import random
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+from app.models.customer import Customer
+from app.models.order import Order
+from app.models.product import Product
+
+_NAMESPACE = uuid.UUID("0b5f3e52-8d0f-4d7e-9a55-4a0f8c6f7d21")
+# Đơn hàng được rải đều trong 24 tháng trước mốc này (nhiều phân vùng cho json-partitioned)
+_END_DATE = datetime(2025, 8, 1)
+_ORDER_SPAN_SECONDS = 730 * 24 * 3600
+
+_BRANDS = ["Apple", "Samsung", "Xiaomi", "OPPO", "vivo", "realme", "Nokia", "ASUS"]
+# categoryId của các danh mục thật (sản phẩm chỉ lưu tham chiếu tới bảng danh mục)
+_CATEGORY_IDS = [3, 1131, 1601, 1603, 2221, 2240]
+_LAST_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng"]
+_MIDDLE_NAMES = ["Văn", "Thị", "Minh", "Ngọc", "Đức", "Thu", "Quang", "Thanh"]
+_FIRST_NAMES = ["An", "Bình", "Châu", "Dũng", "Hà", "Hiền", "Khang", "Linh", "Nam", "Trang"]
+_STREETS = ["Lê Lợi", "Nguyễn Huệ", "Trần Hưng Đạo", "Hai Bà Trưng", "Điện Biên Phủ"]
+_CITIES = ["TP. Hồ Chí Minh", "Hà Nội", "Đà Nẵng", "Cần Thơ", "Hải Phòng"]
+_STATUSES = ["completed", "completed", "completed", "pending", "cancelled"]
+
+
+def record_id(dataset: str, i: int) -> str:
+    """id (dạng uuid như dữ liệu thật) của bản ghi thứ `i` trong `dataset`."""
+    return str(uuid.uuid5(_NAMESPACE, f"{dataset}-{i}"))
+
+
+def make_product(i: int, rng: random.Random) -> Dict[str, Any]:
+    brand = rng.choice(_BRANDS)
+    price = rng.randrange(2_000_000, 40_000_000, 10_000)
+    created = _END_DATE - timedelta(seconds=rng.randrange(_ORDER_SPAN_SECONDS))
+    slug = f"{brand.lower()}-model-{i}"
+    image = f"https://cdn.example.vn/catalog/product/{slug}"
+    return asdict(Product(
+        id=record_id("products", i),
+        name=f"{brand} Model {i} {rng.choice([128, 256, 512])}GB | Chính hãng",
+        sku=slug,
+        price=price,
+        bought_price=round(price * rng.uniform(0.8, 0.95) / 1000) * 1000,
+        stock=rng.randrange(0, 500),
+        description=f"{brand} Model {i} với màn hình sắc nét, pin bền bỉ và camera chụp đêm ấn tượng.",
+        avatar=f"{image}.png",
+        images=[f"{image}-{k}.png" for k in range(3)],
+        screen_size=f"{rng.choice(['6.1', '6.5', '6.7', '6.9'])} inches",
+        screen_tech=rng.choice(["AMOLED", "Super Retina XDR OLED", "IPS LCD"]),
+        camera_sau="Camera chính: 50MP, f/1.8, chống rung quang học",
+        camera_truoc="12MP, f/2.2",
+        chipset=rng.choice(["Apple A18 Pro", "Snapdragon 8 Gen 3", "Dimensity 9300", "Exynos 2400"]),
+        nfc=rng.choice(["Có", "Không"]),
+        ram=f"{rng.choice([4, 6, 8, 12, 16])} GB",
+        storage=f"{rng.choice([128, 256, 512])} GB",
+        battery=f"{rng.randrange(4000, 6000, 100)} mAh",
+        sim="2 Nano SIM",
+        os=rng.choice(["iOS", "Android"]),
+        refresh_rate=rng.choice(["60Hz", "90Hz", "120Hz"]),
+        main_screen_res="2400 x 1080 pixels",
+        cpu_type="8 nhân",
+        created_at=created.isoformat(),
+        updated_at=created.isoformat(),
+        categories=rng.sample(_CATEGORY_IDS, 3),
+    ))
+
+
+def make_customer(i: int, rng: random.Random) -> Dict[str, Any]:
+    return asdict(Customer(
+        id=record_id("customers", i),
+        name=f"{rng.choice(_LAST_NAMES)} {rng.choice(_MIDDLE_NAMES)} {rng.choice(_FIRST_NAMES)}",
+        # Số điện thoại là chỉ mục unique nên phải khác nhau giữa các khách hàng
+        phone=f"09{i:08d}",
+        email=f"khachhang{i}@example.vn",
+        address=f"{rng.randrange(1, 500)} {rng.choice(_STREETS)}, {rng.choice(_CITIES)}",
+    ))
+
+
+def make_order(i: int, rng: random.Random, customers: int = 10_000, products: int = 10_000) -> Dict[str, Any]:
+    customer_no = rng.randrange(customers)
+    items = []
+    for _ in range(rng.randint(1, 4)):
+        product_no = rng.randrange(products)
+        items.append({
+            "product_id": record_id("products", product_no),
+            "price": rng.randrange(2_000_000, 40_000_000, 10_000),
+            "quantity": rng.randint(1, 3),
+            "name": f"{rng.choice(_BRANDS)} Model {product_no}",
+            "item_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        })
+    order_date = _END_DATE - timedelta(seconds=rng.randrange(_ORDER_SPAN_SECONDS))
+    return asdict(Order(
+        id=record_id("orders", i),
+        customer_id=record_id("customers", customer_no),
+        customer_info={
+            "id": record_id("customers", customer_no),
+            "name": f"{rng.choice(_LAST_NAMES)} {rng.choice(_MIDDLE_NAMES)} {rng.choice(_FIRST_NAMES)}",
+            "phone": f"09{customer_no:08d}",
+            "email": f"khachhang{customer_no}@example.vn",
+            "address": f"{rng.randrange(1, 500)} {rng.choice(_STREETS)}, {rng.choice(_CITIES)}",
+        },
+        items=items,
+        total_amount=sum(item["price"] * item["quantity"] for item in items),
+        user_id=record_id("users", rng.randrange(20)),
+        status=rng.choice(_STATUSES),
+        order_date=order_date.isoformat(timespec="seconds"),
+    ))
+
+
+def make_patch(dataset: str, rng: random.Random) -> Dict[str, Any]:
+    """Bản vá điển hình của ứng dụng cho một bản ghi trong `dataset` (dùng cho update)."""
+    if dataset == "products":
+        return {"stock": rng.randrange(0, 500), "updated_at": datetime.now().isoformat()}
+    if dataset == "customers":
+        return {"address": f"{rng.randrange(1, 500)} {rng.choice(_STREETS)}, {rng.choice(_CITIES)}"}
+    return {"status": rng.choice(_STATUSES)}
+
+
+# Tên store (như trong main.py) -> hàm sinh bản ghi thứ i
+DATASETS: Dict[str, Callable[[int, random.Random], Dict[str, Any]]] = {
+    "products": make_product,
+    "customers": make_customer,
+    "orders": make_order,
+}
+
+
+def generate(dataset: str, count: int, start: int = 0, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Sinh lần lượt các bản ghi start .. start+count-1 của `dataset`."""
+    make = DATASETS[dataset]
+    rng = random.Random()
+    for i in range(start, start + count):
+        # Mỗi bản ghi có chuỗi ngẫu nhiên riêng: sinh lại bản ghi i luôn cho cùng kết quả
+        rng.seed((seed << 32) | i)
+        yield make(i, rng)
+
+
+def write_json(path: str, records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Ghi các bản ghi thành một mảng JSON (không khoảng trắng, đọc được bằng load_records)
+    mà không giữ cả mảng trong bộ nhớ. Trả về số bản ghi đã ghi.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for record in records:
+            if count:
+                f.write(",")
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            count += 1
+        f.write("]")
+    return count
@@ -0,0 +1,85 @@
+"""
+So sánh các định dạng file của JsonStorage: thời gian nạp, thời gian ghi và kích thước file.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.encodings                 # dùng app/data/products.json và orders.json
+    python -m benchmarks.encodings path/to/a.json  # hoặc các file chỉ định
+    python -m benchmarks.encodings --output benchmarks/results/encodings.json
+
+Kết quả được ghi ra file JSON (mặc định benchmarks/results/encodings-<thời điểm>.json).
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.models.storage import ENCODINGS, dump_records, load_records
+
+DEFAULT_FILES = ["app/data/products.json", "app/data/orders.json"]
+REPEAT = 5
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def _best_of(fn, repeat: int = REPEAT) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_file(src: str) -> List[Dict[str, Any]]:
+    data = load_records(src)
+    rows = []
+    print(f"\n{src}: {len(data)} bản ghi")
+    print(f"{'encoding':<10} {'size (KB)':>12} {'load (ms)':>12} {'save (ms)':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for encoding in ENCODINGS:
+            path = os.path.join(tmp_dir, f"data.{encoding}")
+            save_s = _best_of(lambda: dump_records(path, data, encoding))
+            load_s = _best_of(lambda: load_records(path))
+            assert load_records(path) == data, f"Dữ liệu đọc lại khác ban đầu ({encoding})"
+            size_kb = os.path.getsize(path) / 1024
+            print(f"{encoding:<10} {size_kb:>12.1f} {load_s * 1000:>12.2f} {save_s * 1000:>12.2f}")
+            rows.append({"file": src, "records": len(data), "encoding": encoding, "size_kb": round(size_kb, 1),
+                         "load_ms": round(load_s * 1000, 3), "save_ms": round(save_s * 1000, 3)})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="So sánh các định dạng file của JsonStorage")
+    parser.add_argument("files", nargs="*",
+                        help="Các file JSON cần đo (mặc định: app/data/products.json và orders.json)")
+    parser.add_argument("--output", help="File kết quả (mặc định benchmarks/results/encodings-<thời điểm>.json)")
+    args = parser.parse_args(argv)
+
+    files = args.files or [f for f in DEFAULT_FILES if os.path.exists(f)]
+    if not files:
+        parser.error("Không có file dữ liệu nào để đo.")
+    for src in files:
+        if not os.path.isfile(src):
+            parser.error(f"File '{src}' không tồn tại.")
+    results = []
+    for src in files:
+        results.extend(bench_file(src))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"encodings-{datetime.now():%Y%m%d-%H%M%S}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nĐã ghi kết quả vào {output}")
+
+
+if __name__ == "__main__":
+    main()
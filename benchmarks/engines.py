@@ -0,0 +1,267 @@
+"""
+Benchmark các storage engine (xem app/storage_engines/registry.py) trên dữ liệu giả
+sinh bởi benchmarks/datagen.py: nạp lần đầu, tra cứu theo id, quét toàn bộ, create,
+update, upsert hàng loạt, bộ nhớ và dung lượng trên đĩa.
+
+Chạy từ thư mục gốc của dự án:
+    python -m benchmarks.engines                                   # 1k, 100k, 1M bản ghi, mọi engine
+    python -m benchmarks.engines --sizes 1000,100000 --engines json-cached,sqlite --datasets orders
+    python -m benchmarks.engines --baseline benchmarks/results/v1.json    # báo các chỉ số bị chậm đi
+
+Kết quả được ghi ra file JSON (mặc định benchmarks/results/engines-<thời điểm>.json).
+Với --baseline, chương trình kết thúc với mã 1 nếu có chỉ số chậm hơn baseline quá --tolerance.
+Warm start và đo lường storage bị tắt để số liệu phản ánh đúng chi phí của engine.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.models import storage_metrics
+from app.models.storage import StorageIndex
+from app.storage_engines.registry import STORAGE_ENGINES, create_storage
+from benchmarks.datagen import DATASETS, generate, make_patch, record_id, write_json
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+# Chỉ mục phụ giống main.py
+INDEXES = {
+    "products": lambda: [StorageIndex("sku", "sku")],
+    "customers": lambda: [StorageIndex("phone", "phone", unique=True)],
+    "orders": lambda: [],
+}
+
+# Mỗi phép đo lặp tối đa ngần ấy lần, nhưng dừng sớm khi đã chạy quá OP_BUDGET_SECONDS
+# (engine "json" không cache đọc lại cả file ở mỗi thao tác)
+MAX_OPS = {"get_by_id": 1000, "create": 100, "update": 100}
+OP_BUDGET_SECONDS = 2.0
+UPSERT_BATCH = 1000
+
+# Chỉ số -> đơn vị, theo thứ tự in ra; chỉ số càng nhỏ càng tốt
+METRICS = {
+    "import_ms": "ms",
+    "cold_load_ms": "ms",
+    "get_by_id_us": "µs",
+    "scan_ms": "ms",
+    "create_ms": "ms",
+    "update_ms": "ms",
+    "upsert_ms": "ms",
+    "memory_mb": "MB",
+    "disk_mb": "MB",
+}
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Ẩn các dòng log của storage (đường dẫn, thông báo import...) trong lúc đo."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _open(dataset: str, data_dir: str, engine: str):
+    return create_storage(dataset, data_dir, indexes=INDEXES[dataset](), engine=engine)
+
+
+def _close(store):
+    if hasattr(store, "flush"):
+        store.flush()
+    if hasattr(store, "close"):
+        store.close()
+
+
+def _timed_ops(op: Callable[[int], Any], limit: int, finish: Optional[Callable[[], Any]] = None) -> float:
+    """
+    Gọi op(0), op(1), ... tới `limit` lần hoặc hết OP_BUDGET_SECONDS, rồi finish() (ví dụ flush
+    của engine ghi trễ). Trả về thời gian trung bình (giây) mỗi thao tác.
+    """
+    done = 0
+    start = time.perf_counter()
+    while done < limit and (done == 0 or time.perf_counter() - start < OP_BUDGET_SECONDS):
+        op(done)
+        done += 1
+    if finish is not None:
+        finish()
+    return (time.perf_counter() - start) / done
+
+
+def _disk_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def bench_engine(dataset: str, engine: str, size: int, seed_path: str, work_dir: str) -> Dict[str, Any]:
+    data_dir = os.path.join(work_dir, engine)
+    os.makedirs(data_dir)
+    shutil.copyfile(seed_path, os.path.join(data_dir, f"{dataset}.json"))
+    result: Dict[str, Any] = {"dataset": dataset, "engine": engine, "records": size}
+    rng = random.Random(f"{dataset}-{engine}-{size}")
+
+    # Lần mở đầu tiên: gồm cả việc chuyển dữ liệu (import SQLite, chia phân vùng...)
+    start = time.perf_counter()
+    store = _open(dataset, data_dir, engine)
+    store.count()
+    result["import_ms"] = (time.perf_counter() - start) * 1000
+    _close(store)
+
+    # Bộ nhớ do dữ liệu đã nạp chiếm giữ (đo riêng vì tracemalloc làm chậm mọi thứ)
+    gc.collect()
+    tracemalloc.start()
+    store = _open(dataset, data_dir, engine)
+    store.count()
+    result["memory_mb"] = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    _close(store)
+    del store
+    gc.collect()
+
+    start = time.perf_counter()
+    store = _open(dataset, data_dir, engine)
+    assert store.count() == size, f"{engine}: số bản ghi khác {size}"
+    result["cold_load_ms"] = (time.perf_counter() - start) * 1000
+
+    lookups = [record_id(dataset, rng.randrange(size)) for _ in range(MAX_OPS["get_by_id"])]
+
+    def get(k):
+        assert store.get_by_id(lookups[k]) is not None
+
+    result["get_by_id_us"] = _timed_ops(get, len(lookups)) * 1e6
+
+    start = time.perf_counter()
+    scanned = sum(1 for _ in store.iter_all())
+    result["scan_ms"] = (time.perf_counter() - start) * 1000
+    assert scanned == size, f"{engine}: iter_all() trả về {scanned} bản ghi"
+
+    new_records = list(generate(dataset, MAX_OPS["create"], start=size))
+    flush = getattr(store, "flush", None)
+    result["create_ms"] = _timed_ops(lambda k: store.create(new_records[k]), len(new_records), flush) * 1000
+
+    updates = [record_id(dataset, rng.randrange(size)) for _ in range(MAX_OPS["update"])]
+    patches = [make_patch(dataset, rng) for _ in updates]
+    result["update_ms"] = _timed_ops(lambda k: store.update(updates[k], patches[k]), len(updates), flush) * 1000
+
+    # Một nửa là bản ghi đã có (cập nhật), một nửa là bản ghi mới
+    half = min(UPSERT_BATCH // 2, size)
+    batch = list(generate(dataset, half, start=size - half)) + \
+        list(generate(dataset, UPSERT_BATCH - half, start=size + MAX_OPS["create"]))
+    start = time.perf_counter()
+    store.upsert_many(batch)
+    if flush is not None:
+        flush()
+    result["upsert_ms"] = (time.perf_counter() - start) * 1000
+
+    _close(store)
+    result["disk_mb"] = _disk_bytes(data_dir) / 2 ** 20
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in result.items()}
+
+
+def _print_header():
+    print(f"{'dataset':<10} {'engine':<18} {'records':>9} " +
+          " ".join(f"{f'{name[:-3]} ({unit})':>16}" for name, unit in METRICS.items()))
+
+
+def _print_row(row: Dict[str, Any]):
+    print(f"{row['dataset']:<10} {row['engine']:<18} {row['records']:>9} " +
+          " ".join(f"{row[name]:>16.2f}" for name in METRICS))
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Các chỉ số chậm (hoặc tốn) hơn baseline quá `tolerance` (0.2 = 20%)."""
+    old = {(r["dataset"], r["engine"], r["records"]): r for r in baseline}
+    regressions = []
+    for row in results:
+        before = old.get((row["dataset"], row["engine"], row["records"]))
+        if before is None:
+            continue
+        for name, unit in METRICS.items():
+            if name in before and row[name] > before[name] * (1 + tolerance) and row[name] - before[name] > 0.01:
+                regressions.append(
+                    f"{row['dataset']}/{row['engine']}/{row['records']} {name}: "
+                    f"{before[name]:.2f} -> {row[name]:.2f} {unit} (+{(row[name] / before[name] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark các storage engine")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Số bản ghi, cách nhau bởi dấu phẩy (mặc định: 1000,100000,1000000)")
+    parser.add_argument("--engines", default=",".join(STORAGE_ENGINES), help="Các engine cần đo")
+    parser.add_argument("--datasets", default=",".join(DATASETS), help="products, customers, orders")
+    parser.add_argument("--encoding", default="json", help="Định dạng file cho các engine JSON")
+    parser.add_argument("--output", help="File kết quả (mặc định benchmarks/results/engines-<thời điểm>.json)")
+    parser.add_argument("--baseline", help="File kết quả cũ để so sánh")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Mức chậm đi cho phép so với baseline")
+    args = parser.parse_args(argv)
+
+    sizes = [int(x) for x in args.sizes.split(",")]
+    engines = [x.strip() for x in args.engines.split(",")]
+    datasets = [x.strip() for x in args.datasets.split(",")]
+    for engine in engines:
+        if engine not in STORAGE_ENGINES:
+            parser.error(f"Engine '{engine}' không tồn tại. Hỗ trợ: {', '.join(STORAGE_ENGINES)}")
+    for dataset in datasets:
+        if dataset not in DATASETS:
+            parser.error(f"Dataset '{dataset}' không tồn tại. Hỗ trợ: {', '.join(DATASETS)}")
+
+    os.environ["STORAGE_WARM_START"] = "false"
+    os.environ["STORAGE_ENCODING"] = args.encoding
+    storage_metrics.set_enabled(False)
+
+    results = []
+    _print_header()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            for dataset in datasets:
+                seed_path = os.path.join(tmp_dir, f"{dataset}-{size}.json")
+                write_json(seed_path, generate(dataset, size))
+                for engine in engines:
+                    work_dir = os.path.join(tmp_dir, f"{dataset}-{size}")
+                    with _quiet():
+                        row = bench_engine(dataset, engine, size, seed_path, work_dir)
+                    results.append(row)
+                    _print_row(row)
+                    shutil.rmtree(os.path.join(work_dir, engine))
+                    gc.collect()
+                os.remove(seed_path)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"engines-{datetime.now():%Y%m%d-%H%M%S}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "encoding": args.encoding,
+            "units": METRICS,
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nĐã ghi kết quả vào {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} chỉ số chậm hơn baseline quá {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nKhông có chỉ số nào chậm hơn baseline quá {args.tolerance:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,11 @@ import os
 from dotenv import load_dotenv
 
 # Models
-from app.models.storage import JsonStorage
+from app.models import storage_metrics
+from app.models.storage import StorageIndex
+from app.storage_engines.order_archive import OrderArchive
+from app.storage_engines.registry import create_storage
+from app.schedulers.order_archive_scheduler import OrderArchiveCronTask
 from app.schedulers.update_categories_scheduler import UpdateCategoryCronTask
 
 # Services
@@ -39,6 +43,7 @@ from app.scrapers.laptop_list_scraper import LaptopListScraper
 # Schedulers
 from app.schedulers.scraper_scheduler import ScraperScheduler
 from app.utils.dummy_orders_generation import DummyOrderCreator
+from app.utils.startup_timer import StartupTimer
 
 
 def get_bool_from_env(key: str, default: bool = False) -> bool:
@@ -69,34 +74,63 @@ def resource_path(relative_path):
 
 
 def run():
+    # Đo thời gian từng giai đoạn cho tới khi cửa sổ đăng nhập hiện lên
+    startup_timer = StartupTimer()
+
     # --- Nạp các biến môi trường từ file .env ---
     load_dotenv(resource_path(".env"))
+    startup_timer.mark("Nạp .env")
+
+    # Đo lường thao tác storage (thời gian, byte đọc/ghi, chờ khóa, cache), ghi ra file khi đóng ứng dụng
+    metrics_enabled = get_bool_from_env('STORAGE_METRICS_ENABLED', True)
+    storage_metrics.set_enabled(metrics_enabled)
 
     # --- Khởi tạo các kho lưu trữ (Storage) ---
-    users_store = JsonStorage(resource_path("data/users.json"))
-    customers_store = JsonStorage(resource_path("data/customers.json"))
-    products_store = JsonStorage(resource_path("data/products.json"))
-    orders_store = JsonStorage(resource_path("data/orders.json"))
-    carts_store = JsonStorage(resource_path("data/carts.json"))
-    categories_store = JsonStorage(resource_path("data/categories.json"))
+    # Engine cho từng store được chọn qua .env (STORAGE_ENGINE_<STORE>), mặc định là json-cached.
+    # Các chỉ mục phụ được khai báo ngay khi tạo storage, service dùng find_by()/find_one() để tra cứu
+    data_dir = resource_path("data")
+    users_store = create_storage("users", data_dir, indexes=[
+        StorageIndex("username", "username", unique=True),
+        StorageIndex("role", "role"),
+    ])
+    customers_store = create_storage("customers", data_dir, indexes=[
+        StorageIndex("phone", "phone", unique=True),
+    ])
+    products_store = create_storage("products", data_dir, indexes=[
+        StorageIndex("sku", "sku"),
+    ])
+    orders_store = create_storage("orders", data_dir)
+    carts_store = create_storage("carts", data_dir)
+    categories_store = create_storage("categories", data_dir, indexes=[
+        StorageIndex("categoryUri", "categoryUri"),
+        StorageIndex("categoryId", "categoryId"),
+    ])
+
+    startup_timer.mark("Khởi tạo storage")
 
     # --- Khởi tạo các dịch vụ (Services) ---
     auth = AuthService(users_store)
     auth.ensure_admin_seed()
 
     cust_srv = CustomerService(customers_store)
-    prod_srv = ProductService(products_store)
-    order_srv = OrderService(orders_store, products_store)
-    cart_srv = CartService(carts_store)
     categories_srv = CategoryService(categories_store)
+    prod_srv = ProductService(products_store, categories_srv)
+    # Kho lưu trữ lạnh cho đơn hàng cũ: luôn được đọc kèm (nếu có), chỉ ghi khi bật ORDER_ARCHIVE_ENABLED
+    order_archive = OrderArchive(os.path.join(data_dir, "archive", "orders"),
+                                 compression=os.getenv('ORDER_ARCHIVE_COMPRESSION', 'gzip').strip().lower())
+    order_srv = OrderService(orders_store, products_store, archive=order_archive)
+    cart_srv = CartService(carts_store)
     user_srv = UserService(users_store)
 
+    startup_timer.mark("Khởi tạo service")
+
     # --- Cấu hình Scraper và Task ---
     SCRAPER_CONFIG = {
         'PHONE_SCRAPER_ENABLED': PhoneListScraper,
         'PHONE_DETAILS_SCRAPER_ENABLED': PhoneDetailScraper,
         'LAPTOP_SCRAPER_ENABLED': LaptopListScraper,
         'UPDATE_CATEGORIES_ENABLED': UpdateCategoryCronTask,
+        'ORDER_ARCHIVE_ENABLED': OrderArchiveCronTask,
     }
 
     all_initialized_tasks = []
@@ -110,8 +144,15 @@ def run():
                 category_interval = int(os.getenv('CATEGORY_UPDATE_INTERVAL_SECONDS', 600))
                 task_instance = task_class(product_service=prod_srv, category_service=categories_srv,
                                            interval_seconds=category_interval)
+            elif task_class == OrderArchiveCronTask:
+                task_instance = task_class(order_service=order_srv,
+                                           interval_seconds=int(os.getenv('ORDER_ARCHIVE_INTERVAL_SECONDS', 86400)),
+                                           older_than_days=int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', 365)))
             elif hasattr(task_class, '__init__') and 'storage' in task_class.__init__.__code__.co_varnames:
-                task_instance = task_class(storage=products_store)
+                task_storages = {'storage': products_store}
+                if 'category_storage' in task_class.__init__.__code__.co_varnames:
+                    task_storages['category_storage'] = categories_store
+                task_instance = task_class(**task_storages)
             else:
                 task_instance = task_class()
             all_initialized_tasks.append(task_instance)
@@ -123,7 +164,7 @@ def run():
     other_schedulers_to_start_manually = []
 
     for task_instance in all_initialized_tasks:
-        if isinstance(task_instance, UpdateCategoryCronTask):
+        if isinstance(task_instance, (UpdateCategoryCronTask, OrderArchiveCronTask)):
             other_schedulers_to_start_manually.append(task_instance)
         elif hasattr(task_instance, 'scrape') and callable(getattr(task_instance, 'scrape')):
             scrapers_for_main_scheduler.append(task_instance)
@@ -146,6 +187,8 @@ def run():
         print(f"--- Khởi động Scheduler riêng: {sched.__class__.__name__} ---")
         sched.start()
 
+    startup_timer.mark("Khởi động scheduler")
+
     # --- Khởi tạo giao diện người dùng Tkinter ---
     root = tk.Tk()
     root.withdraw()
@@ -165,7 +208,33 @@ def run():
                 print(f"Đang dừng scheduler: {sched.__class__.__name__}...")
                 sched.stop()
 
-        # 2. Phá hủy cửa sổ root để kết thúc ứng dụng hoàn toàn
+        # 2. Ghi nốt các thay đổi đang chờ (write-behind) và đóng các storage có tài nguyên mở
+        #    (journal, kết nối SQLite, ...)
+        for store in (users_store, customers_store, products_store, orders_store, carts_store, categories_store):
+            if hasattr(store, 'flush') and callable(getattr(store, 'flush')):
+                try:
+                    store.flush()
+                except Exception as e:
+                    print(f"⚠️ Lỗi khi ghi storage {getattr(store, 'path', store)}: {e}")
+            if hasattr(store, 'close') and callable(getattr(store, 'close')):
+                try:
+                    store.close()
+                except Exception as e:
+                    print(f"⚠️ Lỗi khi đóng storage {getattr(store, 'path', store)}: {e}")
+        order_archive.close()
+
+        # 3. Ghi số liệu đo lường storage ra file JSON
+        if metrics_enabled:
+            metrics_path = os.getenv('STORAGE_METRICS_FILE') or os.path.join(data_dir, "storage_metrics.json")
+            try:
+                report = storage_metrics.dump(metrics_path)
+                print(f"📈 Đã ghi số liệu storage vào {metrics_path}")
+                for row in report["top_operations"][:5]:
+                    print(f"   {row['store']}.{row['operation']}: {row['calls']} lần, {row['total_ms']} ms")
+            except Exception as e:
+                print(f"⚠️ Lỗi khi ghi số liệu storage: {e}")
+
+        # 4. Phá hủy cửa sổ root để kết thúc ứng dụng hoàn toàn
         print("Đang đóng giao diện người dùng...")
         root.destroy()
         print("--- Ứng dụng đã đóng hoàn toàn. ---")
@@ -221,7 +290,14 @@ def run():
     # Rất quan trọng: nếu người dùng đóng cửa sổ đăng nhập, ứng dụng cũng phải tắt hẳn.
     login_view = LoginView(root, auth, on_login_success)
     login_view.protocol("WM_DELETE_WINDOW", shutdown_app)
+    startup_timer.mark("Dựng cửa sổ đăng nhập")
+
+    def report_startup():
+        startup_timer.mark("Hiển thị cửa sổ đăng nhập")
+        startup_timer.report()
 
+    # after_idle chạy khi vòng lặp sự kiện đã vẽ xong cửa sổ đầu tiên
+    root.after_idle(report_startup)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from app.storage_engines.registry import create_storage
+
+
+@pytest.fixture(autouse=True)
+def _storage_env(monkeypatch):
+    """Mỗi test chạy với cấu hình storage mặc định, không đọc/ghi warm snapshot."""
+    for key in list(os.environ):
+        if key.startswith("STORAGE_"):
+            monkeypatch.delenv(key)
+    monkeypatch.setenv("STORAGE_WARM_START", "false")
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    """open_store(tên store, engine=..., indexes=...) -> storage trong thư mục tạm, tự đóng khi xong test."""
+    opened = []
+
+    def _open(name, engine=None, indexes=None, data_dir=None):
+        store = create_storage(name, str(data_dir or tmp_path), indexes=indexes, engine=engine)
+        opened.append(store)
+        return store
+
+    yield _open
+    for store in reversed(opened):
+        if hasattr(store, "close"):
+            store.close()
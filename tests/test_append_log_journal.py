@@ -0,0 +1,101 @@
+import json
+import os
+
+import pytest
+
+from app.models.storage import StorageIndex, load_records
+from app.storage_engines.append_log_storage import AppendLogStorage
+
+
+@pytest.fixture
+def open_log(tmp_path):
+    """Mở AppendLogStorage không có luồng compact nền; "crash" = bỏ đối tượng mà không close()."""
+    opened = []
+
+    def _open():
+        store = AppendLogStorage(str(tmp_path / "orders.json"), indexes=[StorageIndex("code", "code")],
+                                 compact_interval=0)
+        opened.append(store)
+        return store
+
+    yield _open
+    for store in opened:
+        store._close_journal()
+
+
+def _crash(store):
+    # Dừng đột ngột: không compact, chỉ nhả file journal
+    store._close_journal()
+
+
+def test_reopen_replays_journal(open_log):
+    store = open_log()
+    store.create_many([{"id": f"o{i}", "code": f"DH{i}", "qty": i} for i in range(5)])
+    store.update("o1", {"qty": 10})
+    store.update("o2", {"id": "o2b"})
+    store.delete("o3")
+    store.update_many({"o4": {"code": "DH9"}})
+    store.upsert_many([{"id": "o0", "qty": 7}, {"id": "o5", "code": "DH5", "qty": 5}])
+    store.replace_many({"o4": {"id": "o4", "code": "DH9"}})
+    expected = store.all()
+    _crash(store)
+    assert load_records(store.path) == []
+    assert os.path.getsize(store.journal_path) > 0
+
+    reopened = open_log()
+    assert reopened.all() == expected
+    assert [r["id"] for r in reopened.all()] == ["o0", "o1", "o2b", "o4", "o5"]
+    assert reopened.find_one("code", "DH9") == {"id": "o4", "code": "DH9"}
+    assert reopened.get_by_id("o3") is None
+
+
+def test_torn_last_line_is_skipped(open_log):
+    store = open_log()
+    store.create({"id": "o1", "code": "DH1"})
+    _crash(store)
+    with open(store.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op":"create","id":"o2","da')
+
+    reopened = open_log()
+    assert [r["id"] for r in reopened.all()] == ["o1"]
+    # Ghi tiếp sau dòng hỏng vẫn được phát lại ở lần mở sau
+    reopened.create({"id": "o3", "code": "DH3"})
+    _crash(reopened)
+    assert [r["id"] for r in open_log().all()] == ["o1", "o3"]
+
+
+def test_compact_folds_journal_into_snapshot(open_log):
+    store = open_log()
+    store.create_many([{"id": "o1", "code": "DH1"}, {"id": "o2", "code": "DH2"}])
+    store.delete("o1")
+    store.compact()
+    assert not os.path.exists(store.journal_path)
+    assert load_records(store.path) == [{"id": "o2", "code": "DH2"}]
+
+    store.update("o2", {"code": "DH2b"})
+    _crash(store)
+    assert open_log().get_by_id("o2")["code"] == "DH2b"
+
+
+def test_leftover_compacting_file_is_replayed_first(open_log):
+    store = open_log()
+    store.create({"id": "o1", "code": "DH1", "qty": 1})
+    _crash(store)
+    # Lần compact trước dừng sau khi xoay journal, trước khi ghi snapshot
+    os.replace(store.journal_path, store._compacting_path)
+    with open(store.journal_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "update", "id": "o1", "data": {"qty": 2}}) + "\n")
+
+    reopened = open_log()
+    assert reopened.get_by_id("o1")["qty"] == 2
+    reopened.compact()
+    assert not os.path.exists(reopened._compacting_path)
+    assert load_records(reopened.path) == [{"id": "o1", "code": "DH1", "qty": 2}]
+
+
+def test_close_compacts(open_log):
+    store = open_log()
+    store.create({"id": "o1", "code": "DH1"})
+    store.close()
+    assert not os.path.exists(store.journal_path)
+    assert load_records(store.path) == [{"id": "o1", "code": "DH1"}]
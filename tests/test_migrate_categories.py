@@ -0,0 +1,31 @@
+import sys
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from app.utils import migrate_categories  # noqa: E402
+
+
+def test_migrate_products_moves_categories_to_table(open_store):
+    products = open_store("products")
+    categories = open_store("categories")
+    categories.create({"id": "c-1", "categoryId": 1, "categoryName": "Điện thoại (bảng)", "categoryUri": "dien-thoai"})
+    products.create_many([
+        {"id": "p1", "name": "A", "categories": [{"categoryId": 1, "name": "Điện thoại", "uri": "dt"},
+                                                 {"categoryId": 2, "name": "Apple", "uri": "apple"}]},
+        {"id": "p2", "name": "B", "categories": [2]},
+    ])
+
+    assert migrate_categories.migrate_products(products, categories) == {"products": 1, "categories": 1}
+    assert migrate_categories.migrate_products(products, categories) == {"products": 0, "categories": 0}
+    assert products.get_by_id("p1")["categories"] == [1, 2]
+    table = {c["categoryId"]: c["categoryName"] for c in categories.all()}
+    assert table == {1: "Điện thoại (bảng)", 2: "Apple"}
+
+
+def test_main_loads_env_before_opening_stores(monkeypatch, tmp_path):
+    monkeypatch.setattr(migrate_categories, "load_dotenv", lambda: monkeypatch.setenv("STORAGE_ENGINE", "sqlite"))
+    monkeypatch.setattr(sys, "argv", ["migrate_categories", "--data-dir", str(tmp_path)])
+    migrate_categories.main()
+    assert (tmp_path / "products.db").exists() and (tmp_path / "categories.db").exists()
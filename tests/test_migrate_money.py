@@ -0,0 +1,48 @@
+import sys
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from app.storage_engines.order_archive import OrderArchive  # noqa: E402
+from app.utils import migrate_money  # noqa: E402
+
+
+def test_migrate_converts_float_money_and_is_idempotent(open_store, tmp_path):
+    orders = open_store("orders")
+    orders.create_many([
+        {"id": "o1", "order_date": "2025-01-02T10:00:00", "total_amount": 29990000.0,
+         "items": [{"product_id": "p1", "price": 29990000.0, "cost": 27000000.5, "quantity": 1}]},
+        {"id": "o2", "order_date": "2025-01-03T10:00:00", "total_amount": 1000,
+         "items": [{"product_id": "p2", "price": 1000, "cost": 900, "quantity": 1}]},
+    ])
+    orders.close()
+
+    assert migrate_money.migrate(str(tmp_path), ["orders"]) == {"orders": 1}
+    assert migrate_money.migrate(str(tmp_path), ["orders"]) == {"orders": 0}
+    order = open_store("orders").get_by_id("o1")
+    assert order["total_amount"] == 29990000
+    assert order["items"][0]["price"] == 29990000 and order["items"][0]["cost"] == 27000001
+
+
+def test_archive_returns_old_float_segments_as_vnd(tmp_path):
+    archive = OrderArchive(str(tmp_path / "archive"))
+    entries = archive.write_segments([
+        {"id": "o1", "order_date": "2024-05-01T09:00:00", "total_amount": 1500000.0,
+         "items": [{"price": 1500000.0, "cost": 1200000.0, "quantity": 1}]},
+    ])
+    archive.commit(e["name"] for e in entries)
+
+    order = archive.get_by_id("o1")
+    assert type(order["total_amount"]) is int and order["total_amount"] == 1500000
+    assert [type(v) for v in order["items"][0].values()] == [int, int, int]
+    assert archive.summary()["total_amount"] == 1500000
+    archive.close()
+
+
+def test_main_loads_env_before_opening_stores(monkeypatch, tmp_path):
+    # Engine chỉ có trong .env: main phải nạp .env trước khi tạo storage
+    monkeypatch.setattr(migrate_money, "load_dotenv", lambda: monkeypatch.setenv("STORAGE_ENGINE", "sqlite"))
+    monkeypatch.setattr(sys, "argv", ["migrate_money", "--data-dir", str(tmp_path), "--stores", "orders"])
+    migrate_money.main()
+    assert (tmp_path / "orders.db").exists()
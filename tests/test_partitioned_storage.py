@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from app.storage_engines.partitioned_storage import ID_LOG, PartitionedStorage
+
+ORDERS = [
+    {"id": "o1", "order_date": "2025-01-05"},
+    {"id": "o2", "order_date": "2025-02-10"},
+    {"id": "o3", "order_date": "2025-03-15"},
+]
+
+
+@pytest.fixture
+def open_orders(tmp_path):
+    """Mở PartitionedStorage theo tháng trong thư mục tạm, tự đóng khi xong test."""
+    opened = []
+
+    def _open():
+        store = PartitionedStorage(str(tmp_path / "orders"))
+        opened.append(store)
+        return store
+
+    yield _open
+    for store in opened:
+        store.close()
+
+
+def test_lookup_by_id_opens_only_its_shard(open_orders):
+    open_orders().create_many([dict(x) for x in ORDERS])
+
+    store = open_orders()
+    assert store.get_by_id("missing") is None
+    assert store.update("missing", {"note": "x"}) is None
+    assert not store._shards
+    assert store.get_by_id("o2")["order_date"] == "2025-02-10"
+    assert list(store._shards) == ["2025-02"]
+
+
+def test_sees_ids_written_by_another_instance(open_orders):
+    store, other = open_orders(), open_orders()
+    store.create_many([dict(x) for x in ORDERS])
+    assert other.get_by_id("o9") is None
+
+    store.create({"id": "o9", "order_date": "2025-03-20"})
+    store.update("o1", {"order_date": "2025-03-01"})
+    store.delete("o3")
+    assert other.get_by_id("o9")["order_date"] == "2025-03-20"
+    assert other.get_by_id("o1")["order_date"] == "2025-03-01"
+    assert other.get_by_id("o3") is None
+
+
+def test_missing_id_log_is_rebuilt(open_orders):
+    store = open_orders()
+    store.create_many([dict(x) for x in ORDERS])
+    os.remove(os.path.join(store.path, ID_LOG))
+
+    reopened = open_orders()
+    assert reopened.get_by_id("o3")["order_date"] == "2025-03-15"
+    assert os.path.exists(os.path.join(store.path, ID_LOG))
+    assert reopened.get_by_id("missing") is None
+
+
+def test_save_all_rewrites_id_log(open_orders):
+    store = open_orders()
+    store.create_many([dict(x) for x in ORDERS])
+    store.save_all([{"id": "o7", "order_date": "2025-02-01"}])
+    with open(os.path.join(store.path, ID_LOG), encoding="utf-8") as f:
+        assert f.read() == '["o7", "2025-02"]\n'
+
+    reopened = open_orders()
+    assert reopened.get_by_id("o1") is None
+    assert reopened.get_by_id("o7")["id"] == "o7"
@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+from app.scrapers.phone_list_scraper import PhoneListScraper  # noqa: E402
+
+
+def _api_item(name, sku, price, categories):
+    return {
+        "general": {"name": name, "sku": sku, "attributes": {}, "categories": categories},
+        "filterable": {"special_price": price, "thumbnail": ""},
+    }
+
+
+@pytest.fixture
+def scraper(open_store):
+    products = open_store("products")
+    categories = open_store("categories")
+    products.create({"id": "p-old", "name": "iPhone 15", "sku": "ip15", "price": 1, "bought_price": 0,
+                     "stock": 42, "created_at": "2025-01-01T00:00:00", "updated_at": "2025-01-01T00:00:00",
+                     "categories": [3]})
+    return PhoneListScraper(storage=products, category_storage=categories)
+
+
+def test_load_products_creates_new_and_updates_existing(scraper):
+    scraper._load_products([
+        {"name": "iPhone 15", "sku": "ip15", "price": 20_000_000, "bought_price": 19_000_000, "categories": [3]},
+        {"name": "Galaxy S25", "sku": "s25", "price": 25_000_000, "bought_price": 24_000_000, "categories": [3]},
+        {"name": None, "sku": "no-name"},
+    ])
+
+    store = scraper.product_storage
+    assert store.count() == 2
+    old = store.get_by_id("p-old")
+    assert old["price"] == 20_000_000
+    assert old["stock"] == 42
+    assert old["created_at"] == "2025-01-01T00:00:00"
+    assert old["updated_at"] > "2025-01-01T00:00:00"
+
+    new = next(p for p in store.all() if p["sku"] == "s25")
+    assert new["id"] and new["id"] != "p-old"
+    assert 100 <= new["stock"] <= 300
+    assert new["created_at"] and new["updated_at"]
+    assert new["categories"] == [3]
+
+
+def test_scrape_writes_categories_and_product_references(scraper, monkeypatch):
+    raw = [
+        _api_item("iPhone 15", "ip15", 19_990_000.0, [{"categoryId": 3, "name": "Điện thoại", "uri": "mobile"}]),
+        _api_item("Galaxy S25", "s25", "25.990.000", [{"categoryId": 3, "name": "Điện thoại", "uri": "mobile"},
+                                                      {"categoryId": 2221, "name": "Điện thoại AI", "uri": "ai"}]),
+    ]
+    monkeypatch.setattr(scraper, "_fetch_api_data", lambda: raw)
+
+    scraper.scrape()
+    scraper.scrape()  # chạy lại: không tạo trùng sản phẩm hay danh mục
+
+    products = {p["name"]: p for p in scraper.product_storage.all()}
+    assert set(products) == {"iPhone 15", "Galaxy S25"}
+    assert products["iPhone 15"]["price"] == 19_990_000
+    assert products["Galaxy S25"]["price"] == 25_990_000
+    assert products["Galaxy S25"]["categories"] == [3, 2221]
+    categories = {c["categoryId"]: c for c in scraper.category_storage.all()}
+    assert set(categories) == {3, 2221}
+    assert categories[2221]["categoryUri"] == "ai"
@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from app.services.category_service import CategoryService
+from app.services.product_service import ProductService
+
+
+@pytest.fixture
+def service(open_store):
+    categories = open_store("categories")
+    categories.create_many([
+        {"id": "c1", "categoryId": 1, "categoryName": "Điện thoại", "categoryUri": "dien-thoai"},
+        {"id": "c2", "categoryId": 2, "categoryName": "Apple", "categoryUri": "apple"},
+    ])
+    products = open_store("products")
+    products.create_many([
+        {"id": "p1", "name": "iPhone", "price": 30, "categories": [1, 2]},
+        {"id": "p2", "name": "Galaxy", "price": 20, "categories": [1]},
+        {"id": "p3", "name": "Ốp lưng", "price": 20, "categories": []},
+    ])
+    return ProductService(products, CategoryService(categories))
+
+
+def _scan(service, where):
+    return sorted(p["id"] for p in service.storage.query(where))
+
+
+def test_indexes_follow_writes(service):
+    assert service.product_ids_in_categories(["dien-thoai"]) == {"p1", "p2"}
+    assert service.product_ids_in_categories(["dien-thoai", "apple"], match_all=True) == {"p1"}
+    assert service.product_ids_in_price_range(20, 25) == ["p2", "p3"]
+
+    created = service.create({"name": "Pixel", "price": "25.000", "categories": [1]})
+    service.update("p1", {"price": 10, "categories": [2]})
+    service.delete("p3")
+    service.check_for_changes()
+
+    assert service.product_ids_in_categories(["dien-thoai"]) == {"p2", created["id"]}
+    assert service.product_ids_in_categories(["apple", "khong-co"], match_all=True) == set()
+    assert service.product_ids_in_price_range(max_price=20) == _scan(service, {"price": ("<=", 20)}) == ["p1", "p2"]
+    assert service.product_ids_in_price_range(min_price=21) == [created["id"]]
+
+
+def test_price_sorted_pages_match_storage_sort(service):
+    for order_by in ("price", "-price"):
+        expected = [p["price"] for p in service.storage.query(order_by=order_by)]
+        # Các trang nối lại đủ mọi sản phẩm, đúng thứ tự giá
+        pages = [service.query(order_by=order_by, limit=2, offset=offset) for offset in (0, 2)]
+        assert [p["price"] for page in pages for p in page] == expected
+        assert sorted(p["id"] for page in pages for p in page) == ["p1", "p2", "p3"]
+    page = service.query(where={"id": ("in", ["p1", "p3"])}, order_by="-price", fields=["id", "price"])
+    assert page == [{"id": "p1", "price": 30}, {"id": "p3", "price": 20}]
+
+
+def _call_with_timeout(fn, timeout=10):
+    """Gọi fn() trên luồng khác; lỗi nếu nó không trả về (treo) sau `timeout` giây."""
+    result = []
+    worker = threading.Thread(target=lambda: result.append(fn()), daemon=True)
+    worker.start()
+    worker.join(timeout)
+    assert not worker.is_alive(), "ProductService bị treo"
+    return result[0]
+
+
+def test_category_index_survives_writes_from_another_instance(open_store):
+    # Hai bản ứng dụng dùng chung một products.json (thư mục dữ liệu dùng chung)
+    categories = open_store("categories")
+    categories.create({"id": "c1", "categoryId": 1, "categoryName": "Điện thoại", "categoryUri": "dien-thoai"})
+    mine, other = open_store("products"), open_store("products")
+    mine.create_many([{"id": "p1", "price": 10, "categories": [1]}, {"id": "p2", "price": 20, "categories": []}])
+    service = ProductService(mine, CategoryService(categories))
+    assert service.product_ids_in_categories(["dien-thoai"]) == {"p1"}
+
+    other.check_for_changes()
+    other.create({"id": "p3", "price": 15, "categories": [1]})
+    mine.all()
+    other.update("p2", {"categories": [1]})
+
+    assert _call_with_timeout(lambda: service.product_ids_in_categories(["dien-thoai"])) == {"p1", "p2", "p3"}
+    other.delete("p1")
+    assert _call_with_timeout(lambda: service.product_ids_in_categories(["dien-thoai"])) == {"p2", "p3"}
+
+
+def test_price_index_survives_writes_from_another_instance(open_store):
+    # Hai bản ứng dụng dùng chung một products.json (thư mục dữ liệu dùng chung)
+    mine, other = open_store("products"), open_store("products")
+    mine.create_many([{"id": "p1", "price": 10, "categories": [1]}, {"id": "p2", "price": 20, "categories": [1]}])
+    service = ProductService(mine)
+    assert service.product_ids_in_price_range() == ["p1", "p2"]
+
+    other.check_for_changes()
+    other.create({"id": "p3", "price": 15, "categories": [1]})
+    mine.all()
+    other.update("p1", {"price": 30})
+
+    assert _call_with_timeout(service.product_ids_in_price_range) == ["p3", "p2", "p1"]
+    assert _call_with_timeout(lambda: [p["id"] for p in service.query(order_by="-price", limit=2)]) == ["p1", "p2"]
+    # Đường của ProductsView: lọc theo tập id rồi sắp xếp theo giá
+    page = _call_with_timeout(lambda: service.query(where={"id": ("in", ["p1", "p3"])}, order_by="price"))
+    assert [p["id"] for p in page] == ["p3", "p1"]
+    mine.delete("p2")
+    other.delete("p3")
+    assert _call_with_timeout(service.product_ids_in_price_range) == ["p1"]
@@ -0,0 +1,72 @@
+import pytest
+
+from app.models.storage import StorageIndex
+from app.storage_engines.registry import STORAGE_ENGINES
+
+ENGINES = list(STORAGE_ENGINES)
+
+# Trường "price" có đủ kiểu: số nguyên, số thực, chuỗi (số và chữ), true/false, null, list, không có
+PRICES = [1, 2, 2.5, 3, 10, "2", "abc", "", True, False, None, [3], {"v": 3}, "missing"]
+RECORDS = [
+    dict({"id": f"r{i:02d}", "created_at": f"2025-01-{i + 1:02d}T00:00:00", "sku": f"S{i % 4}",
+          "name": f"Item {i}"}, **({} if price == "missing" else {"price": price}))
+    for i, price in enumerate(PRICES)
+]
+
+WHERES = [
+    {"price": (">=", 2)},
+    {"price": ("<", 3)},
+    {"price": (">", 2.0)},
+    {"price": ("<=", 1)},
+    {"price": (">", "1")},
+    {"price": ("<", "b")},
+    {"price": (">=", None)},
+    {"price": 2},
+    {"price": ("!=", 2)},
+    {"price": None},
+    {"price": ("in", [2, "2", True])},
+    {"name": ("contains", "item 1")},
+    {"sku": "S1", "price": (">", 0)},
+    {"$or": [{"price": ("<", 2)}, {"price": ("==", "abc")}]},
+    {"id": ("in", ["r01", "r05", "nope"])},
+]
+
+
+@pytest.fixture
+def stores(open_store, tmp_path):
+    opened = {}
+    for engine in ENGINES:
+        store = open_store("items", engine, indexes=[StorageIndex("sku", "sku")], data_dir=tmp_path / engine)
+        store.create_many([dict(r) for r in RECORDS])
+        opened[engine] = store
+    return opened
+
+
+@pytest.mark.parametrize("where", WHERES, ids=repr)
+def test_query_matches_json_engine(stores, where):
+    expected = sorted(r["id"] for r in stores["json"].query(where))
+    for engine, store in stores.items():
+        assert sorted(r["id"] for r in store.query(where)) == expected, engine
+        assert store.count(where) == len(expected), engine
+
+
+def test_ordered_paging_matches_json_engine(stores):
+    args = dict(where={"price": (">=", 0)}, order_by=["-price", "name"], fields=["id", "price"], limit=4, offset=1)
+    expected = stores["json"].query(**args)
+    for engine, store in stores.items():
+        assert store.query(**args) == expected, engine
+
+
+def test_crud_and_batches_match_json_engine(stores):
+    for store in stores.values():
+        store.update("r01", {"price": 7, "name": "Đổi tên"})
+        store.delete("r02")
+        store.delete_many(["r03", "r04", "nope"])
+        store.update_many({"r05": {"sku": "S9"}, "nope": {"sku": "S9"}})
+        store.upsert_many([{"id": "r06", "price": 60}, {"id": "r-new", "price": 1}])
+        store.replace_many({"r07": {"id": "r07", "created_at": "2025-01-08T00:00:00", "name": "Mới"}, "nope": {}})
+    expected = {r["id"]: r for r in stores["json"].all()}
+    for engine, store in stores.items():
+        assert {r["id"]: r for r in store.all()} == expected, engine
+        assert [r["id"] for r in store.find_by("sku", "S9")] == ["r05"], engine
+        assert store.get_by_id("r02") is None and store.get_by_id("r-new")["price"] == 1, engine
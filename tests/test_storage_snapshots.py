@@ -0,0 +1,63 @@
+import pickle
+
+import pytest
+
+from app.models.cow import CHUNK_SIZE, CowDict, CowList
+from app.models.storage import StorageIndex
+
+
+def test_cow_list_fork_shares_untouched_chunks():
+    base = CowList(range(3 * CHUNK_SIZE + 5))
+    work = base.fork()
+    work[1] = -1
+    work.append("new")
+    del work[2 * CHUNK_SIZE]
+    work[CHUNK_SIZE + 10:] = [x for x in work[CHUNK_SIZE + 10:] if x != CHUNK_SIZE + 20]
+
+    assert list(base) == list(range(3 * CHUNK_SIZE + 5))
+    expected = list(range(3 * CHUNK_SIZE + 5))
+    expected[1] = -1
+    expected.append("new")
+    del expected[2 * CHUNK_SIZE]
+    expected.remove(CHUNK_SIZE + 20)
+    assert list(work) == expected and len(work) == len(expected)
+    assert work[-1] == "new" and work[0] == 0
+    # Chunk đầu bị sửa nên được sao chép; các chunk khác chỉ dời khi xóa phía trước
+    assert work._chunks[0] is not base._chunks[0]
+    assert list(pickle.loads(pickle.dumps(work))) == expected
+
+
+def test_cow_dict_fork_copies_only_touched_partitions():
+    base = CowDict({f"k{i}": i for i in range(5000)})
+    work = base.fork()
+    work["k1"] = -1
+    work["new"] = 1
+    del work["k2"]
+
+    assert base["k1"] == 1 and "new" not in base and "k2" in base and len(base) == 5000
+    assert work["k1"] == -1 and work.get("k2") is None and len(work) == 5000
+    shared = sum(a is b for a, b in zip(base._parts, work._parts))
+    assert shared >= len(base._parts) - 3
+    assert dict(pickle.loads(pickle.dumps(work))) == dict(work)
+
+
+@pytest.mark.parametrize("engine", ["json-cached", "append-log", "in-memory"])
+def test_published_snapshot_is_not_changed_by_writes(open_store, engine):
+    store = open_store("items", engine, indexes=[StorageIndex("sku", "sku", unique=True)])
+    store.create_many([{"id": f"r{i}", "sku": f"S{i}", "qty": i} for i in range(2000)])
+    before = store._current()
+
+    store.create({"id": "r-new", "sku": "S-new", "qty": 0})
+    store.update("r5", {"qty": 500, "sku": "S5b"})
+    store.delete("r7")
+    with pytest.raises(ValueError):
+        store.update("r8", {"sku": "S9"})
+
+    assert len(before.records) == 2000 and before.records[5]["qty"] == 5
+    assert before.id_index.get("r-new") is None and before.id_index["r7"] == 7
+    assert "S5b" not in before.index_data["sku"] and "S5" in before.index_data["sku"]
+    assert store.get_by_id("r5")["qty"] == 500
+    assert store.get_by_id("r7") is None
+    assert store.find_one("sku", "S8")["id"] == "r8"
+    assert store.find_one("sku", "S5") is None
+    assert store.count() == 2000
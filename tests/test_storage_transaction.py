@@ -0,0 +1,64 @@
+import pytest
+
+from app.models.storage import StorageIndex, StorageTransaction
+from app.storage_engines.registry import STORAGE_ENGINES
+
+
+@pytest.fixture(params=list(STORAGE_ENGINES))
+def stores(open_store, request):
+    products = open_store("products", request.param)
+    orders = open_store("orders", indexes=[StorageIndex("code", "code", unique=True)])
+    products.create({"id": "p1", "name": "iPhone 15", "price": 20_000_000, "stock": 5,
+                     "created_at": "2025-01-01T00:00:00"})
+    orders.create({"id": "o1", "code": "DH001", "total_amount": 0})
+    return products, orders
+
+
+def test_commit_writes_every_store(stores):
+    products, orders = stores
+    with StorageTransaction(products, orders) as tx:
+        product = tx.get(products, "p1")
+        tx.update(products, "p1", {"stock": product["stock"] - 1})
+        assert tx.get(products, "p1")["stock"] == 4
+        tx.create(orders, {"id": "o2", "code": "DH002", "total_amount": 20_000_000})
+        # Chưa ghi gì cho tới khi thoát khối with
+        assert products.get_by_id("p1")["stock"] == 5 and orders.get_by_id("o2") is None
+    assert products.get_by_id("p1")["stock"] == 4
+    assert orders.find_one("code", "DH002")["id"] == "o2"
+
+
+def test_exception_inside_block_writes_nothing(stores):
+    products, orders = stores
+    with pytest.raises(RuntimeError):
+        with StorageTransaction(products, orders) as tx:
+            tx.update(products, "p1", {"stock": 0})
+            tx.create(orders, {"id": "o2", "code": "DH002"})
+            raise RuntimeError("hủy")
+    assert products.get_by_id("p1")["stock"] == 5 and orders.count() == 1
+
+
+def test_failed_store_rolls_back_earlier_stores(stores):
+    products, orders = stores
+    products.create({"id": "p9", "name": "Ốp lưng", "price": 1, "stock": 1, "created_at": "2025-01-02T00:00:00"})
+    before, order = products.get_by_id("p1"), [r["id"] for r in products.all()]
+    with pytest.raises(ValueError):
+        with StorageTransaction(products, orders) as tx:
+            tx.update(products, "p1", {"stock": 4, "reserved": 1})
+            tx.create(products, {"id": "p2", "name": "Galaxy S25", "price": 1, "stock": 1,
+                                 "created_at": "2025-02-01T00:00:00"})
+            # Trùng mã đơn trong chỉ mục unique: storage thứ hai ghi lỗi
+            tx.create(orders, {"id": "o2", "code": "DH001"})
+    # Trường do bản vá thêm vào bị xóa, không còn lại dưới dạng None
+    assert products.get_by_id("p1") == before
+    # Bản ghi được đặt lại tại chỗ: thứ tự của all() không đổi
+    assert [r["id"] for r in products.all()] == order == ["p1", "p9"]
+    assert products.get_by_id("p2") is None and orders.count() == 1
+
+
+def test_update_unknown_id_raises(stores):
+    products, orders = stores
+    with StorageTransaction(products) as tx:
+        with pytest.raises(ValueError):
+            tx.update(products, "nope", {"stock": 1})
+        with pytest.raises(ValueError):
+            tx.get(orders, "o1")